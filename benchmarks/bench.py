@@ -0,0 +1,317 @@
+"""Benchmarks for the load / submit / update / refresh paths
+
+Generates synthetic data files, times the work each UI action does on the
+I/O thread, and writes the results as JSON so runs on different commits can
+be compared:
+
+    python benchmarks/bench.py --rows 1000,100000 --sheets 1,5 --output before.json
+    python benchmarks/bench.py --rows 1000,100000 --sheets 1,5 --compare before.json
+
+Everything runs headless. With --tk and a display (or Xvfb), the preview and
+full view are also built as real widgets and timed until they are filled.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+from backends import DEFAULT_PREVIEW_ROWS, open_session  # noqa: E402
+from completion import column_indexes  # noqa: E402
+from exporter import export_sheet  # noqa: E402
+from storage import append_rows_to_xlsx  # noqa: E402
+
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def synthetic_rows(count, column_count, seed=0):
+    """Rows mixing text, integers, decimals and dates, like typical entry data"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for number in range(count):
+        row = []
+        for column in range(column_count):
+            kind = column % 4
+            if kind == 0:
+                row.append(f"{rng.choice(WORDS)} {number}")
+            elif kind == 1:
+                row.append(rng.randint(1, 100000))
+            elif kind == 2:
+                row.append(round(rng.random() * 1000, 2))
+            else:
+                row.append((start + timedelta(minutes=rng.randint(0, 500000))).strftime("%Y-%m-%d %H:%M"))
+        yield row
+
+
+def make_data_file(directory, backend, sheets, rows, columns):
+    """Create (or reuse) a data file with `sheets` sheets of `rows` rows each"""
+    path = os.path.join(directory, f"{backend}-{sheets}x{rows}x{columns}.{'db' if backend == 'sqlite' else 'xlsx'}")
+    if os.path.exists(path):
+        return path
+    headers = {f"Sheet{index + 1}": [f"Column {column + 1}" for column in range(columns)] for index in range(sheets)}
+    session = open_session(path)
+    session.create(headers)
+    if backend == "sqlite":
+        for index, sheet_name in enumerate(headers):
+            session.bulk_append(sheet_name, synthetic_rows(rows, columns, seed=index), columns)
+    else:
+        # Streamed straight into the sheet XML; building 1M rows with openpyxl would take minutes
+        append_rows_to_xlsx(path, {
+            sheet_name: (synthetic_rows(rows, columns, seed=index), columns, None)
+            for index, sheet_name in enumerate(headers)
+        })
+    session.close()
+    return path
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def measure(action, repeat, setup=None):
+    """Time `action` `repeat` times, then once more under tracemalloc for its peak memory"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - started) * 1000)
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    action()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p90_ms": round(percentile(timings, 0.90), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "max_ms": round(max(timings), 3),
+        "peak_mb": round(peak / (1 << 20), 2),
+    }
+
+
+def bench_paths(path, columns, repeat):
+    """Time each hot path against one data file; returns {path name: stats}"""
+    results = {}
+    session = open_session(path)
+    sheet_name = next(iter(session.sheet_headers()))
+    display = list(range(min(4, columns)))
+
+    # Config._load_from_existing_file: the headers of every sheet, cold and from the schema cache
+    def headers_cold():
+        cache = path + ".schema.json"
+        if os.path.exists(cache):
+            os.remove(cache)
+    results["Config._load_from_existing_file (cold)"] = measure(
+        lambda: open_session(path).sheet_headers(), repeat, setup=headers_cold)
+    results["Config._load_from_existing_file (warm)"] = measure(
+        lambda: open_session(path).sheet_headers(), repeat)
+
+    # SheetFrame.load_data: the sheet's latest rows; DataDisplayWindow.load_data: all of them
+    def fresh():
+        if hasattr(session, "invalidate"):
+            session.invalidate()
+
+    def preview_load():
+        _, row_ids, rows = session.tail_snapshot(sheet_name, DEFAULT_PREVIEW_ROWS)
+        [[row[index] if index < len(row) else "" for index in display] for row in rows]
+    results["SheetFrame.load_data"] = measure(preview_load, repeat, setup=fresh)
+    results["DataDisplayWindow.load_data"] = measure(lambda: session.snapshot(sheet_name), repeat, setup=fresh)
+    # Every sheet in one call: parsed in parallel worker processes for workbooks
+    sheet_names = list(session.sheet_headers())
+    results["StorageBackend.snapshots (every sheet)"] = measure(
+        lambda: session.snapshots(sheet_names), repeat, setup=fresh)
+
+    # DataDisplayWindow.export_rows: the sheet streamed to a gzipped CSV ("work-" files are cleaned up)
+    export_path = os.path.join(os.path.dirname(path), "work-export.csv.gz")
+    column_names = session.sheet_headers()[sheet_name]
+    results["DataDisplayWindow.export_rows"] = measure(
+        lambda: export_sheet(session, sheet_name, column_names, export_path), repeat, setup=fresh)
+
+    # SheetFrame.load_suggestions: every column's distinct values indexed (on the background thread)
+    results["SheetFrame.load_suggestions"] = measure(
+        lambda: column_indexes(session, sheet_name), repeat, setup=fresh)
+    # PlaceholderEntry keystroke: the suggestions for a prefix of the first column's text values
+    indexes = column_indexes(session, sheet_name)
+    prefixes = [word[:length] for word in WORDS for length in (1, 3)] + [f"{word} 1" for word in WORDS]
+
+    def keystrokes():
+        for prefix in prefixes:
+            indexes[0].complete(prefix)
+    results["PlaceholderEntry suggestions (30 keystrokes)"] = measure(keystrokes, repeat)
+
+    # SheetFrame.submit: one row made durable (the journal for workbooks, an INSERT for SQLite)
+    new_rows = synthetic_rows((repeat + 1) * 100, columns, seed=99)
+    results["SheetFrame.submit"] = measure(
+        lambda: session.append_row(sheet_name, next(new_rows)), repeat * 50)
+
+    # JournalCompactor: a batch of submitted rows written into the file
+    def queue_batch():
+        session.append_rows(sheet_name, [next(new_rows) for _ in range(10)])
+    results["JournalCompactor.compact (10 rows)"] = measure(session.compact, repeat, setup=queue_batch)
+
+    # UpdateWindow.save_update: one row rewritten, checked against the values the user saw
+    _, row_ids, rows = session.snapshot(sheet_name)
+    rng = random.Random(1)
+
+    def update():
+        position = rng.randrange(len(row_ids))
+        values = list(rows[position])
+        values[0] = f"updated {rng.random()}"
+        session.update_row(sheet_name, row_ids[position], values, expected=rows[position])
+        rows[position] = tuple(values)
+    results["UpdateWindow.save_update"] = measure(update, repeat)
+
+    # Window._watch_file: per-sheet fingerprints after someone else saved
+    def touch():
+        os.utime(path)
+    results["Window._watch_file"] = measure(session.sheet_fingerprints, repeat, setup=touch)
+
+    session.close()
+    return results
+
+
+def bench_widgets(path, sheet_name, columns, repeat):
+    """Time the preview and full view being built and filled as real Tk widgets"""
+    import tkinter as tk
+
+    import data_entry
+
+    root = tk.Tk()
+    root.withdraw()
+    config = object.__new__(data_entry.Config)
+    config.excel_path = path
+    config._session = None
+    names = [f"Column {column + 1}" for column in range(columns)]
+    config.sheets = {sheet_name: {"columns": names, "display_columns": names[:4]}}
+    config.preview_rows = DEFAULT_PREVIEW_ROWS
+    executor = data_entry.IOExecutor()
+    background = data_entry.IOExecutor(name="background-io")
+
+    def until_loaded(view):
+        while view._load_job is not None:
+            executor.poll()
+            root.update()
+            time.sleep(0.001)
+
+    def preview():
+        frame = data_entry.SheetFrame(root, config, sheet_name, executor, background)
+        until_loaded(frame)
+        frame.destroy()
+
+    def full_view():
+        window = data_entry.DataDisplayWindow(root, config, sheet_name, executor)
+        until_loaded(window)
+        window.destroy()
+
+    results = {
+        "SheetFrame (widget, load to filled)": measure(preview, repeat),
+        "DataDisplayWindow (widget, load to filled)": measure(full_view, repeat),
+    }
+    executor.shutdown()
+    background.shutdown()
+    root.destroy()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print each path's p50 next to the baseline's"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(json.dumps(entry["scenario"], sort_keys=True), entry["path"]): entry
+                    for entry in json.load(f)["results"]}
+    print(f"\n{'path':48} {'scenario':28} {'base p50':>10} {'p50':>10} {'change':>8}")
+    for entry in results:
+        scenario = json.dumps(entry["scenario"], sort_keys=True)
+        old = baseline.get((scenario, entry["path"]))
+        if old is None:
+            continue
+        label = "{backend} {sheets}x{rows}x{columns}".format(**entry["scenario"])
+        change = (entry["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        print(f"{entry['path']:48} {label:28} {old['p50_ms']:>10.2f} {entry['p50_ms']:>10.2f} {change:>+7.0f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's load/submit/update/refresh paths.")
+    parser.add_argument("--rows", default="1000,10000,100000",
+                        help="comma-separated rows per sheet (default: %(default)s; up to 1000000)")
+    parser.add_argument("--sheets", default="1,5", help="comma-separated sheet counts (default: %(default)s)")
+    parser.add_argument("--columns", default="8", help="comma-separated column counts (default: %(default)s)")
+    parser.add_argument("--backends", default="xlsx,sqlite", help="xlsx, sqlite or both (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per path (default: %(default)s)")
+    parser.add_argument("--tk", action="store_true", help="also time the real widgets (needs a display)")
+    parser.add_argument("--data-dir", help="where to keep generated files (default: a temporary directory)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    directory = args.data_dir or tempfile.mkdtemp(prefix="data-entry-bench-")
+    os.makedirs(directory, exist_ok=True)
+    results = []
+    try:
+        for backend in args.backends.split(","):
+            for sheets in map(int, args.sheets.split(",")):
+                for rows in map(int, args.rows.split(",")):
+                    for columns in map(int, args.columns.split(",")):
+                        scenario = {"backend": backend, "sheets": sheets, "rows": rows, "columns": columns}
+                        print(f"{backend}: {sheets} sheet(s) x {rows:,} rows x {columns} columns", file=sys.stderr)
+                        source = make_data_file(directory, backend, sheets, rows, columns)
+                        # Every scenario writes to its own copy, so generated files stay pristine
+                        work_path = os.path.join(directory, "work-" + os.path.basename(source))
+                        shutil.copyfile(source, work_path)
+                        timings = bench_paths(work_path, columns, args.repeat)
+                        if args.tk:
+                            timings.update(bench_widgets(work_path, "Sheet1", columns, args.repeat))
+                        for path_name, stats in timings.items():
+                            results.append({"scenario": scenario, "path": path_name, **stats})
+                            print(f"  {path_name:48} p50 {stats['p50_ms']:>10.2f} ms  p99 {stats['p99_ms']:>10.2f} ms"
+                                  f"  peak {stats['peak_mb']:>8.2f} MB", file=sys.stderr)
+                        for leftover in os.listdir(directory):
+                            if leftover.startswith("work-"):
+                                os.remove(os.path.join(directory, leftover))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
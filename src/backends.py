@@ -0,0 +1,307 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from storage import StorageBackend, WorkbookSession
+
+
+# Data file used when none is chosen, by both the Tk app and the command line
+DEFAULT_EXCEL_FILE = r"sample.xlsx"
+# The data file and sheet choices from the last setup, so later starts skip it
+CONFIG_FILE = "data_entry_config.json"
+# How many of a sheet's latest rows the preview pane shows
+DEFAULT_PREVIEW_ROWS = 500
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+# Hidden key column of every sheet table; an INTEGER PRIMARY KEY is the table's
+# rowid, so lookups by it are index seeks and VACUUM never renumbers it
+ROW_ID = "_row_id"
+# Bookkeeping table counting, per sheet, the rows updated or deleted so far;
+# triggers keep it, whoever writes, so a change check needn't read any rows
+CHANGES_TABLE = "_sheet_changes"
+
+
+def is_sqlite_path(path):
+    return path.lower().endswith(SQLITE_EXTENSIONS)
+
+
+def open_session(path):
+    """Storage backend for a data file, chosen by its extension"""
+    if is_sqlite_path(path):
+        return SqliteSession(path)
+    return WorkbookSession(path)
+
+
+def read_app_config():
+    """The saved {"excel_path": ..., "sheets": {...}} settings, or None if there are none"""
+    try:
+        with open(CONFIG_FILE, encoding="utf-8") as f:
+            config = json.load(f)
+        if isinstance(config.get("excel_path"), str) and isinstance(config.get("sheets"), dict):
+            return config
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def write_app_config(excel_path, sheets, preview_rows=DEFAULT_PREVIEW_ROWS):
+    """Save the data file and {sheet_name: {'columns', 'display_columns'}} for the next start"""
+    tmp_path = CONFIG_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"excel_path": excel_path, "sheets": sheets, "preview_rows": preview_rows},
+                  f, indent=2, default=str)
+    os.replace(tmp_path, CONFIG_FILE)
+
+
+def _quote(name):
+    """SQL identifier for a sheet or column name"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _literal(text):
+    """SQL string literal, for the statements (trigger bodies) that can't take parameters"""
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def _sql_value(value):
+    """Values SQLite stores natively pass through; anything else (dates...) as text"""
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    return str(value)
+
+
+class SqliteSession(StorageBackend):
+    """Stores every sheet as a table of a SQLite database
+
+    Rows keep their insertion order in an INTEGER PRIMARY KEY, which is also
+    their row id, so a submit is a single INSERT and an update a single UPDATE
+    by key, rather than a rewrite of the whole file. export_xlsx() produces a workbook when one is needed.
+    """
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        # Autocommit; multi-row writes open their own transaction. The I/O worker
+        # and the startup code both use the connection, always under self._lock.
+        self._connection = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._columns = {}
+        # Sheets known to have their change-counting triggers
+        self._counted = set()
+
+    @contextmanager
+    def _transaction(self):
+        with self._own_write():
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def _sheet_names(self):
+        return [name for (name,) in self._connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name != ? "
+            "ORDER BY rowid", (CHANGES_TABLE,)
+        )]
+
+    def _sheet_columns(self, sheet_name):
+        if sheet_name not in self._columns:
+            info = self._connection.execute(f"PRAGMA table_info({_quote(sheet_name)})").fetchall()
+            if not info:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            self._columns[sheet_name] = [name for _, name, *_ in info if name != ROW_ID]
+        return self._columns[sheet_name]
+
+    def _create_tables(self, connection, sheets):
+        for sheet_name, columns in sheets.items():
+            column_sql = ", ".join(_quote(col) for col in columns)
+            connection.execute(f"CREATE TABLE {_quote(sheet_name)} ({ROW_ID} INTEGER PRIMARY KEY, {column_sql})")
+            self._columns[sheet_name] = list(columns)
+            self._count_changes(connection, sheet_name)
+
+    def _count_changes(self, connection, sheet_name):
+        """Add the triggers counting a sheet's updates and deletes in CHANGES_TABLE
+
+        Inserts aren't counted: each one changes the row count or the largest
+        key, which are cheap to read, and a bulk insert doesn't pay for a
+        trigger per row. Tables from before the triggers get them here too.
+        """
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (sheet TEXT PRIMARY KEY, changes INTEGER)")
+        connection.execute(f"INSERT OR IGNORE INTO {CHANGES_TABLE} VALUES (?, 0)", (sheet_name,))
+        for event in ("UPDATE", "DELETE"):
+            connection.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {_quote(f'{CHANGES_TABLE} {event} {sheet_name}')} "
+                f"AFTER {event} ON {_quote(sheet_name)} BEGIN "
+                f"UPDATE {CHANGES_TABLE} SET changes = changes + 1 WHERE sheet = {_literal(sheet_name)}; END"
+            )
+        self._counted.add(sheet_name)
+
+    def _insert_rows(self, connection, sheet_name, rows):
+        columns = self._sheet_columns(sheet_name)
+        width = len(columns)
+        sql = (f"INSERT INTO {_quote(sheet_name)} ({', '.join(_quote(col) for col in columns)}) "
+               f"VALUES ({', '.join('?' * width)})")
+        before = connection.total_changes
+        connection.executemany(sql, (
+            [_sql_value(value) for value in values[:width]] + [None] * (width - len(values))
+            for values in rows
+        ))
+        return connection.total_changes - before
+
+    def create(self, sheets):
+        with self._transaction() as connection:
+            for sheet_name in self._sheet_names():
+                connection.execute(f"DROP TABLE {_quote(sheet_name)}")
+            connection.execute(f"DROP TABLE IF EXISTS {CHANGES_TABLE}")
+            self._columns.clear()
+            self._counted.clear()
+            self._create_tables(connection, sheets)
+        self.spool.discard(len(self.spool))
+
+    def sheet_headers(self):
+        with self._lock:
+            return {sheet_name: list(self._sheet_columns(sheet_name)) for sheet_name in self._sheet_names()}
+
+    def add_sheets(self, sheets):
+        with self._transaction() as connection:
+            self._create_tables(connection, sheets)
+
+    def iter_keyed_rows(self, sheet_name):
+        with self._lock:
+            self._observe(self._file_signature())
+            columns = ", ".join(_quote(col) for col in self._sheet_columns(sheet_name))
+            for row in self._connection.execute(
+                f"SELECT {ROW_ID}, {columns} FROM {_quote(sheet_name)} ORDER BY {ROW_ID}"
+            ):
+                yield row[0], row[1:]
+
+    def get_row(self, sheet_name, row_id):
+        """One row, looked up by primary key"""
+        with self._lock:
+            self._observe(self._file_signature())
+            columns = ", ".join(_quote(col) for col in self._sheet_columns(sheet_name))
+            return self._connection.execute(
+                f"SELECT {columns} FROM {_quote(sheet_name)} WHERE {ROW_ID} = ?", (row_id,)
+            ).fetchone()
+
+    def iter_keyed_chunks(self, sheet_name, chunk_size=10000):
+        """Pages of rows in primary key order, each read by one query under the lock"""
+        after = ""
+        while True:
+            with self._lock:
+                self._observe(self._file_signature())
+                columns = ", ".join(_quote(col) for col in self._sheet_columns(sheet_name))
+                rows = self._connection.execute(
+                    f"SELECT {ROW_ID}, {columns} FROM {_quote(sheet_name)} {after} ORDER BY {ROW_ID} LIMIT ?",
+                    (chunk_size,)
+                ).fetchall()
+            if rows:
+                yield [(row[0], row[1:]) for row in rows]
+            if len(rows) < chunk_size:
+                return
+            after = f"WHERE {ROW_ID} > {int(rows[-1][0])}"
+
+    def tail_keyed_rows(self, sheet_name, count):
+        """The last `count` rows, found by walking the primary key backwards"""
+        with self._lock:
+            self._observe(self._file_signature())
+            columns = ", ".join(_quote(col) for col in self._sheet_columns(sheet_name))
+            rows = self._connection.execute(
+                f"SELECT {ROW_ID}, {columns} FROM {_quote(sheet_name)} ORDER BY {ROW_ID} DESC LIMIT ?", (count,)
+            ).fetchall()
+            return [(row[0], row[1:]) for row in reversed(rows)]
+
+    def column_values(self, sheet_name):
+        """A SELECT DISTINCT per column, on a connection of its own
+
+        The shared connection isn't touched, so the I/O thread's writes go on
+        meanwhile; a write only waits for the one column being read to finish.
+        """
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            info = connection.execute(f"PRAGMA table_info({_quote(sheet_name)})").fetchall()
+            if not info:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            return [
+                {value for (value,) in connection.execute(
+                    f"SELECT DISTINCT {_quote(name)} FROM {_quote(sheet_name)} "
+                    f"WHERE {_quote(name)} IS NOT NULL AND {_quote(name)} != ''"
+                )}
+                for _, name, *_ in info if name != ROW_ID
+            ]
+        finally:
+            connection.close()
+
+    def sheet_fingerprints(self):
+        """(row count, largest key, updates and deletes) of every table
+
+        No row is read and hashed: COUNT(*) only walks the table's b-tree,
+        MAX() of the key is one seek and the counter is one row of CHANGES_TABLE.
+        """
+        with self._lock:
+            self._observe(self._file_signature())
+            sheet_names = self._sheet_names()
+            uncounted = [sheet_name for sheet_name in sheet_names if sheet_name not in self._counted]
+            if uncounted:
+                try:
+                    with self._transaction() as connection:
+                        for sheet_name in uncounted:
+                            self._count_changes(connection, sheet_name)
+                except sqlite3.OperationalError:
+                    # A read-only file: others' updates go unnoticed, their appends don't
+                    self._counted.difference_update(uncounted)
+            changes = {}
+            if self._counted:
+                changes = dict(self._connection.execute(f"SELECT sheet, changes FROM {CHANGES_TABLE}"))
+            fingerprints = {}
+            for sheet_name in sheet_names:
+                count, last = self._connection.execute(
+                    f"SELECT COUNT(*), MAX({ROW_ID}) FROM {_quote(sheet_name)}"
+                ).fetchone()
+                fingerprints[sheet_name] = (count, last, changes.get(sheet_name))
+            return self.generation, fingerprints
+
+    def append_row(self, sheet_name, values):
+        return self.append_rows(sheet_name, [values])[0]
+
+    def append_rows(self, sheet_name, rows):
+        with self._transaction() as connection:
+            # Without AUTOINCREMENT each new key is the largest one so far plus one
+            (last,) = connection.execute(
+                f"SELECT COALESCE(MAX({ROW_ID}), 0) FROM {_quote(sheet_name)}"
+            ).fetchone()
+            count = self._insert_rows(connection, sheet_name, rows)
+            return list(range(last + 1, last + 1 + count))
+
+    def bulk_append(self, sheet_name, rows, column_count):
+        """Insert every row in one transaction; a failure or cancel leaves the table untouched"""
+        with self._transaction() as connection:
+            return self._insert_rows(connection, sheet_name, rows)
+
+    def update_row(self, sheet_name, row_id, values, expected=None):
+        """Overwrite one row with a single UPDATE by primary key"""
+        with self._transaction() as connection:
+            columns = self._sheet_columns(sheet_name)
+            if expected is not None:
+                # Checked inside the write transaction, so no one can change the row in between
+                current = connection.execute(
+                    f"SELECT {', '.join(_quote(col) for col in columns)} FROM {_quote(sheet_name)} "
+                    f"WHERE {ROW_ID} = ?", (row_id,)
+                ).fetchone()
+                if current is None:
+                    raise LookupError(f"Row {row_id} does not exist in '{sheet_name}'.")
+                self._check_expected(sheet_name, row_id, current, expected)
+            assignments = ", ".join(f"{_quote(col)} = ?" for col in columns)
+            padded = [_sql_value(value) for value in values[:len(columns)]]
+            padded += [None] * (len(columns) - len(padded))
+            cursor = connection.execute(
+                f"UPDATE {_quote(sheet_name)} SET {assignments} WHERE {ROW_ID} = ?",
+                padded + [row_id]
+            )
+            if cursor.rowcount != 1:
+                raise LookupError(f"Row {row_id} does not exist in '{sheet_name}'.")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,181 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+
+from backends import DEFAULT_EXCEL_FILE, open_session, read_app_config
+from exporter import write_rows
+from importer import auto_mapping
+from storage import FileChangedError, RowConflictError
+
+
+def _sheet_columns(session, sheet_name):
+    headers = session.sheet_headers()
+    if sheet_name not in headers:
+        raise KeyError(f"No sheet named '{sheet_name}'. Sheets: {', '.join(headers)}")
+    return headers[sheet_name]
+
+
+def _records(stream, fmt, columns):
+    """Yield (line number, record) from JSON lines, a JSON array or CSV with a header line
+
+    A record is a list of values in column order, or a dict keyed by column
+    name; CSV columns are matched to the sheet's by name.
+    """
+    if fmt == "csv":
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        mapping = auto_mapping(header, columns)
+        if all(idx is None for idx in mapping.values()):
+            raise ValueError("None of the CSV columns match the sheet's columns.")
+        for line, record in enumerate(reader, start=2):
+            if any(record):
+                yield line, {col: record[idx] for col, idx in mapping.items() if idx is not None and idx < len(record)}
+    elif fmt == "json":
+        records = json.load(stream)
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON array of rows.")
+        yield from enumerate(records, start=1)
+    else:
+        for line, text in enumerate(stream, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError as e:
+                    raise ValueError(f"Line {line}: {e}") from None
+
+
+def _checked_rows(records, columns, allow_blank):
+    """Turn records into rows of the sheet, refusing incomplete ones like the entry form does
+
+    Raising aborts the whole append, and nothing is written.
+    """
+    names = [str(col) for col in columns]
+    for line, record in records:
+        if isinstance(record, dict):
+            unknown = set(map(str, record)) - set(names)
+            if unknown:
+                raise ValueError(f"Line {line}: unknown column(s) {', '.join(sorted(unknown))}")
+            record = {str(key): value for key, value in record.items()}
+            values = [record.get(name) for name in names]
+        elif isinstance(record, list):
+            if len(record) > len(columns):
+                raise ValueError(f"Line {line}: {len(record)} values for {len(columns)} columns")
+            values = record + [None] * (len(columns) - len(record))
+        else:
+            raise ValueError(f"Line {line}: expected a list or an object")
+        values = [value.strip() if isinstance(value, str) else value for value in values]
+        if not allow_blank:
+            missing = [name for name, value in zip(names, values) if value is None or value == ""]
+            if missing:
+                raise ValueError(f"Line {line}: missing {', '.join(missing)}")
+        yield values
+
+
+def list_sheets(session, args):
+    for sheet_name, columns in session.sheet_headers().items():
+        if args.format == "json":
+            print(json.dumps({"sheet": sheet_name, "columns": columns}, default=str))
+        else:
+            print(f"{sheet_name}: {', '.join(map(str, columns))}")
+
+
+def append(session, args):
+    columns = _sheet_columns(session, args.sheet)
+    stream = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8-sig")
+    with stream:
+        rows = _checked_rows(_records(stream, args.format, columns), columns, args.allow_blank)
+        # One write for the whole input; if any row is rejected nothing is stored
+        count = session.bulk_append(args.sheet, rows, len(columns))
+    print(f"Appended {count} row(s) to '{args.sheet}'.", file=sys.stderr)
+
+
+def dump(session, args):
+    columns = _sheet_columns(session, args.sheet)
+    write_rows(sys.stdout, args.format, columns, session.iter_keyed_rows(args.sheet), args.ids)
+
+
+def update(session, args):
+    columns = _sheet_columns(session, args.sheet)
+    names = [str(col) for col in columns]
+    changes = {}
+    for assignment in args.values:
+        name, sep, value = assignment.partition("=")
+        if not sep or name not in names:
+            raise ValueError(f"Expected COLUMN=VALUE with one of: {', '.join(names)} (got '{assignment}')")
+        changes[name] = value
+    current = session.get_row(args.sheet, args.row)
+    if current is None:
+        raise LookupError(f"Row {args.row} does not exist in '{args.sheet}'.")
+    current = list(current) + [None] * (len(names) - len(current))
+    values = [changes.get(name, value) for name, value in zip(names, current)]
+    # Refused if someone changes the row between our read and the write
+    session.update_row(args.sheet, args.row, values, expected=current)
+    print(f"Updated row {args.row} of '{args.sheet}'.", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Work with a data entry file without the GUI (for scripts, cron jobs and servers)."
+    )
+    saved = read_app_config()
+    default_file = saved["excel_path"] if saved else DEFAULT_EXCEL_FILE
+    parser.add_argument("-f", "--file", default=default_file,
+                        help=f"the .xlsx or SQLite data file (default: the one the app was set up "
+                             f"with, now {default_file})")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+
+    sheets = commands.add_parser("sheets", help="list the sheets and their columns")
+    sheets.add_argument("--format", choices=["text", "json"], default="text")
+    sheets.set_defaults(run=list_sheets)
+
+    append_parser = commands.add_parser("append", help="append rows read from stdin or a file")
+    append_parser.add_argument("sheet")
+    append_parser.add_argument("input", nargs="?", default="-", help="file to read (default: stdin)")
+    append_parser.add_argument("--format", choices=["jsonl", "json", "csv"], default="jsonl",
+                               help="JSON lines (default), a JSON array, or CSV with a header line; "
+                                    "JSON rows are arrays in column order or objects keyed by column")
+    append_parser.add_argument("--allow-blank", action="store_true",
+                               help="accept rows with empty columns instead of rejecting the input")
+    append_parser.set_defaults(run=append)
+
+    dump_parser = commands.add_parser("dump", help="write a sheet's rows to stdout")
+    dump_parser.add_argument("sheet")
+    dump_parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    dump_parser.add_argument("--ids", action="store_true", help="include each row's id, as used by 'update'")
+    dump_parser.set_defaults(run=dump)
+
+    update_parser = commands.add_parser("update", help="change columns of one row")
+    update_parser.add_argument("sheet")
+    update_parser.add_argument("row", type=int, help="row id (the Excel row number, or the SQLite key)")
+    update_parser.add_argument("values", nargs="+", metavar="COLUMN=VALUE")
+    update_parser.set_defaults(run=update)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if not os.path.exists(args.file):
+            # Checked first: connecting to a missing SQLite file would create it
+            raise FileNotFoundError(f"Data file not found: {args.file}")
+        session = open_session(args.file)
+        args.run(session, args)
+        session.close()
+    except BrokenPipeError:
+        # Output piped into something like `head` that stopped reading
+        sys.stderr.close()
+        return 0
+    except (OSError, ValueError, LookupError, RowConflictError, FileChangedError, sqlite3.Error) as e:
+        print(f"error: {e.args[0] if isinstance(e, KeyError) and e.args else e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+from bisect import bisect_left, insort
+
+
+# Suggestions listed under a field at most
+SUGGESTIONS = 8
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+class PrefixIndex:
+    """A column's distinct values in sorted order, for completing what is typed into a field
+
+    Values are matched ignoring case. The values starting with a prefix sit
+    next to each other in the sorted keys, so one binary search finds them
+    and a lookup costs the same with a hundred values or a hundred thousand.
+    A value is shown the way it was first seen.
+    """
+    def __init__(self, values=()):
+        self._keys = []
+        self._texts = {}
+        self.update(values)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return map(self._texts.__getitem__, self._keys)
+
+    def update(self, values):
+        """Add values, skipping blank ones and ones already known"""
+        texts = self._texts
+        new = {}
+        for value in values:
+            text = _text(value)
+            key = text.casefold()
+            if text and key not in texts and key not in new:
+                new[key] = text
+        if not new:
+            return
+        texts.update(new)
+        keys = self._keys
+        if len(new) < 32:
+            # A submitted row: a binary search and a memmove each
+            for key in new:
+                insort(keys, key)
+        else:
+            # A load's worth: the two sorted runs are merged in one pass of sort()
+            keys.extend(sorted(new))
+            keys.sort()
+
+    def complete(self, prefix, limit=SUGGESTIONS):
+        """Up to `limit` values starting with `prefix` (ignoring case), in sorted order"""
+        key = prefix.lstrip().casefold()
+        if not key:
+            return []
+        keys = self._keys
+        start = bisect_left(keys, key)
+        matches = []
+        for index in range(start, min(len(keys), start + limit)):
+            if not keys[index].startswith(key):
+                break
+            matches.append(self._texts[keys[index]])
+        return matches
+
+
+def column_indexes(session, sheet_name):
+    """A PrefixIndex of each column of a sheet, from session.column_values()"""
+    return [PrefixIndex(values) for values in session.column_values(sheet_name)]
@@ -1,24 +1,108 @@
+import time
+
+# Startup timing report: counts from before the imports below
+_IMPORTS_STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import openpyxl
+import tkinter.font as tkfont
+import argparse
 import os
+from array import array
 
+from backends import (DEFAULT_EXCEL_FILE, DEFAULT_PREVIEW_ROWS, SQLITE_EXTENSIONS, is_sqlite_path,
+                      open_session, read_app_config, write_app_config)
+from completion import PrefixIndex, column_indexes
+from diagnostics import file_bytes, metrics
+from exporter import ExportCancelled, ExportProgress, export_format, export_sheet
+from importer import ImportCancelled, ImportProgress, auto_mapping, import_file, read_source_header
+from rowstore import RowStore
+from search import RowIndex
+from sorting import SortCache
+from storage import FileLockedError, IOCancelled, IOExecutor, RowConflictError
 
 
-# Configuration
-DEFAULT_EXCEL_FILE = r"sample.xlsx"
 
+# Configuration
 # Column definitions - will be set dynamically
 COLUMNS = []
 DISPLAY_COLUMNS = []
 
+# Pause in typing before the full view's filter runs
+FILTER_DELAY_MS = 200
+# How often the data file is checked for changes made by other users
+WATCH_INTERVAL_MS = 1000
+# How often an open diagnostics window looks for new timings
+DIAGNOSTICS_REFRESH_MS = 1000
+ALL_COLUMNS = "All columns"
+
 
 class Config:
-    """Configuration manager with multi-sheet support"""
-    def __init__(self):
+    """Configuration manager with multi-sheet support
+
+    The console setup runs once; its result is saved and later starts load
+    that instead (setup=True runs the setup again).
+    """
+    def __init__(self, setup=False):
         self.excel_path = None
         self.sheets = {}  # {sheet_name: {'columns': [], 'display_columns': []}}
-        self.load_config()
+        self.preview_rows = DEFAULT_PREVIEW_ROWS
+        self._session = None
+        if setup or not self._load_saved_config():
+            self.load_config()
+            if self.excel_path and self.sheets:
+                self.save_config()
+    
+    @property
+    def session(self):
+        """Shared storage session for the current data file (.xlsx or SQLite)"""
+        if self._session is None or self._session.path != self.excel_path:
+            self._session = open_session(self.excel_path)
+        return self._session
+    
+    def _load_saved_config(self):
+        """Use the file and sheets from the last setup; False if there is no usable saved setup
+
+        Columns come from the file's headers (read from the schema cache on an
+        unchanged file), in case the structure changed since the setup.
+        """
+        saved = read_app_config()
+        if saved is None or not os.path.exists(saved['excel_path']):
+            return False
+        self.excel_path = saved['excel_path']
+        preview_rows = saved.get('preview_rows')
+        if isinstance(preview_rows, int) and preview_rows > 0:
+            self.preview_rows = preview_rows
+        try:
+            with metrics.span("read headers") as record:
+                headers = self.session.sheet_headers()
+                record["bytes"] = file_bytes(self.excel_path)
+        except Exception as e:
+            print(f"\n✗ Error loading file: {e}")
+            self.excel_path = None
+            return False
+        
+        for sheet_name, sheet_config in saved['sheets'].items():
+            columns = headers.get(sheet_name)
+            if not columns:
+                continue
+            display_columns = [col for col in sheet_config.get('display_columns', []) if col in columns]
+            self.sheets[sheet_name] = {
+                'columns': columns,
+                'display_columns': display_columns or columns[:min(4, len(columns))]
+            }
+        if not self.sheets:
+            self.excel_path = None
+            return False
+        print(f"\n✓ Loaded Excel file: {self.excel_path} (saved setup; start with --setup to change it)")
+        return True
+    
+    def save_config(self):
+        """Remember the file and sheet choices so the next start skips the setup"""
+        try:
+            write_app_config(self.excel_path, self.sheets, self.preview_rows)
+        except OSError as e:
+            print(f"\n⚠ Could not save the setup, it will be asked for again next time: {e}")
     
     def load_config(self):
         """Load or prompt for Excel file location"""
@@ -44,7 +128,11 @@ class Config:
                     root.withdraw()
                     path = filedialog.askopenfilename(
                         title="Select Excel File",
-                        filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+                        filetypes=[
+                            ("Excel files", "*.xlsx"),
+                            ("SQLite databases", " ".join("*" + ext for ext in SQLITE_EXTENSIONS)),
+                            ("All files", "*.*")
+                        ]
                     )
                     root.destroy()
                     
@@ -173,29 +261,22 @@ class Config:
         print("CREATING EXCEL FILE")
         print("="*60)
         
+        print("Use a .db extension to store the data in a SQLite database instead.")
         file_path = input(f"\nEnter file path (press Enter for '{DEFAULT_EXCEL_FILE}'): ").strip()
         
         if not file_path:
             file_path = DEFAULT_EXCEL_FILE
         
-        if not file_path.endswith('.xlsx'):
+        if not file_path.endswith('.xlsx') and not is_sqlite_path(file_path):
             file_path += '.xlsx'
         
         try:
-            workbook = openpyxl.Workbook()
-            
-            # Remove default sheet
-            if 'Sheet' in workbook.sheetnames:
-                del workbook['Sheet']
-            
-            # Create all sheets with headers
-            for sheet_name, sheet_config in self.sheets.items():
-                sheet = workbook.create_sheet(title=sheet_name)
-                sheet.append(sheet_config['columns'])
-            
-            workbook.save(file_path)
-            
             self.excel_path = file_path
+            # Create all sheets with headers
+            self.session.create({
+                sheet_name: sheet_config['columns']
+                for sheet_name, sheet_config in self.sheets.items()
+            })
             print(f"\n✓ Successfully created: {file_path}")
             print(f"✓ Total sheets: {len(self.sheets)}")
             for sheet_name in self.sheets:
@@ -209,23 +290,22 @@ class Config:
     def _load_from_existing_file(self):
         """Load sheets and columns from existing Excel file"""
         try:
-            workbook = openpyxl.load_workbook(self.excel_path)
+            # Headers only (cached per file content); the data is streamed later when a view needs it
+            with metrics.span("read headers") as record:
+                headers = self.session.sheet_headers()
+                record["bytes"] = file_bytes(self.excel_path)
             
             print(f"\n✓ Loaded Excel file: {self.excel_path}")
-            print(f"✓ Found {len(workbook.sheetnames)} sheet(s)")
+            print(f"✓ Found {len(headers)} sheet(s)")
             
             # Ask if user wants to edit existing structure
             edit_choice = input("\nWould you like to edit the sheet structure? (yes/no): ").strip().lower()
             
             if edit_choice in ['yes', 'y']:
-                self._edit_existing_file(workbook)
+                self._edit_existing_file(headers)
             else:
                 # Just load existing structure
-                for sheet_name in workbook.sheetnames:
-                    sheet = workbook[sheet_name]
-                    first_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-                    columns = [col for col in first_row if col is not None]
-                    
+                for sheet_name, columns in headers.items():
                     if columns:
                         display_columns = columns[:min(4, len(columns))]
                         self.sheets[sheet_name] = {
@@ -242,14 +322,14 @@ class Config:
             print(f"\n✗ Error loading file: {e}")
             self.excel_path = None
     
-    def _edit_existing_file(self, workbook):
+    def _edit_existing_file(self, headers):
         """Edit existing Excel file structure"""
         print("\n" + "="*60)
         print("EDIT EXISTING FILE")
         print("="*60)
         
         print("\nCurrent sheets:")
-        for idx, sheet_name in enumerate(workbook.sheetnames, 1):
+        for idx, sheet_name in enumerate(headers, 1):
             print(f"  {idx}. {sheet_name}")
         
         print("\nOptions:")
@@ -261,11 +341,7 @@ class Config:
         
         if choice == '1':
             # Keep all sheets
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                first_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-                columns = [col for col in first_row if col is not None]
-                
+            for sheet_name, columns in headers.items():
                 if columns:
                     display_columns = columns[:min(4, len(columns))]
                     self.sheets[sheet_name] = {
@@ -280,14 +356,12 @@ class Config:
             
             try:
                 indices = [int(x.strip()) for x in selection.split(',')]
-                sheet_names = workbook.sheetnames
+                sheet_names = list(headers)
                 
                 for idx in indices:
                     if 1 <= idx <= len(sheet_names):
                         sheet_name = sheet_names[idx-1]
-                        sheet = workbook[sheet_name]
-                        first_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-                        columns = [col for col in first_row if col is not None]
+                        columns = headers[sheet_name]
                         
                         if columns:
                             display_columns = columns[:min(4, len(columns))]
@@ -297,7 +371,7 @@ class Config:
                             }
             except:
                 print("⚠ Invalid input. Loading all sheets.")
-                self._edit_existing_file(workbook)
+                self._edit_existing_file(headers)
         
         elif choice == '3':
             # Add new sheets
@@ -305,38 +379,53 @@ class Config:
             try:
                 num_new = int(num_new)
                 if 1 <= num_new <= 5:
+                    new_sheets = {}
                     for i in range(num_new):
                         sheet_name = input(f"\nNew sheet {i+1} name: ").strip()
-                        if sheet_name and sheet_name not in workbook.sheetnames:
+                        if sheet_name and sheet_name not in headers and sheet_name not in new_sheets:
                             columns = self._setup_columns_for_sheet(sheet_name)
                             display_columns = self._setup_display_columns(columns)
-                            
-                            # Create sheet in workbook
-                            new_sheet = workbook.create_sheet(title=sheet_name)
-                            new_sheet.append(columns)
+                            new_sheets[sheet_name] = columns
                             
                             self.sheets[sheet_name] = {
                                 'columns': columns,
                                 'display_columns': display_columns
                             }
                     
-                    # Save updated workbook
-                    workbook.save(self.excel_path)
+                    # Create the sheets and save the file once
+                    self.session.add_sheets(new_sheets)
                     print(f"\n✓ Added {num_new} new sheet(s) and saved to {self.excel_path}")
             except:
                 print("⚠ Invalid input.")
 
 
 class PlaceholderEntry(ttk.Entry):
-    """Entry widget with proper placeholder support"""
-    def __init__(self, master, placeholder="", **kwargs):
+    """Entry widget with proper placeholder support
+
+    Given `suggest`, a function from the text typed so far to a list of
+    values, the values are listed under the field while typing: Down and Up
+    pick one, Return or Tab takes it (as does a click), Escape closes the
+    list. Taking one generates <<SuggestionChosen>>.
+    """
+    def __init__(self, master, placeholder="", suggest=None, **kwargs):
         super().__init__(master, **kwargs)
         self.placeholder = placeholder
         self.placeholder_color = 'gray60'
         self.default_fg_color = 'black'
+        self.suggest = suggest
+        self._popup = None
+        self._listbox = None
+        self._suggested_for = None
         
         self.bind("<FocusIn>", self._on_focus_in)
         self.bind("<FocusOut>", self._on_focus_out)
+        if suggest is not None:
+            self.bind("<KeyRelease>", self._on_key_release, add="+")
+            self.bind("<Down>", lambda e: self._move_selection(1))
+            self.bind("<Up>", lambda e: self._move_selection(-1))
+            self.bind("<Return>", self._accept_selection)
+            self.bind("<Tab>", self._accept_selection)
+            self.bind("<Escape>", lambda e: self._hide_suggestions())
         
         self._show_placeholder()
     
@@ -351,6 +440,7 @@ class PlaceholderEntry(ttk.Entry):
             self.config(foreground=self.default_fg_color)
     
     def _on_focus_out(self, event):
+        self._hide_suggestions()
         if not self.get():
             self._show_placeholder()
     
@@ -358,13 +448,80 @@ class PlaceholderEntry(ttk.Entry):
         """Get actual value (empty string if placeholder)"""
         value = self.get()
         return "" if value == self.placeholder else value
+    
+    def _on_key_release(self, event):
+        # Keys that don't change the text (arrows, Shift...) leave the list as it is
+        text = self.get_value()
+        if text != self._suggested_for:
+            self._suggested_for = text
+            self._show_suggestions(text)
+    
+    def _show_suggestions(self, text):
+        suggestions = self.suggest(text) if text else []
+        if not suggestions or suggestions == [text]:
+            self._hide_suggestions()
+            return
+        if self._popup is None:
+            self._popup = tk.Toplevel(self)
+            self._popup.wm_overrideredirect(True)
+            self._listbox = tk.Listbox(self._popup, exportselection=False, takefocus=0,
+                                       width=int(str(self.cget("width"))))
+            self._listbox.pack(fill=tk.BOTH, expand=True)
+            # On press, and stopping the Listbox bindings, so the field keeps the focus
+            self._listbox.bind("<ButtonPress-1>", self._on_suggestion_click)
+        self._listbox.delete(0, tk.END)
+        self._listbox.insert(tk.END, *suggestions)
+        self._listbox.configure(height=len(suggestions))
+        self._popup.wm_geometry(f"+{self.winfo_rootx()}+{self.winfo_rooty() + self.winfo_height()}")
+        self._popup.deiconify()
+        self._popup.lift()
+    
+    def _hide_suggestions(self):
+        if self._popup is not None:
+            self._popup.withdraw()
+    
+    def _suggestions_shown(self):
+        return self._popup is not None and self._popup.winfo_viewable()
+    
+    def _move_selection(self, step):
+        if not self._suggestions_shown():
+            self._show_suggestions(self.get_value())
+            return "break"
+        selection = self._listbox.curselection()
+        index = selection[0] + step if selection else (0 if step > 0 else self._listbox.size() - 1)
+        index = max(0, min(index, self._listbox.size() - 1))
+        self._listbox.selection_clear(0, tk.END)
+        self._listbox.selection_set(index)
+        self._listbox.see(index)
+        return "break"
+    
+    def _accept_selection(self, event):
+        """Return/Tab: take the picked suggestion; without one the key does what it normally does"""
+        if not self._suggestions_shown() or not self._listbox.curselection():
+            self._hide_suggestions()
+            return None
+        self._choose(self._listbox.get(self._listbox.curselection()[0]))
+        return "break"
+    
+    def _on_suggestion_click(self, event):
+        self._choose(self._listbox.get(self._listbox.nearest(event.y)))
+        return "break"
+    
+    def _choose(self, value):
+        self._hide_suggestions()
+        self.delete(0, tk.END)
+        self.insert(0, value)
+        self.icursor(tk.END)
+        self.config(foreground=self.default_fg_color)
+        self._suggested_for = value
+        self.event_generate("<<SuggestionChosen>>")
 
 
 class UpdateWindow(tk.Toplevel):
-    def __init__(self, master, parent_window, selected_item, config, sheet_name, **kwargs):
+    def __init__(self, master, parent_window, row_id, config, sheet_name, **kwargs):
         super().__init__(master, **kwargs)
         self.parent_window = parent_window
-        self.selected_item = selected_item
+        self.row_id = row_id
         self.config = config
         self.sheet_name = sheet_name
         
@@ -372,11 +529,12 @@ class UpdateWindow(tk.Toplevel):
         self.resizable(False, False)
         self.geometry("450x550")
         
-        # Get current values
-        current_values = self.parent_window.whole_stored_data.item(selected_item)['values']
+        # Get current values; the save checks they are still what's stored
+        self.current_values = self.parent_window.whole_stored_data.get_row(row_id)
         
         self.entries = {}
-        self._create_widgets(current_values)
+        with metrics.span("open update window", sheet_name):
+            self._create_widgets(self.current_values)
     
     def _create_widgets(self, current_values):
         main_frame = ttk.Frame(self, padding="10")
@@ -407,7 +565,8 @@ class UpdateWindow(tk.Toplevel):
             )
             entry = ttk.Entry(scrollable_frame, width=40)
             entry.grid(row=idx, column=1, sticky="ew", pady=5, padx=5)
-            entry.insert(0, current_values[idx] if idx < len(current_values) else "")
+            value = current_values[idx] if idx < len(current_values) else None
+            entry.insert(0, "" if value is None else value)
             self.entries[col] = entry
         
         canvas.grid(row=0, column=0, sticky="nsew")
@@ -420,50 +579,567 @@ class UpdateWindow(tk.Toplevel):
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=1, column=0, columnspan=2, pady=10)
         
-        ttk.Button(button_frame, text="Save", command=self.save_update).pack(side=tk.LEFT, padx=5)
+        self.save_button = ttk.Button(button_frame, text="Save", command=self.save_update)
+        self.save_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Cancel", command=self.destroy).pack(side=tk.LEFT, padx=5)
     
     def save_update(self):
         columns = self.config.sheets[self.sheet_name]['columns']
         new_values = tuple(self.entries[col].get() for col in columns)
         
-        try:
-            # Update Treeview
-            self.parent_window.whole_stored_data.item(self.selected_item, values=new_values)
-            
-            # Update Excel
-            workbook = openpyxl.load_workbook(self.config.excel_path)
-            sheet = workbook[self.sheet_name]
-            
-            item_index = self.parent_window.whole_stored_data.index(self.selected_item)
-            excel_row = item_index + 2
-            
-            for col_idx, value in enumerate(new_values, start=1):
-                sheet.cell(row=excel_row, column=col_idx, value=value)
-            
-            workbook.save(self.config.excel_path)
-            messagebox.showinfo("Success", "Data updated successfully!")
+        # Write to Excel off the UI thread; the row id addresses exactly this row
+        self.save_button.configure(state="disabled")
+        self.parent_window.executor.submit(
+            metrics.timed("update row", self.sheet_name, self.config.session.update_row,
+                          measure=_saved_stats(self.config.excel_path, 1)),
+            self.sheet_name, self.row_id, new_values, self.current_values,
+            on_done=lambda _: self._on_saved(new_values),
+            on_error=self._on_save_error,
+            description=f"Updating row in '{self.sheet_name}'..."
+        )
+    
+    def _on_saved(self, new_values):
+        # Update the one changed item in the open views
+        if self.parent_window.winfo_exists():
+            self.parent_window.row_updated(self.row_id, new_values)
+        messagebox.showinfo("Success", "Data updated successfully!")
+        if self.winfo_exists():
             self.destroy()
-            
-        except FileNotFoundError:
+    
+    def _on_save_error(self, error):
+        if self.winfo_exists():
+            self.save_button.configure(state="normal")
+        if isinstance(error, FileNotFoundError):
             messagebox.showerror("Error", f"Excel file not found: {self.config.excel_path}")
-        except PermissionError:
+        elif isinstance(error, RowConflictError):
+            messagebox.showwarning(
+                "Row Changed",
+                "Someone else changed this row after you opened it, so your update was not saved.\n"
+                "The view has been reloaded; please check the row and update it again."
+            )
+            if self.parent_window.winfo_exists():
+                self.parent_window.load_data()
+            if self.winfo_exists():
+                self.destroy()
+        elif isinstance(error, FileLockedError):
+            messagebox.showerror("Error", str(error))
+        elif isinstance(error, PermissionError):
             messagebox.showerror("Error", "File is open in another program. Please close it and try again.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to update: {str(error)}")
+
+
+class ImportWindow(tk.Toplevel):
+    """Map a CSV/XLSX file's columns onto a sheet and bulk-import it"""
+    NOT_MAPPED = "(not mapped)"
+    
+    def __init__(self, master, sheet_frame, source_path, header, **kwargs):
+        super().__init__(master, **kwargs)
+        self.sheet_frame = sheet_frame
+        self.config = sheet_frame.config
+        self.sheet_name = sheet_frame.sheet_name
+        self.executor = sheet_frame.executor
+        self.source_path = source_path
+        self.header = header
+        self.progress = None
+        
+        self.title(f"Import into {self.sheet_name}")
+        self.resizable(False, False)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+        
+        self.mapping_vars = {}
+        self._create_widgets()
+    
+    def _create_widgets(self):
+        main_frame = ttk.Frame(self, padding="10")
+        main_frame.grid(row=0, column=0, sticky="nsew")
+        
+        ttk.Label(
+            main_frame,
+            text=f"File: {os.path.basename(self.source_path)}",
+            font=('Arial', 10, 'bold')
+        ).grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 10))
+        
+        columns = self.config.sheets[self.sheet_name]['columns']
+        mapping = auto_mapping(self.header, columns)
+        choices = [self.NOT_MAPPED] + [name or f"Column {idx + 1}" for idx, name in enumerate(self.header)]
+        
+        # One source-column picker per sheet column
+        for idx, col in enumerate(columns, start=1):
+            ttk.Label(main_frame, text=f"{col}:").grid(row=idx, column=0, sticky="w", pady=3, padx=5)
+            var = tk.StringVar(value=choices[mapping[col] + 1] if mapping[col] is not None else self.NOT_MAPPED)
+            ttk.Combobox(main_frame, textvariable=var, values=choices, state="readonly", width=30).grid(
+                row=idx, column=1, sticky="ew", pady=3, padx=5
+            )
+            self.mapping_vars[col] = (var, choices)
+        
+        row = len(columns) + 1
+        self.status_label = ttk.Label(main_frame, text="Rows missing a value are written to a reject file.")
+        self.status_label.grid(row=row, column=0, columnspan=2, sticky="w", pady=(10, 5))
+        
+        self.progress_bar = ttk.Progressbar(main_frame, mode="indeterminate", length=300)
+        self.progress_bar.grid(row=row + 1, column=0, columnspan=2, sticky="ew")
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=row + 2, column=0, columnspan=2, pady=10)
+        
+        self.import_button = ttk.Button(button_frame, text="Import", command=self.start_import)
+        self.import_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=self.cancel).pack(side=tk.LEFT, padx=5)
+    
+    def _mapping(self):
+        """{sheet column: source column index or None} from the pickers"""
+        mapping = {}
+        for col, (var, choices) in self.mapping_vars.items():
+            choice = choices.index(var.get())
+            mapping[col] = choice - 1 if choice > 0 else None
+        return mapping
+    
+    def start_import(self):
+        mapping = self._mapping()
+        if all(idx is None for idx in mapping.values()):
+            messagebox.showwarning("Warning", "Map at least one column!", parent=self)
+            return
+        
+        self.import_button.configure(state="disabled")
+        self.progress = ImportProgress()
+        self.progress_bar.start(10)
+        self.executor.submit(
+            metrics.timed("import", self.sheet_name, import_file,
+                          measure=lambda progress: {"rows": progress.imported,
+                                                    "bytes": file_bytes(self.source_path)}),
+            self.config.session, self.sheet_name,
+            self.config.sheets[self.sheet_name]['columns'], self.source_path, mapping, self.progress,
+            on_done=self._on_imported,
+            on_error=self._on_import_error,
+            description=f"Importing into '{self.sheet_name}'..."
+        )
+        self._poll_progress()
+    
+    def _poll_progress(self):
+        if self.progress is None or not self.winfo_exists():
+            return
+        self.status_label.configure(
+            text=f"Read {self.progress.processed:,} rows: "
+                 f"{self.progress.imported:,} valid, {self.progress.rejected:,} rejected"
+        )
+        self.after(200, self._poll_progress)
+    
+    def _on_imported(self, progress):
+        self.progress = None
+        message = f"Imported {progress.imported:,} row(s) into '{self.sheet_name}'."
+        if progress.rejected:
+            message += f"\n\n{progress.rejected:,} row(s) were rejected and saved to:\n{progress.reject_path}"
+        messagebox.showinfo("Import Complete", message)
+        
+        # The file was rewritten, so the views do a full reload
+        if self.sheet_frame.winfo_exists():
+            self.sheet_frame.load_data()
+            viewer = self.sheet_frame.data_display_window
+            if viewer and viewer.winfo_exists():
+                viewer.load_data()
+        if self.winfo_exists():
+            self.destroy()
+    
+    def _on_import_error(self, error):
+        self.progress = None
+        if not self.winfo_exists():
+            return
+        self.progress_bar.stop()
+        self.import_button.configure(state="normal")
+        if isinstance(error, ImportCancelled):
+            self.status_label.configure(text="Import cancelled. Nothing was written.")
+        elif isinstance(error, FileLockedError):
+            messagebox.showerror("Error", str(error), parent=self)
+        elif isinstance(error, PermissionError):
+            messagebox.showerror("Error", "File is open in another program. Please close it and try again.", parent=self)
+        else:
+            messagebox.showerror("Error", f"Failed to import: {str(error)}", parent=self)
+    
+    def cancel(self):
+        """Stop a running import (nothing is written), or close the dialog"""
+        if self.progress is not None:
+            self.progress.cancel()
+            self.status_label.configure(text="Cancelling...")
+        else:
+            self.destroy()
+
+
+def _snapshot_stats(path):
+    """measure() for timed sheet loads: rows read, and the size of the file they came from"""
+    return lambda snapshot: {"rows": len(snapshot[1]), "bytes": file_bytes(path)}
+
+
+def _saved_stats(path, rows=None):
+    """measure() for timed saves: rows written (when known), and the size of the file afterwards"""
+    return lambda result: {"rows": rows, "bytes": file_bytes(path)}
+
+
+def refresh_view(view, changed, previous_generation, generation):
+    """Bring a view up to date after the file watcher read new sheet fingerprints
+
+    `view` is a SheetFrame or DataDisplayWindow. It is reloaded only if its
+    sheet's content changed, or if it was loaded from a file state the
+    watcher never fingerprinted, so nothing is known about it.
+    """
+    if view is None or not view.winfo_exists() or view._load_job is not None:
+        return
+    if view._loaded_generation == generation:
+        return
+    if not changed and view._loaded_generation == previous_generation:
+        # Someone else saved, but not this sheet: what's shown is still current
+        view._loaded_generation = generation
+    else:
+        view.load_data()
+
+
+def next_sort(sort, column):
+    """Sort after a click on a column heading: ascending, descending, then unsorted
+
+    A sort is (column index, descending), or None for storage order.
+    """
+    if sort is None or sort[0] != column:
+        return (column, False)
+    if not sort[1]:
+        return (column, True)
+    return None
+
+
+def label_headings(tree, columns, sort):
+    """Mark the sorted column's heading with an arrow"""
+    for index, col in enumerate(columns):
+        arrow = ""
+        if sort is not None and sort[0] == index:
+            arrow = " \u25bc" if sort[1] else " \u25b2"
+        tree.heading(col, text=col + arrow)
+
+
+class VirtualTreeview(ttk.Frame):
+    """Treeview that only materializes the rows currently on screen
+
+    Rows live in a RowStore (the columnar store a snapshot comes in); the
+    Treeview holds one item per visible line and those items are refilled as
+    the user scrolls, so Tk memory and open time don't grow with the length
+    of the sheet. A parallel array holds each row's storage row id, which is
+    how rows are addressed from outside.
+    set_filter() shows a subset of the rows and a click on a heading sorts by
+    that column; both only change which store index each line shows, so the
+    store itself is never reordered.
+    """
+    def __init__(self, master, columns, column_width=120, **kwargs):
+        super().__init__(master, **kwargs)
+        self.rows = RowStore()
+        self.row_ids = array("q")
+        # row id -> index into self.rows, built on the first lookup
+        self._index_by_id = None
+        # Store indices in display order, or None to show every row as stored
+        self._order = None
+        # Store indices let through by the filter (None: all), and the sort as
+        # (column index, descending) or None for storage order
+        self._filter = None
+        self._sort = None
+        self._sorter = None
+        self.columns = list(columns)
+        self._top = 0
+        self._visible = 1
+        self._selected = None
+        self._row_height = None
+        
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        
+        self.v_scroll = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        h_scroll = ttk.Scrollbar(self, orient="horizontal")
+        
+        self.tree = ttk.Treeview(
+            self,
+            columns=columns,
+            show="headings",
+            selectmode="browse",
+            xscrollcommand=h_scroll.set
+        )
+        h_scroll.config(command=self.tree.xview)
+        
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.v_scroll.grid(row=0, column=1, sticky="ns")
+        h_scroll.grid(row=1, column=0, sticky="ew")
+        
+        for column, col in enumerate(columns):
+            self.tree.heading(col, text=col, command=lambda column=column: self.sort_by(column))
+            self.tree.column(col, width=column_width)
+        
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "page_up"),
+                          ("<Next>", "page_down"), ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(key, lambda e, step=step: self._on_key(step))
+    
+    # --- Data -----------------------------------------------------------
+    
+    def set_rows(self, rows, row_ids, keep_position=False):
+        """Replace the whole row store and jump back to the top
+
+        keep_position keeps the scroll position and the selected row (if it
+        is still there), for a reload of the same sheet.
+        """
+        selected = self.selected_row_id() if keep_position else None
+        self.rows = rows
+        self.row_ids = row_ids
+        self._index_by_id = None
+        self._sorter = None
+        self._filter = None
+        self._order = None
+        self._selected = None
+        if selected is not None:
+            self._selected = self.index_of(selected)
+        if not keep_position:
+            self._top = 0
+        # A chosen sort carries over to the reloaded rows
+        self._apply_order(keep_position=True)
+    
+    def extend(self, rows, row_ids):
+        """Add rows at the end of the store (sorted into place if sorted), repainting once"""
+        start = len(self.rows)
+        self.rows.extend(rows)
+        self.row_ids.extend(row_ids)
+        if self._index_by_id is not None:
+            self._index_by_id.update((row_id, index) for index, row_id in enumerate(row_ids, start))
+        if self._sort is not None:
+            self._apply_order(keep_position=True)
+        else:
+            self._render()
+    
+    def append(self, values, row_id):
+        self.rows.append(values)
+        self.row_ids.append(row_id)
+        if self._index_by_id is not None:
+            self._index_by_id[row_id] = len(self.rows) - 1
+        if self._sort is not None:
+            self._apply_order(keep_position=True)
+        else:
+            self._render()
+    
+    def index_of(self, row_id):
+        """Position of a row in the store, or None if it isn't loaded"""
+        if self._index_by_id is None:
+            self._index_by_id = {row_id: index for index, row_id in enumerate(self.row_ids)}
+        return self._index_by_id.get(row_id)
+    
+    def update_row(self, row_id, values):
+        """Replace a row's values; returns its store index (None if not loaded)"""
+        index = self.index_of(row_id)
+        if index is not None:
+            old_values = self.rows[index]
+            self.rows[index] = values
+            if self._sorter is not None:
+                self._sorter.replace_row(index, old_values)
+            if self._sort is not None:
+                self._apply_order(keep_position=True)
+            else:
+                self._render()
+        return index
+    
+    def get_row(self, row_id):
+        return self.rows[self.index_of(row_id)]
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def selected_row_id(self):
+        """Row id of the selected row, or None"""
+        return None if self._selected is None else self.row_ids[self._store_index(self._selected)]
+    
+    def set_filter(self, positions, keep_position=False):
+        """Show only the rows at these store indices (None shows all)
+
+        keep_position keeps the scroll position and the selected row, for
+        when the filter was only re-run to take in new rows.
+        """
+        self._filter = positions
+        self._apply_order(keep_position)
+    
+    def sort_by(self, column):
+        """Heading click: sort on that column, keeping the selected row in view"""
+        self._sort = next_sort(self._sort, column)
+        label_headings(self.tree, self.columns, self._sort)
+        self._apply_order(keep_position=True, follow_selection=True)
+    
+    def _apply_order(self, keep_position=False, follow_selection=False):
+        """Work out the shown store indices from the filter and sort, and repaint"""
+        selected = None if self._selected is None else self._store_index(self._selected)
+        
+        if self._sort is None:
+            self._order = self._filter
+        else:
+            if self._sorter is None:
+                self._sorter = SortCache(self.rows)
+            order = self._sorter.order(*self._sort)
+            if self._filter is not None:
+                allowed = set(self._filter)
+                order = [index for index in order if index in allowed]
+            self._order = order
+        
+        self._selected = None
+        if keep_position:
+            if selected is not None and self._order is None:
+                self._selected = selected
+            elif selected is not None:
+                try:
+                    self._selected = self._order.index(selected)
+                except ValueError:
+                    # Filtered out
+                    pass
+            if follow_selection and self._selected is not None:
+                self._top = max(0, self._selected - self._visible // 2)
+            self._top = min(self._top, self._max_top())
+        else:
+            self._top = 0
+        self._render()
+    
+    def shown_count(self):
+        return len(self.rows) if self._order is None else len(self._order)
+    
+    def _store_index(self, line):
+        return line if self._order is None else self._order[line]
+    
+    # --- Scrolling ------------------------------------------------------
+    
+    def _max_top(self):
+        return max(0, self.shown_count() - self._visible)
+    
+    def scroll_to(self, top):
+        top = max(0, min(int(top), self._max_top()))
+        if top != self._top:
+            self._top = top
+            self._render()
+    
+    def scroll_rows(self, delta):
+        self.scroll_to(self._top + delta)
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.shown_count())
+        elif action == "scroll":
+            step = self._visible if unit == "pages" else 1
+            self.scroll_rows(int(amount) * step)
+    
+    def _on_mousewheel(self, event):
+        self.scroll_rows(-3 if event.delta > 0 else 3)
+        return "break"
+    
+    def _on_key(self, step):
+        count = self.shown_count()
+        if not count:
+            return "break"
+        current = self._selected if self._selected is not None else self._top
+        if step == "page_up":
+            target = current - self._visible
+        elif step == "page_down":
+            target = current + self._visible
+        elif step == "home":
+            target = 0
+        elif step == "end":
+            target = count - 1
+        else:
+            target = current + step
+        target = max(0, min(target, count - 1))
+        
+        self._selected = target
+        if target < self._top:
+            self._top = target
+        elif target >= self._top + self._visible:
+            self._top = target - self._visible + 1
+        self._render()
+        return "break"
+    
+    def _on_resize(self, event):
+        # Row height is only known once an item has been drawn; until then use the font
+        row_height = self._measure_row_height()
+        header_height = row_height + 4
+        visible = max(1, (event.height - header_height) // row_height)
+        if visible != self._visible:
+            self._visible = visible
+            self._top = min(self._top, self._max_top())
+            self._render()
+    
+    def _measure_row_height(self):
+        if self._row_height is None:
+            children = self.tree.get_children()
+            bbox = self.tree.bbox(children[0]) if children else None
+            if bbox:
+                self._row_height = bbox[3]
+            else:
+                style_height = ttk.Style().lookup("Treeview", "rowheight")
+                try:
+                    return int(style_height)
+                except (TypeError, ValueError):
+                    return tkfont.nametofont("TkDefaultFont").metrics("linespace") + 4
+        return self._row_height
+    
+    # --- Rendering ------------------------------------------------------
+    
+    def _render(self):
+        """Refill the on-screen items from the row store"""
+        if self._order is None:
+            window = self.rows[self._top:self._top + self._visible]
+        else:
+            window = [self.rows[index] for index in self._order[self._top:self._top + self._visible]]
+        slots = self.tree.get_children()
+        
+        # Grow or shrink the pool of slot items to the number of visible rows
+        for slot in slots[len(window):]:
+            self.tree.delete(slot)
+        for slot_index in range(len(slots), len(window)):
+            self.tree.insert("", tk.END, iid=str(slot_index))
+        
+        for slot_index, values in enumerate(window):
+            self.tree.item(str(slot_index), values=["" if value is None else value for value in values])
+        
+        selected_slot = None
+        if self._selected is not None and self._top <= self._selected < self._top + len(window):
+            selected_slot = str(self._selected - self._top)
+        self.tree.selection_set(selected_slot if selected_slot is not None else ())
+        if selected_slot is not None:
+            self.tree.focus(selected_slot)
+        
+        count = self.shown_count()
+        if count:
+            self.v_scroll.set(self._top / count, (self._top + len(window)) / count)
+        else:
+            self.v_scroll.set(0, 1)
+    
+    def _on_select(self, event):
+        # An empty selection just means the selected row scrolled out of view
+        selection = self.tree.selection()
+        if selection:
+            self._selected = self._top + int(selection[0])
 
 
 class DataDisplayWindow(tk.Toplevel):
-    def __init__(self, master, config, sheet_name, **kwargs):
+    def __init__(self, master, config, sheet_name, executor, sheet_frame=None, **kwargs):
         super().__init__(master, **kwargs)
         self.config = config
         self.sheet_name = sheet_name
+        self.executor = executor
+        self.sheet_frame = sheet_frame
+        self._load_job = None
+        self._loaded_generation = None
+        # Search index over the loaded rows, built the first time the filter is used
+        self._search_index = None
+        self._index_job = None
+        self._filter_after = None
+        # Counters of a running export, None when there is none
+        self.export_progress = None
         
         self.title(f"Full Data Display - {sheet_name}")
         self.geometry("1400x950")
         self.resizable(True, True)
         
-        self._create_widgets()
+        with metrics.span("open full view", sheet_name):
+            self._create_widgets()
         self.load_data()
     
     def _create_widgets(self):
@@ -473,93 +1149,318 @@ class DataDisplayWindow(tk.Toplevel):
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
         main_frame.columnconfigure(0, weight=1)
-        main_frame.rowconfigure(0, weight=1)
-        
-        # Treeview with scrollbars
-        tree_frame = ttk.Frame(main_frame)
-        tree_frame.grid(row=0, column=0, sticky="nsew")
-        tree_frame.columnconfigure(0, weight=1)
-        tree_frame.rowconfigure(0, weight=1)
-        
-        v_scroll = ttk.Scrollbar(tree_frame, orient="vertical")
-        h_scroll = ttk.Scrollbar(tree_frame, orient="horizontal")
+        main_frame.rowconfigure(1, weight=1)
         
         columns = self.config.sheets[self.sheet_name]['columns']
         
-        self.whole_stored_data = ttk.Treeview(
-            tree_frame,
-            columns=columns,
-            show="headings",
-            xscrollcommand=h_scroll.set,
-            yscrollcommand=v_scroll.set
+        # Filter bar
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.grid(row=0, column=0, sticky="ew", pady=(0, 10))
+        
+        ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT, padx=5)
+        self.filter_column = ttk.Combobox(
+            filter_frame, values=[ALL_COLUMNS] + list(columns), state="readonly", width=20
         )
+        self.filter_column.set(ALL_COLUMNS)
+        self.filter_column.pack(side=tk.LEFT, padx=5)
+        self.filter_column.bind("<<ComboboxSelected>>", lambda e: self.schedule_filter())
         
-        v_scroll.config(command=self.whole_stored_data.yview)
-        h_scroll.config(command=self.whole_stored_data.xview)
+        self.filter_text = tk.StringVar()
+        self.filter_text.trace_add("write", lambda *args: self.schedule_filter())
+        filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_text, width=40)
+        filter_entry.pack(side=tk.LEFT, padx=5)
+        filter_entry.bind("<Escape>", lambda e: self.filter_text.set(""))
         
-        self.whole_stored_data.grid(row=0, column=0, sticky="nsew")
-        v_scroll.grid(row=0, column=1, sticky="ns")
-        h_scroll.grid(row=1, column=0, sticky="ew")
+        ttk.Button(filter_frame, text="Clear", command=lambda: self.filter_text.set("")).pack(side=tk.LEFT, padx=5)
+        self.filter_status = ttk.Label(filter_frame, font=('Arial', 9))
+        self.filter_status.pack(side=tk.LEFT, padx=10)
         
-        # Set column headings
-        for col in columns:
-            self.whole_stored_data.heading(col, text=col)
-            self.whole_stored_data.column(col, width=120)
+        # Virtual Treeview with scrollbars
+        self.whole_stored_data = VirtualTreeview(main_frame, columns, column_width=120)
+        self.whole_stored_data.grid(row=1, column=0, sticky="nsew")
         
         # Buttons
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=1, column=0, sticky="ew", pady=10)
+        button_frame.grid(row=2, column=0, sticky="ew", pady=10)
         
         ttk.Button(button_frame, text="Update Selected", command=self.open_update_window).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Refresh", command=self.refresh_data).pack(side=tk.LEFT, padx=5)
+        self.export_button = ttk.Button(button_frame, text="Export...", command=self.export_rows)
+        self.export_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Close", command=self.destroy).pack(side=tk.LEFT, padx=5)
+        self.export_status = ttk.Label(button_frame, font=('Arial', 9))
+        self.export_status.pack(side=tk.LEFT, padx=10)
     
-    def load_data(self):
-        try:
-            workbook = openpyxl.load_workbook(self.config.excel_path)
-            sheet = workbook[self.sheet_name]
+    def load_data(self, on_loaded=None):
+        """Read the sheet on the I/O thread, then fill the Treeview"""
+        if self._load_job is not None:
+            self._load_job.cancel()
+        self._load_job = self.executor.submit(
+            metrics.timed("load full view", self.sheet_name, self.config.session.snapshot,
+                          measure=_snapshot_stats(self.config.excel_path)),
+            self.sheet_name,
+            on_done=lambda snapshot: self._populate(snapshot, on_loaded),
+            on_error=self._show_load_error,
+            description=f"Loading '{self.sheet_name}'...",
+            cancellable=True
+        )
+    
+    def _populate(self, snapshot, on_loaded=None):
+        self._load_job = None
+        if not self.winfo_exists():
+            return
+        self._loaded_generation, row_ids, rows = snapshot
+        with metrics.span("fill full view", self.sheet_name) as record:
+            record["rows"] = len(rows)
+            view = self.whole_stored_data
+            count = len(view)
             
-            # Clear existing data
-            for item in self.whole_stored_data.get_children():
-                self.whole_stored_data.delete(item)
+            if count and row_ids[:count] == view.row_ids and rows.starts_with(view.rows):
+                # Only new rows at the end (the usual change by other users): the
+                # search index and sort orders take them in without a rebuild
+                view.extend(rows[count:], row_ids[count:])
+                if self.filter_text.get().strip():
+                    self.apply_filter(keep_position=True)
+            else:
+                # Only the rows on screen become Treeview items
+                view.set_rows(rows, row_ids, keep_position=bool(count))
             
-            # Load new data
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if any(row):
-                    self.whole_stored_data.insert("", tk.END, values=row)
-                    
-        except FileNotFoundError:
+                # The old index describes the old rows
+                if self._index_job is not None:
+                    self._index_job.cancel()
+                    self._index_job = None
+                self._search_index = None
+                if self.filter_text.get().strip():
+                    self.apply_filter(keep_position=True)
+        
+        if on_loaded:
+            on_loaded()
+    
+    def _show_load_error(self, error):
+        self._load_job = None
+        if isinstance(error, IOCancelled):
+            return
+        if isinstance(error, FileNotFoundError):
             messagebox.showerror("Error", f"Excel file not found: {self.config.excel_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load data: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to load data: {str(error)}")
+    
+    def is_outdated(self):
+        """True when the workbook was changed outside this view since it was loaded"""
+        return (self._loaded_generation is None
+                or self.config.session.changed_since(self._loaded_generation))
+    
+    def append_row(self, values, row_id):
+        """Show a newly submitted row, reloading only if the file changed meanwhile"""
+        if self._load_job is not None:
+            # A load is already on its way and will include the row
+            return
+        if row_id is None or self.is_outdated():
+            self.load_data()
+        else:
+            self.whole_stored_data.append(tuple(values), row_id)
+            if self.filter_text.get().strip():
+                self.apply_filter(keep_position=True)
+    
+    def row_updated(self, row_id, values):
+        """Change one row in place after UpdateWindow saved it"""
+        index = self.whole_stored_data.update_row(row_id, tuple(values))
+        if index is not None and self._search_index is not None:
+            self._search_index.replace_row(index)
+        if self.sheet_frame is not None and self.sheet_frame.winfo_exists():
+            self.sheet_frame.update_preview_row(row_id, values)
+    
+    def schedule_filter(self):
+        """Run the filter once typing pauses, not on every keystroke"""
+        if self._filter_after is not None:
+            self.after_cancel(self._filter_after)
+        self._filter_after = self.after(FILTER_DELAY_MS, self.apply_filter)
+    
+    def apply_filter(self, keep_position=False):
+        """Show only the rows matching the filter bar, building the search index if needed"""
+        self._filter_after = None
+        text = self.filter_text.get().strip()
+        if not text:
+            self.whole_stored_data.set_filter(None, keep_position)
+            self.filter_status.configure(text="")
+            return
+        
+        columns = self.config.sheets[self.sheet_name]['columns']
+        choice = self.filter_column.get()
+        column = None if choice == ALL_COLUMNS else columns.index(choice)
+        
+        if self._search_index is None:
+            self._search_index = RowIndex(self.whole_stored_data.rows, len(columns))
+        index = self._search_index
+        if not (index.ready if column is None else index.column_ready(column)):
+            # Built on the I/O thread; the filter runs again once it's done
+            if self._index_job is None or self._index_job.cancelled:
+                self.filter_status.configure(text="Indexing...")
+                self._index_job = self.executor.submit(
+                    index.build, None if column is None else [column],
+                    on_done=lambda _: self._on_indexed(index),
+                    on_error=self._on_index_error,
+                    description=f"Indexing '{self.sheet_name}' for search...",
+                    cancellable=True
+                )
+            return
+        
+        started = time.perf_counter()
+        if column is None:
+            matches = index.search(text)
+        else:
+            matches = index.prefix_search(column, text)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        self.whole_stored_data.set_filter(matches, keep_position)
+        how = "containing" if column is None else f"where {choice} starts with"
+        self.filter_status.configure(
+            text=f"{len(matches):,} of {len(self.whole_stored_data):,} rows {how} '{text}' ({elapsed_ms:.0f} ms)"
+        )
+    
+    def _on_indexed(self, index):
+        self._index_job = None
+        if index is self._search_index and self.winfo_exists():
+            self.apply_filter()
+    
+    def _on_index_error(self, error):
+        self._index_job = None
+        if self.winfo_exists():
+            self.filter_status.configure(text="")
+        if isinstance(error, IOCancelled):
+            return
+        messagebox.showerror("Error", f"Failed to build the search index: {str(error)}")
     
     def refresh_data(self):
-        """Reload data from Excel file"""
-        self.load_data()
-        messagebox.showinfo("Success", "Data refreshed!")
+        """Reload data from Excel file if it changed since the last load"""
+        if self._load_job is None and not self.is_outdated():
+            messagebox.showinfo("Success", "Data refreshed!")
+            return
+        self.load_data(on_loaded=lambda: messagebox.showinfo("Success", "Data refreshed!"))
+    
+    def export_rows(self):
+        """Stream the sheet to a CSV or JSON-lines file (gzipped if named .gz) on the I/O thread
+
+        Rows are read from the file rather than from this view, so the export
+        doesn't depend on the filter or on a finished load. While it runs the
+        button cancels it.
+        """
+        if self.export_progress is not None:
+            self.export_progress.cancel()
+            self.export_button.configure(state="disabled")
+            self.export_status.configure(text="Cancelling export...")
+            return
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title=f"Export '{self.sheet_name}'",
+            defaultextension=".csv",
+            initialfile=f"{self.sheet_name}.csv",
+            filetypes=[("CSV files", "*.csv"), ("CSV files, gzipped", "*.csv.gz"),
+                       ("JSON lines", "*.jsonl"), ("JSON lines, gzipped", "*.jsonl.gz")]
+        )
+        if not path:
+            return
+        try:
+            export_format(path)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=self)
+            return
+        
+        progress = self.export_progress = ExportProgress()
+        self.export_button.configure(text="Cancel Export")
+        self.executor.submit(
+            metrics.timed("export", self.sheet_name, export_sheet,
+                          measure=lambda progress: {"rows": progress.written,
+                                                    "bytes": sum(file_bytes(part) or 0 for part in progress.paths)}),
+            self.config.session, self.sheet_name, self.config.sheets[self.sheet_name]['columns'], path, progress,
+            on_done=self._on_exported,
+            on_error=self._on_export_error,
+            description=f"Exporting '{self.sheet_name}'...",
+            cancellable=True
+        )
+        self._poll_export(progress, len(self.whole_stored_data))
+    
+    def _poll_export(self, progress, expected):
+        if progress is not self.export_progress or not self.winfo_exists():
+            return
+        if not progress.cancelled:
+            total = f" of about {expected:,}" if expected else ""
+            self.export_status.configure(text=f"Exported {progress.written:,}{total} rows...")
+        self.after(200, self._poll_export, progress, expected)
+    
+    def _end_export(self, text):
+        self.export_progress = None
+        if self.winfo_exists():
+            self.export_button.configure(text="Export...", state="normal")
+            self.export_status.configure(text=text)
+    
+    def _on_exported(self, progress):
+        self._end_export("")
+        messagebox.showinfo("Export Complete", f"Exported {progress.written:,} row(s) to:\n{progress.paths[0]}")
+    
+    def _on_export_error(self, error):
+        if isinstance(error, IOCancelled):
+            # Cancelled from the busy indicator: stop the export if it is already writing
+            if self.export_progress is not None:
+                self.export_progress.cancel()
+            self._end_export("Export cancelled.")
+        elif isinstance(error, ExportCancelled):
+            self._end_export("Export cancelled.")
+        else:
+            self._end_export("")
+            messagebox.showerror("Error", f"Failed to export: {str(error)}")
     
     def open_update_window(self):
-        selected = self.whole_stored_data.selection()
+        row_id = self.whole_stored_data.selected_row_id()
         
-        if not selected:
+        if row_id is None:
             messagebox.showwarning("Warning", "Please select a row to update!")
             return
         
-        UpdateWindow(self, parent_window=self, selected_item=selected[0], 
+        UpdateWindow(self, parent_window=self, row_id=row_id,
                     config=self.config, sheet_name=self.sheet_name)
 
 
 class SheetFrame(ttk.Frame):
-    """Individual frame for each sheet"""
-    def __init__(self, parent, config, sheet_name, **kwargs):
+    """Individual frame for each sheet
+
+    `background` runs the jobs saves shouldn't wait for (reading the values
+    the entry fields suggest); without one they go to `executor` too.
+    """
+    def __init__(self, parent, config, sheet_name, executor, background=None, **kwargs):
         super().__init__(parent, **kwargs)
         self.config = config
         self.sheet_name = sheet_name
+        self.executor = executor
+        self.background = background or executor
         self.data_display_window = None
-        
-        self._setup_styles()
-        self._create_widgets()
+        self._load_job = None
+        self._loaded_generation = None
+        
+        # Batch mode: rows are queued (and spooled to disk) until committed together
+        self.batch_mode = tk.BooleanVar(value=bool(self.config.session.spool.pending(sheet_name)))
+        self.pending_items = []
+        
+        # Committed rows as shown (display columns only), their item ids, and
+        # the heading sort, which reorders the items from cached sort orders
+        self._preview_rows = []
+        self._preview_iids = []
+        self._preview_positions = {}
+        self._preview_sort = None
+        self._preview_sorter = SortCache(self._preview_rows)
+        # Position of each display column in a full row, worked out once for the schema
+        sheet = self.config.sheets[sheet_name]
+        self._display_indices = [sheet['columns'].index(col) for col in sheet['display_columns']]
+        # Values each entry field suggests, by column position: the preview's rows
+        # and submitted ones until load_suggestions() brings the whole sheet's
+        self._suggestions = [PrefixIndex() for _ in sheet['columns']]
+        
+        with metrics.span("build sheet tab", sheet_name):
+            self._setup_styles()
+            self._create_widgets()
+            self._on_batch_mode_toggled()
         self.load_data()
+        self.load_suggestions()
     
     def _setup_styles(self):
         style = ttk.Style()
@@ -605,10 +1506,12 @@ class SheetFrame(ttk.Frame):
             entry = PlaceholderEntry(
                 scrollable_frame,
                 placeholder=f"Enter {col.lower()}",
+                suggest=lambda text, column=idx: self._suggestions[column].complete(text),
                 width=40
             )
             entry.grid(row=idx, column=1, sticky="ew", pady=5, padx=5)
-            entry.bind('<KeyRelease>', self.check_fields)
+            entry.bind('<KeyRelease>', self.check_fields, add="+")
+            entry.bind('<<SuggestionChosen>>', self.check_fields)
             self.entries[col] = entry
         
         scrollable_frame.columnconfigure(1, weight=1)
@@ -632,11 +1535,30 @@ class SheetFrame(ttk.Frame):
         self.submit_button.pack(side=tk.LEFT, padx=5)
         
         ttk.Button(button_frame, text="Clear", command=self.clear).pack(side=tk.LEFT, padx=5)
+        
+        # Batch entry controls
+        batch_frame = ttk.Frame(entry_frame)
+        batch_frame.grid(row=2, column=0, columnspan=2, pady=(0, 10))
+        
+        ttk.Checkbutton(
+            batch_frame,
+            text="Batch mode",
+            variable=self.batch_mode,
+            command=self._on_batch_mode_toggled
+        ).pack(side=tk.LEFT, padx=5)
+        
+        self.commit_button = ttk.Button(batch_frame, command=self.commit_batch)
+        self.commit_button.pack(side=tk.LEFT, padx=5)
+        
+        self.discard_button = ttk.Button(batch_frame, text="Discard Batch", command=self.discard_batch)
+        self.discard_button.pack(side=tk.LEFT, padx=5)
     
     def _create_preview_frame(self):
         display_columns = self.config.sheets[self.sheet_name]['display_columns']
         
-        preview_frame = ttk.LabelFrame(self, text=f"Preview - {self.sheet_name}", padding="10")
+        preview_frame = ttk.LabelFrame(
+            self, text=f"Preview - {self.sheet_name} (latest {self.config.preview_rows:,} rows)", padding="10"
+        )
         preview_frame.grid(row=0, column=1, sticky="nsew")
         preview_frame.columnconfigure(0, weight=1)
         preview_frame.rowconfigure(0, weight=1)
@@ -658,10 +1580,13 @@ class SheetFrame(ttk.Frame):
         
         v_scroll.config(command=self.stored_data.yview)
         
-        for col in display_columns:
-            self.stored_data.heading(col, text=col)
+        for column, col in enumerate(display_columns):
+            self.stored_data.heading(col, text=col, command=lambda column=column: self.sort_preview(column))
             self.stored_data.column(col, width=100)
         
+        # Uncommitted batch rows
+        self.stored_data.tag_configure("pending", foreground="gray40", background="#fff4cc")
+        
         self.stored_data.grid(row=0, column=0, sticky="nsew")
         v_scroll.grid(row=0, column=1, sticky="ns")
         
@@ -671,6 +1596,12 @@ class SheetFrame(ttk.Frame):
             text="Full View",
             command=self.full_data_viewer
         ).grid(row=1, column=0, sticky="ew", pady=(10, 0))
+        
+        ttk.Button(
+            preview_frame,
+            text="Import...",
+            command=self.import_data
+        ).grid(row=2, column=0, sticky="ew", pady=(5, 0))
     
     def check_fields(self, event=None):
         """Enable submit button only when all fields have valid data"""
@@ -689,30 +1620,171 @@ class SheetFrame(ttk.Frame):
         self.check_fields()
     
     def load_data(self):
-        """Load preview data from Excel"""
-        try:
-            workbook = openpyxl.load_workbook(self.config.excel_path)
-            sheet = workbook[self.sheet_name]
+        """Load the sheet's latest rows for the preview on the I/O thread
+
+        Only the last config.preview_rows rows are read (the Full View shows
+        everything), so this costs the same however long the sheet grows.
+        """
+        if self._load_job is not None:
+            self._load_job.cancel()
+        self._load_job = self.executor.submit(
+            metrics.timed("load preview", self.sheet_name, self.config.session.tail_snapshot,
+                          measure=_snapshot_stats(self.config.excel_path)),
+            self.sheet_name, self.config.preview_rows,
+            on_done=self._populate_preview,
+            on_error=self._show_load_error,
+            description=f"Loading '{self.sheet_name}'...",
+            cancellable=True
+        )
+    
+    def load_suggestions(self):
+        """Read every distinct value of the sheet for the entry fields to suggest
+
+        This runs on the background thread and builds the indexes there, so
+        saves don't queue behind it and the UI only swaps them in.
+        """
+        self.background.submit(
+            metrics.timed("load suggestions", self.sheet_name, column_indexes,
+                          measure=lambda indexes: {"rows": sum(map(len, indexes))}),
+            self.config.session, self.sheet_name,
+            on_done=self._on_suggestions_loaded,
+            on_error=self._on_suggestions_error,
+            description=f"Reading suggestions for '{self.sheet_name}'..."
+        )
+    
+    def _on_suggestions_loaded(self, indexes):
+        if not self.winfo_exists():
+            return
+        for column, index in enumerate(indexes[:len(self._suggestions)]):
+            # Keep what was learned while the sheet was being read
+            index.update(self._suggestions[column])
+            self._suggestions[column] = index
+    
+    def _on_suggestions_error(self, error):
+        # Suggestions are a convenience: the fields still suggest the preview's
+        # and the submitted values, so there is nothing to tell the user
+        pass
+    
+    def _remember_values(self, rows):
+        """Add the values of saved or queued rows to the fields' suggestions"""
+        for column, index in enumerate(self._suggestions):
+            index.update(row[column] for row in rows if column < len(row))
+    
+    def _display_values(self, row):
+        """Project a full row onto the preview's display columns"""
+        width = len(row)
+        return [row[index] if index < width else "" for index in self._display_indices]
+    
+    def _populate_preview(self, snapshot):
+        self._load_job = None
+        if not self.winfo_exists():
+            return
+        self._loaded_generation, row_ids, rows = snapshot
+        self._remember_values(rows)
+        with metrics.span("fill preview", self.sheet_name) as record:
+            record["rows"] = len(rows)
             
-            columns = self.config.sheets[self.sheet_name]['columns']
-            display_columns = self.config.sheets[self.sheet_name]['display_columns']
+            # Where the new tail starts among the rows shown, if it does
+            iids = [self._row_iid(row_id) for row_id in row_ids]
+            start = self._preview_positions.get(iids[0]) if iids else None
+            overlap = len(self._preview_iids) - start if start is not None else 0
+            if (start is not None
+                    and len(self._preview_rows) + len(rows) - overlap <= 2 * self.config.preview_rows
+                    and iids[:overlap] == self._preview_iids[start:]
+                    and [self._display_values(row) for row in rows[:overlap]] == self._preview_rows[start:]):
+                # Only new rows at the end: add just those items. Rows that dropped out
+                # of the tail stay until the preview is twice its size and fully reloaded
+                for row_id, row in zip(row_ids[overlap:], rows[overlap:]):
+                    self._insert_committed(row, row_id)
+                return
             
             # Clear existing
             for item in self.stored_data.get_children():
                 self.stored_data.delete(item)
             
-            # Load data (skip header)
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if any(row):
-                    # Show only display columns
-                    display_data = [row[columns.index(col)] if columns.index(col) < len(row) else "" 
-                                   for col in display_columns]
-                    self.stored_data.insert("", tk.END, values=display_data)
-                    
-        except FileNotFoundError:
+            # Load data (header and blank rows already skipped), showing only display
+            # columns; the row id is the item id, so an updated row is found without searching
+            self._preview_rows = [self._display_values(row) for row in rows]
+            self._preview_iids = iids
+            self._preview_positions = {iid: position for position, iid in enumerate(self._preview_iids)}
+            self._preview_sorter = SortCache(self._preview_rows)
+            for position in self._preview_order():
+                self.stored_data.insert("", tk.END, iid=self._preview_iids[position], values=self._preview_rows[position])
+            
+            # Uncommitted batch rows always come last
+            pending = [values for _, values in self.config.session.spool.pending(self.sheet_name)]
+            self._remember_values(pending)
+            self.pending_items = [
+                self.stored_data.insert("", tk.END, values=self._display_values(values), tags=("pending",))
+                for values in pending
+            ]
+            self._update_batch_buttons()
+    
+    @staticmethod
+    def _row_iid(row_id):
+        # Prefixed so they can't clash with the automatic ids of pending items
+        return f"row-{row_id}"
+    
+    def _preview_order(self):
+        """Positions of the committed rows in the order the preview shows them"""
+        if self._preview_sort is None:
+            return range(len(self._preview_rows))
+        return self._preview_sorter.order(*self._preview_sort)
+    
+    def _place_in_order(self, position):
+        """Move a committed row's item to where the current sort puts it"""
+        if self._preview_sort is not None:
+            index = self._preview_sorter.order(*self._preview_sort).index(position)
+            self.stored_data.move(self._preview_iids[position], "", index)
+    
+    def sort_preview(self, column):
+        """Heading click: reorder the committed rows, uncommitted batch rows stay last"""
+        self._preview_sort = next_sort(self._preview_sort, column)
+        display_columns = self.config.sheets[self.sheet_name]['display_columns']
+        label_headings(self.stored_data, display_columns, self._preview_sort)
+        # One call that sets the order of every item, rather than a move per item
+        iids = self._preview_iids
+        self.stored_data.set_children("", *[iids[position] for position in self._preview_order()],
+                                      *self.pending_items)
+    
+    def _insert_committed(self, row_values, row_id):
+        """Add a saved row to the preview, ahead of any uncommitted batch rows"""
+        iid = self._row_iid(row_id)
+        if iid in self._preview_positions:
+            # Already picked up by a reload
+            self.update_preview_row(row_id, row_values)
+            return
+        position = len(self._preview_rows)
+        self._preview_rows.append(self._display_values(row_values))
+        self._preview_iids.append(iid)
+        self._preview_positions[iid] = position
+        self.stored_data.insert("", position, iid=iid, values=self._preview_rows[position])
+        self._place_in_order(position)
+    
+    def update_preview_row(self, row_id, row):
+        """Replace the preview item of one row, if it is shown"""
+        self._remember_values([row])
+        position = self._preview_positions.get(self._row_iid(row_id))
+        if position is None:
+            return
+        old_values = self._preview_rows[position]
+        self._preview_rows[position] = self._display_values(row)
+        self._preview_sorter.replace_row(position, old_values)
+        self.stored_data.item(self._preview_iids[position], values=self._preview_rows[position])
+        self._place_in_order(position)
+    
+    def _show_load_error(self, error):
+        self._load_job = None
+        if isinstance(error, IOCancelled):
+            return
+        if isinstance(error, FileNotFoundError):
             messagebox.showerror("Error", f"Excel file not found: {self.config.excel_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load data: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to load data: {str(error)}")
+    
+    def _is_outdated(self):
+        """True when the preview wasn't loaded yet or the file changed since"""
+        return self._loaded_generation is None or self.config.session.changed_since(self._loaded_generation)
     
     def submit(self):
         """Submit data to Excel file"""
@@ -723,35 +1795,305 @@ class SheetFrame(ttk.Frame):
             messagebox.showwarning("Warning", "Please fill in all fields!")
             return
         
-        try:
-            workbook = openpyxl.load_workbook(self.config.excel_path)
-            sheet = workbook[self.sheet_name]
-            sheet.append(row_values)
-            workbook.save(self.config.excel_path)
-            
-            messagebox.showinfo("Success", f"Data submitted to '{self.sheet_name}'!")
-            
-            # Refresh displays
-            self.load_data()
-            if self.data_display_window and self.data_display_window.winfo_exists():
-                self.data_display_window.load_data()
-            
+        if self.batch_mode.get():
+            self.add_to_batch(row_values)
+            return
+        
+        # The form stays editable while the row is written on the I/O thread
+        self.executor.submit(
+            metrics.timed("submit row", self.sheet_name, self.config.session.append_row,
+                          measure=lambda row_id: {"rows": 1}),
+            self.sheet_name, row_values,
+            on_done=lambda row_id: self._on_submitted(row_values, row_id),
+            on_error=self._on_submit_error,
+            description=f"Saving to '{self.sheet_name}'..."
+        )
+    
+    def _on_submitted(self, row_values, row_id):
+        self._remember_values([row_values])
+        messagebox.showinfo("Success", f"Data submitted to '{self.sheet_name}'!")
+        
+        # Refresh displays: add just the new row unless the file changed underneath us
+        if self._load_job is None:
+            if self._is_outdated() or row_id is None:
+                self.load_data()
+            else:
+                self._insert_committed(row_values, row_id)
+        if self.data_display_window and self.data_display_window.winfo_exists():
+            self.data_display_window.append_row(row_values, row_id)
+        
+        self._clear_if_unchanged(row_values)
+    
+    def _clear_if_unchanged(self, row_values):
+        """Clear the form unless the user started typing something else meanwhile"""
+        columns = self.config.sheets[self.sheet_name]['columns']
+        if [self.entries[col].get_value() for col in columns] == row_values:
             self.clear()
-            
-        except PermissionError:
+    
+    def _on_submit_error(self, error):
+        if isinstance(error, PermissionError):
             messagebox.showerror("Error", "File is open in another program. Please close it and try again.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to submit data: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to submit data: {str(error)}")
+    
+    def _on_batch_mode_toggled(self):
+        self.submit_button.configure(text="Add to Batch" if self.batch_mode.get() else "Submit")
+        self._update_batch_buttons()
+    
+    def _update_batch_buttons(self):
+        count = len(self.pending_items)
+        state = "normal" if count else "disabled"
+        self.commit_button.configure(text=f"Commit {count} row{'s' if count != 1 else ''}", state=state)
+        self.discard_button.configure(state=state)
+    
+    def add_to_batch(self, row_values):
+        """Queue a row in the spool instead of writing it to the workbook"""
+        self.executor.submit(
+            self.config.session.spool_row, self.sheet_name, row_values,
+            on_done=lambda _: self._on_batched(row_values),
+            on_error=self._on_submit_error,
+            description=f"Adding to batch for '{self.sheet_name}'..."
+        )
+    
+    def _on_batched(self, row_values):
+        if not self.winfo_exists():
+            return
+        self._remember_values([row_values])
+        item = self.stored_data.insert("", tk.END, values=self._display_values(row_values), tags=("pending",))
+        self.pending_items.append(item)
+        self.stored_data.see(item)
+        self._update_batch_buttons()
+        self._clear_if_unchanged(row_values)
+    
+    def commit_batch(self):
+        """Write every queued row to the workbook in a single append/save cycle"""
+        self.commit_button.configure(state="disabled")
+        self.executor.submit(
+            metrics.timed("commit batch", self.sheet_name, self.config.session.commit_spool,
+                          measure=lambda committed: {"rows": len(committed[1])}),
+            self.sheet_name,
+            on_done=self._on_batch_committed,
+            on_error=self._on_commit_error,
+            description=f"Committing batch to '{self.sheet_name}'..."
+        )
+    
+    def _on_batch_committed(self, committed):
+        row_ids, rows = committed
+        # The rows are now durable in the journal; write them to Excel with one save
+        self.executor.submit(
+            metrics.timed("save batch", self.sheet_name, self.config.session.compact,
+                          measure=_saved_stats(self.config.excel_path, len(rows))),
+            on_done=lambda _: messagebox.showinfo(
+                "Success", f"{len(rows)} row(s) committed to '{self.sheet_name}'!"
+            ),
+            on_error=self._on_commit_flush_error,
+            description=f"Saving batch to '{self.sheet_name}'..."
+        )
+        
+        if not self.winfo_exists():
+            return
+        if self._is_outdated() or None in row_ids:
+            self.pending_items = []
+            self.load_data()
+        else:
+            # Pending items become committed ones, now addressable by their row ids
+            self.stored_data.delete(*self.pending_items)
+            self.pending_items = []
+            for row_values, row_id in zip(rows, row_ids):
+                self._insert_committed(row_values, row_id)
+        self._update_batch_buttons()
+        
+        if self.data_display_window and self.data_display_window.winfo_exists():
+            for row_values, row_id in zip(rows, row_ids):
+                self.data_display_window.append_row(row_values, row_id)
+    
+    def _on_commit_error(self, error):
+        self._update_batch_buttons()
+        messagebox.showerror("Error", f"Failed to commit batch: {str(error)}")
+    
+    def _on_commit_flush_error(self, error):
+        if isinstance(error, (PermissionError, FileLockedError)):
+            messagebox.showwarning(
+                "Warning",
+                "File is open in another program or busy with another user's save. The batch is "
+                "saved in the journal and will be written to Excel once the file is free."
+            )
+        else:
+            messagebox.showerror("Error", f"Failed to save batch: {str(error)}")
+    
+    def discard_batch(self):
+        """Drop all uncommitted rows after confirmation"""
+        count = len(self.pending_items)
+        if not messagebox.askyesno("Confirm", f"Discard {count} uncommitted row(s)?"):
+            return
+        self.executor.submit(
+            self.config.session.spool.discard_sheet, self.sheet_name,
+            on_done=lambda _: self._on_batch_discarded(),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to discard batch: {str(e)}"),
+            description=f"Discarding batch for '{self.sheet_name}'..."
+        )
+    
+    def _on_batch_discarded(self):
+        if not self.winfo_exists():
+            return
+        self.stored_data.delete(*self.pending_items)
+        self.pending_items = []
+        self._update_batch_buttons()
+    
+    def import_data(self):
+        """Pick a CSV/XLSX file and open the column mapping dialog for it"""
+        path = filedialog.askopenfilename(
+            title="Select File to Import",
+            filetypes=[("CSV or Excel files", "*.csv *.xlsx"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        self.executor.submit(
+            read_source_header, path, self.sheet_name,
+            on_done=lambda header: ImportWindow(self.winfo_toplevel(), self, path, header),
+            on_error=self._on_import_read_error,
+            description="Reading import file...",
+            cancellable=True
+        )
+    
+    def _on_import_read_error(self, error):
+        if not isinstance(error, IOCancelled):
+            messagebox.showerror("Error", f"Failed to read file: {str(error)}")
     
     def full_data_viewer(self):
         """Open full data display window"""
         if self.data_display_window is None or not self.data_display_window.winfo_exists():
-            self.data_display_window = DataDisplayWindow(self.winfo_toplevel(), self.config, self.sheet_name)
+            self.data_display_window = DataDisplayWindow(
+                self.winfo_toplevel(), self.config, self.sheet_name, self.executor,
+                sheet_frame=self
+            )
         else:
             self.data_display_window.lift()
             self.data_display_window.focus()
 
 
+def _format_bytes(count):
+    if count is None:
+        return ""
+    if count < 1024 * 1024:
+        return f"{count / 1024:,.1f} KB"
+    return f"{count / (1024 * 1024):,.1f} MB"
+
+
+class DiagnosticsWindow(tk.Toplevel):
+    """Timings of loads, saves, view filling and window building, per operation and sheet"""
+    SUMMARY_COLUMNS = ("Operation", "Sheet", "Count", "Total ms", "Mean ms", "Max ms", "Last ms", "Rows", "Bytes")
+    RECENT_COLUMNS = ("Time", "Operation", "Sheet", "ms", "Rows", "Bytes", "Thread", "Profile")
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.title("Diagnostics")
+        self.geometry("1100x650")
+        self.resizable(True, True)
+        # Identifies what the tables show, so they're only redrawn after new records
+        self._shown = None
+
+        self._create_widgets()
+        self.refresh()
+
+    def _create_widgets(self):
+        main_frame = ttk.Frame(self, padding="10")
+        main_frame.grid(row=0, column=0, sticky="nsew")
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(2, weight=1)
+        main_frame.rowconfigure(4, weight=2)
+
+        controls = ttk.Frame(main_frame)
+        controls.grid(row=0, column=0, sticky="ew", pady=(0, 10))
+        self.recording = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(
+            controls, text="Record timings", variable=self.recording, command=self._on_recording_toggled
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Profile Next Operation", command=self.profile_next).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
+        self.status_label = ttk.Label(controls, font=('Arial', 9))
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        ttk.Label(main_frame, text="By operation (most time first)", font=('Arial', 10, 'bold')).grid(
+            row=1, column=0, sticky="w"
+        )
+        self.summary = self._create_table(main_frame, self.SUMMARY_COLUMNS, row=2)
+        ttk.Label(main_frame, text="Latest operations", font=('Arial', 10, 'bold')).grid(
+            row=3, column=0, sticky="w", pady=(10, 0)
+        )
+        self.recent = self._create_table(main_frame, self.RECENT_COLUMNS, row=4)
+
+        ttk.Button(main_frame, text="Close", command=self.destroy).grid(row=5, column=0, sticky="w", pady=10)
+
+    def _create_table(self, master, columns, row):
+        frame = ttk.Frame(master)
+        frame.grid(row=row, column=0, sticky="nsew")
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(0, weight=1)
+        tree = ttk.Treeview(frame, columns=columns, show="headings", height=8)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=160 if col in ("Operation", "Time", "Profile") else 90)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        return tree
+
+    def refresh(self):
+        """Redraw the tables when there are new records; runs every DIAGNOSTICS_REFRESH_MS while open"""
+        if not self.winfo_exists():
+            return
+        recent = metrics.recent()
+        shown = (len(recent), id(recent[-1]) if recent else None, metrics.profiles_armed)
+        if shown != self._shown:
+            self._shown = shown
+            self.summary.delete(*self.summary.get_children())
+            for entry in metrics.summary():
+                self.summary.insert("", tk.END, values=(
+                    entry["operation"], entry["sheet"] or "", entry["count"], f"{entry['total_ms']:,.1f}",
+                    f"{entry['mean_ms']:,.1f}", f"{entry['max_ms']:,.1f}", f"{entry['last_ms']:,.1f}",
+                    f"{entry['rows']:,}", _format_bytes(entry["bytes"])
+                ))
+            self.recent.delete(*self.recent.get_children())
+            for record in reversed(recent):
+                rows = record.get("rows")
+                self.recent.insert("", tk.END, values=(
+                    record["time"].partition("T")[2], record["operation"] + (" (failed)" if "error" in record else ""),
+                    record["sheet"] or "", f"{record['ms']:,.1f}", "" if rows is None else f"{rows:,}",
+                    _format_bytes(record.get("bytes")), record["thread"], record.get("profile") or ""
+                ))
+            self._update_status()
+        self.after(DIAGNOSTICS_REFRESH_MS, self.refresh)
+
+    def _update_status(self):
+        parts = [f"Trace: {metrics.trace_path}" if metrics.trace_path else "No trace file (start with --trace FILE)"]
+        if metrics.profiles_armed:
+            parts.append(f"the next operation will be profiled into {os.path.abspath(metrics.profile_dir)}")
+        self.status_label.configure(text="; ".join(parts))
+
+    def _on_recording_toggled(self):
+        if self.recording.get():
+            metrics.enable()
+        else:
+            metrics.disable()
+
+    def profile_next(self):
+        """Run the next load or save, whichever thread it is on, under cProfile"""
+        if not metrics.enabled:
+            metrics.enable()
+            self.recording.set(True)
+        metrics.profile_next()
+        self._update_status()
+
+    def reset(self):
+        metrics.reset()
+        self._shown = None
+
+
 class Window:
     def __init__(self, root, config):
         self.root = root
@@ -761,7 +2103,124 @@ class Window:
         self.root.geometry("1400x950")
         self.root.resizable(True, True)
         
-        self._create_widgets()
+        self.executor = IOExecutor()
+        # Reads nothing waits on (suggestions), kept off the thread saves queue on
+        self.background = IOExecutor(name="background-io")
+        self._busy_shown = False
+        self.diagnostics_window = None
+        
+        # File watcher state: the generation and per-sheet fingerprints last read
+        self._watch_job = None
+        self._watched_generation = None
+        self._fingerprints = {}
+        
+        with metrics.span("build main window"):
+            self._create_widgets()
+        self._poll_io()
+        self.root.after(WATCH_INTERVAL_MS, self._watch_file)
+    
+    def _poll_io(self):
+        """Hand finished Excel I/O back to the UI and keep the busy indicator current"""
+        self.executor.poll()
+        self.background.poll()
+        if self.executor.busy:
+            self.busy_label.configure(text=self.executor.description)
+            if not self._busy_shown:
+                self.busy_frame.pack(side=tk.RIGHT, padx=5)
+                self.busy_bar.start(10)
+                self._busy_shown = True
+        elif self._busy_shown:
+            self.busy_bar.stop()
+            self.busy_frame.pack_forget()
+            self._busy_shown = False
+        self.root.after(50, self._poll_io)
+    
+    def _watch_file(self):
+        """Look for saves by other users; while nothing changes this is one stat() a second"""
+        if self._watch_job is None and self.config.session.changed_since(self._watched_generation):
+            self._watch_job = self.executor.submit(
+                metrics.timed("check for changes", None, self.config.session.sheet_fingerprints,
+                              measure=lambda result: {"bytes": file_bytes(self.config.excel_path)}),
+                on_done=self._on_fingerprints,
+                on_error=self._on_watch_error,
+                description="Checking for changes...",
+                cancellable=True
+            )
+        self.root.after(WATCH_INTERVAL_MS, self._watch_file)
+    
+    def _on_fingerprints(self, result):
+        """Reload the views of just the sheets whose content changed"""
+        self._watch_job = None
+        previous_generation, previous = self._watched_generation, self._fingerprints
+        self._watched_generation, self._fingerprints = result
+        for sheet_name, sheet_frame in self.sheet_frames.items():
+            changed = previous.get(sheet_name) != self._fingerprints.get(sheet_name)
+            refresh_view(sheet_frame, changed, previous_generation, self._watched_generation)
+            refresh_view(sheet_frame.data_display_window, changed, previous_generation, self._watched_generation)
+    
+    def _on_watch_error(self, error):
+        # Most likely caught mid-save by another user; the next tick tries again
+        self._watch_job = None
+    
+    def cancel_io(self):
+        """Cancel loads, searches and exports; saves are never cancelled, queued or running"""
+        self.executor.cancel_all()
+    
+    def close(self):
+        """Write journaled rows into the workbook before exiting"""
+        # Queued behind any pending saves so none of them are lost
+        self.executor.submit(
+            metrics.timed("save on exit", None, self.config.session.close,
+                          measure=_saved_stats(self.config.excel_path)),
+            on_done=lambda _: self._shutdown(),
+            on_error=self._on_close_error,
+            description="Saving pending entries..."
+        )
+    
+    def _on_close_error(self, error):
+        if isinstance(error, (PermissionError, FileLockedError)):
+            if not messagebox.askyesno(
+                "Warning",
+                "File is open in another program or busy with another user's save, "
+                "so recent entries could not be saved to Excel.\n"
+                "They are kept in the journal and will be saved next time.\n\nExit anyway?"
+            ):
+                return
+        else:
+            messagebox.showerror("Error", f"Failed to save pending entries: {str(error)}")
+        self._shutdown()
+    
+    def _shutdown(self):
+        self.executor.shutdown()
+        self.background.shutdown()
+        self.root.destroy()
+    
+    def export_xlsx(self):
+        """Write every sheet to an Excel workbook (the way out of a SQLite data file)"""
+        base_name = os.path.splitext(os.path.basename(self.config.excel_path))[0]
+        path = filedialog.asksaveasfilename(
+            title="Export to Excel",
+            defaultextension=".xlsx",
+            initialfile=f"{base_name}.xlsx" if is_sqlite_path(self.config.excel_path) else f"{base_name} (export).xlsx",
+            filetypes=[("Excel files", "*.xlsx")]
+        )
+        if not path:
+            return
+        self.executor.submit(
+            metrics.timed("export", None, self.config.session.export_xlsx,
+                          measure=lambda count: {"rows": count, "bytes": file_bytes(path)}),
+            path,
+            on_done=lambda count: messagebox.showinfo("Export Complete", f"Exported {count:,} row(s) to:\n{path}"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to export: {str(e)}"),
+            description="Exporting to Excel..."
+        )
+    
+    def show_diagnostics(self):
+        if self.diagnostics_window is None or not self.diagnostics_window.winfo_exists():
+            self.diagnostics_window = DiagnosticsWindow(self.root)
+        else:
+            self.diagnostics_window.lift()
+            self.diagnostics_window.focus()
     
     def _create_widgets(self):
         # Main container
@@ -789,28 +2248,92 @@ class Window:
             font=('Arial', 10)
         ).pack(side=tk.LEFT, padx=20)
         
+        ttk.Button(
+            info_frame,
+            text="Export to .xlsx...",
+            command=self.export_xlsx
+        ).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(
+            info_frame,
+            text="Diagnostics",
+            command=self.show_diagnostics
+        ).pack(side=tk.LEFT, padx=5)
+        
+        # Busy indicator, shown only while Excel I/O is in flight
+        self.busy_frame = ttk.Frame(info_frame)
+        self.busy_label = ttk.Label(self.busy_frame, font=('Arial', 10))
+        self.busy_label.pack(side=tk.LEFT, padx=5)
+        self.busy_bar = ttk.Progressbar(self.busy_frame, mode="indeterminate", length=120)
+        self.busy_bar.pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.busy_frame, text="Cancel", command=self.cancel_io).pack(side=tk.LEFT, padx=5)
+        
+        # SheetFrames built so far, by sheet name
+        self.sheet_frames = {}
+        
         # Notebook for multiple sheets
         if len(self.config.sheets) > 1:
             self.notebook = ttk.Notebook(main_container)
             self.notebook.grid(row=1, column=0, sticky="nsew")
             
-            # Create tab for each sheet
+            # Create an empty tab for each sheet; its SheetFrame is built when first selected
+            self.tab_frames = {}
             for sheet_name in self.config.sheets:
-                sheet_frame = SheetFrame(self.notebook, self.config, sheet_name)
-                self.notebook.add(sheet_frame, text=sheet_name)
+                tab = ttk.Frame(self.notebook)
+                tab.columnconfigure(0, weight=1)
+                tab.rowconfigure(0, weight=1)
+                self.notebook.add(tab, text=sheet_name)
+                self.tab_frames[str(tab)] = sheet_name
+            
+            self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+            self._on_tab_changed()
         else:
             # Single sheet - no tabs needed
             sheet_name = list(self.config.sheets.keys())[0]
-            sheet_frame = SheetFrame(main_container, self.config, sheet_name)
+            sheet_frame = SheetFrame(main_container, self.config, sheet_name, self.executor, self.background)
             sheet_frame.grid(row=1, column=0, sticky="nsew")
+            self.sheet_frames[sheet_name] = sheet_frame
+    
+    def _on_tab_changed(self, event=None):
+        """Build and load a sheet's tab the first time it is shown"""
+        tab = self.notebook.select()
+        sheet_name = self.tab_frames.get(tab)
+        if sheet_name is None or sheet_name in self.sheet_frames:
+            return
+        sheet_frame = SheetFrame(self.notebook.nametowidget(tab), self.config, sheet_name, self.executor,
+                                 self.background)
+        sheet_frame.grid(row=0, column=0, sticky="nsew")
+        self.sheet_frames[sheet_name] = sheet_frame
 
 
 def main():
+    imports_done = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Multi-sheet data entry for Excel and SQLite files.")
+    parser.add_argument("--setup", action="store_true",
+                        help="run the console setup again instead of using the saved one")
+    parser.add_argument("--preview-rows", type=int, metavar="N",
+                        help=f"how many of each sheet's latest rows the preview shows, "
+                             f"remembered for later starts (default: {DEFAULT_PREVIEW_ROWS})")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="record how long loads, saves and windows take (see the Diagnostics button)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="also write every timing to FILE as JSON lines, rotated at 5 MB (implies --diagnostics)")
+    parser.add_argument("--profile-dir", metavar="DIR", default="profiles",
+                        help="where 'Profile Next Operation' saves cProfile stats (default: %(default)s)")
+    args = parser.parse_args()
+    metrics.profile_dir = args.profile_dir
+    if args.diagnostics or args.trace:
+        metrics.enable(trace_path=args.trace)
+    
     print("\n" + "="*60)
     print("MULTI-SHEET DATA ENTRY SYSTEM - STARTUP")
     print("="*60)
     
-    config = Config()
+    config = Config(setup=args.setup)
+    if args.preview_rows and args.preview_rows > 0 and config.excel_path and config.sheets:
+        config.preview_rows = args.preview_rows
+        config.save_config()
+    config_done = time.perf_counter()
     
     if not config.excel_path or not config.sheets:
         print("\n✗ Setup incomplete or cancelled.")
@@ -831,6 +2354,16 @@ def main():
     
     root = tk.Tk()
     app = Window(root, config)
+    root.protocol("WM_DELETE_WINDOW", app.close)
+    
+    def report_startup():
+        # First idle moment of the event loop: the window has been mapped and drawn
+        shown = time.perf_counter()
+        print(f"Startup: imports {(imports_done - _IMPORTS_STARTED) * 1000:.0f} ms, "
+              f"config {(config_done - imports_done) * 1000:.0f} ms, "
+              f"window {(shown - config_done) * 1000:.0f} ms "
+              f"(first window after {(shown - _IMPORTS_STARTED) * 1000:.0f} ms)")
+    root.after_idle(report_startup)
     root.mainloop()
 
 
@@ -0,0 +1,188 @@
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# The trace file rotates at this size, keeping this many older files
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+# Records kept in memory for the diagnostics window
+RECENT_RECORDS = 500
+
+
+def file_bytes(path):
+    """Size of a file, or None when it can't be read"""
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+class Metrics:
+    """Durations, row counts and bytes of loads, saves, view filling and window building
+
+    Off until enable() is called, and while off a span costs one attribute
+    check. Spans can run on the UI thread or the I/O thread. Every record is
+    kept in a short in-memory history and added to per-(operation, sheet)
+    totals; with a trace file, it is also written there as one JSON line.
+    profile_next() runs the next span under cProfile and dumps its stats.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self.profile_dir = "profiles"
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=RECENT_RECORDS)
+        self._totals = {}
+        self._logger = None
+        self._profiles_armed = 0
+        self._profiling = False
+
+    def enable(self, trace_path=None, profile_dir=None):
+        if profile_dir:
+            self.profile_dir = profile_dir
+        if trace_path and trace_path != self.trace_path:
+            handler = logging.handlers.RotatingFileHandler(
+                trace_path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger(f"data_entry.trace.{id(self)}")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            for old in list(logger.handlers):
+                logger.removeHandler(old)
+                old.close()
+            logger.addHandler(handler)
+            self._logger = logger
+            self.trace_path = trace_path
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    @contextmanager
+    def span(self, operation, sheet=None):
+        """Time the block; the yielded dict takes extra fields such as rows and bytes"""
+        if not self.enabled:
+            yield {}
+            return
+        record = {"operation": operation, "sheet": sheet}
+        profiler = self._start_profile()
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["ms"] = round((time.perf_counter() - started) * 1000, 3)
+            if profiler is not None:
+                record["profile"] = self._dump_profile(profiler, operation, sheet)
+            self._add(record)
+
+    def timed(self, operation, sheet, func, measure=None):
+        """`func` run inside a span, for jobs handed to the I/O thread
+
+        measure(result) returns the fields to add to the record, e.g. the
+        number of rows loaded; it only runs while recording.
+        """
+        def run(*args, **kwargs):
+            with self.span(operation, sheet) as record:
+                result = func(*args, **kwargs)
+                if measure is not None and self.enabled:
+                    record.update(measure(result))
+            return result
+        return run
+
+    def _add(self, record):
+        record["time"] = datetime.now().isoformat(timespec="milliseconds")
+        record["thread"] = threading.current_thread().name
+        with self._lock:
+            self._recent.append(record)
+            totals = self._totals.get((record["operation"], record["sheet"]))
+            if totals is None:
+                totals = self._totals[(record["operation"], record["sheet"])] = {
+                    "operation": record["operation"], "sheet": record["sheet"],
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "bytes": None,
+                }
+            totals["count"] += 1
+            totals["total_ms"] += record["ms"]
+            totals["max_ms"] = max(totals["max_ms"], record["ms"])
+            totals["last_ms"] = record["ms"]
+            totals["rows"] += record.get("rows") or 0
+            if record.get("bytes") is not None:
+                totals["bytes"] = record["bytes"]
+            logger = self._logger
+        if logger is not None:
+            logger.info(json.dumps(record, default=str))
+
+    def summary(self):
+        """Totals per operation and sheet, the most time-consuming first"""
+        with self._lock:
+            totals = [dict(entry) for entry in self._totals.values()]
+        for entry in totals:
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+        totals.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return totals
+
+    def recent(self):
+        """The latest records, oldest first"""
+        with self._lock:
+            return list(self._recent)
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+            self._totals.clear()
+
+    def profile_next(self, count=1):
+        """Run the next `count` spans, on whichever thread, under cProfile"""
+        with self._lock:
+            self._profiles_armed += count
+
+    @property
+    def profiles_armed(self):
+        return self._profiles_armed
+
+    def _start_profile(self):
+        with self._lock:
+            # One at a time: only one profiler can be active in the process
+            if not self._profiles_armed or self._profiling:
+                return None
+            self._profiles_armed -= 1
+            self._profiling = True
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (a debugger, say) is already active; try the next span
+            with self._lock:
+                self._profiles_armed += 1
+                self._profiling = False
+            return None
+        return profiler
+
+    def _dump_profile(self, profiler, operation, sheet):
+        profiler.disable()
+        with self._lock:
+            self._profiling = False
+        name = "-".join(part for part in (datetime.now().strftime("%Y%m%d-%H%M%S-%f"), operation, sheet) if part)
+        path = os.path.join(self.profile_dir, re.sub(r"[^\w.-]+", "_", name) + ".prof")
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError:
+            return None
+        return path
+
+
+# Shared by every window; main() turns it on with --diagnostics or --trace
+metrics = Metrics()
@@ -0,0 +1,162 @@
+import csv
+import gzip
+import json
+import os
+
+
+EXPORT_FORMATS = ("csv", "jsonl")
+# Rows written between progress updates and checks for cancelling
+CHUNK_ROWS = 10000
+# gzip level for .gz exports: nearly the size of level 9 in a fraction of the time
+GZIP_LEVEL = 6
+
+
+class ExportCancelled(Exception):
+    """Raised inside the export when the user cancels it"""
+
+
+class ExportProgress:
+    """Counters the export updates from the I/O thread and the UI reads with after()"""
+    def __init__(self):
+        self.written = 0
+        self.paths = []
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def export_format(path):
+    """(format, gzipped) implied by a file name such as rows.csv or rows.jsonl.gz"""
+    name = path.lower()
+    compress = name.endswith(".gz")
+    if compress:
+        name = name[:-3]
+    for fmt, extensions in (("csv", (".csv",)), ("jsonl", (".jsonl", ".ndjson", ".json"))):
+        if name.endswith(extensions):
+            return fmt, compress
+    raise ValueError("Export to a .csv or .jsonl file, optionally gzipped (.csv.gz, .jsonl.gz).")
+
+
+def part_path(path, number):
+    """Name of part `number` of a split export: rows.csv.gz -> rows.part0001.csv.gz"""
+    root, extension = os.path.splitext(path)
+    if extension.lower() == ".gz":
+        root, inner = os.path.splitext(root)
+        extension = inner + extension
+    return f"{root}.part{number:04d}{extension}"
+
+
+def row_writer(out, fmt, columns, include_ids=False):
+    """A function writing one (row_id, values) row to the text stream `out`
+
+    For CSV the header line is written first; JSON lines are objects keyed
+    by column name, with dates and times as text. Rows are padded with None
+    or cut to the number of columns, so every line has a field per column.
+    """
+    width = len(columns)
+    padding = (None,) * width
+
+    def fitted(values):
+        return tuple(values[:width]) + padding[len(values):]
+    if fmt == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow((["row"] if include_ids else []) + list(columns))
+        if include_ids:
+            return lambda row_id, values: writer.writerow((row_id, *fitted(values)))
+        # csv writes None as an empty field
+        return lambda row_id, values: writer.writerow(fitted(values))
+    if fmt != "jsonl":
+        raise ValueError(f"Unknown export format '{fmt}'; use one of: {', '.join(EXPORT_FORMATS)}")
+    names = [str(col) for col in columns]
+    dumps = json.JSONEncoder(default=str).encode
+
+    def write(row_id, values):
+        record = dict(zip(names, fitted(values)))
+        if include_ids:
+            record = {"row": row_id, **record}
+        out.write(dumps(record) + "\n")
+    return write
+
+
+def write_rows(out, fmt, columns, keyed_rows, include_ids=False):
+    """Write the non-blank ones of (row_id, values) rows to `out`; returns how many"""
+    write = row_writer(out, fmt, columns, include_ids)
+    count = 0
+    for row_id, values in keyed_rows:
+        if any(values):
+            write(row_id, values)
+            count += 1
+    return count
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=GZIP_LEVEL)
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def export_sheet(session, sheet_name, columns, target_path, progress=None, part_rows=None,
+                 include_ids=False, fmt=None, compress=None, chunk_size=CHUNK_ROWS):
+    """Stream a sheet's rows to a CSV or JSON-lines file, optionally gzipped and split into parts
+
+    Rows go from the session's iter_keyed_chunks() straight into the file,
+    so memory use doesn't grow with the sheet and the session lock is only
+    taken while each chunk is read. The format and compression
+    default to what target_path's name says. With part_rows, every
+    part_rows rows start a new numbered file (see part_path()), each with its
+    own header. Files are written under a temporary name and renamed once
+    complete; if the export fails or is cancelled, the ones written so far
+    are removed. Returns the ExportProgress with the row count and paths.
+    """
+    progress = progress or ExportProgress()
+    if fmt is None:
+        fmt, _ = export_format(target_path)
+    if compress is None:
+        compress = target_path.lower().endswith(".gz")
+    # Read a chunk at a time, so the session lock isn't held while the file is written
+    chunks = session.iter_keyed_chunks(sheet_name, chunk_size)
+    rows = ((row_id, values) for chunk in chunks for row_id, values in chunk if any(values))
+
+    def open_part():
+        path = part_path(target_path, len(progress.paths) + 1) if part_rows else target_path
+        if os.path.exists(path) and os.path.samefile(session.path, path):
+            raise ValueError("Choose a different file to export to.")
+        out = _open_output(path + ".tmp", compress)
+        return path, out, row_writer(out, fmt, columns, include_ids)
+
+    path = out = None
+    try:
+        in_part = 0
+        for row_id, values in rows:
+            if out is None:
+                path, out, write = open_part()
+            write(row_id, values)
+            progress.written += 1
+            in_part += 1
+            if part_rows and in_part == part_rows:
+                out.close()
+                os.replace(path + ".tmp", path)
+                progress.paths.append(path)
+                out = None
+                in_part = 0
+            if progress.written % chunk_size == 0 and progress.cancelled:
+                raise ExportCancelled()
+        if out is None and not progress.paths:
+            # No rows: still write the file (a CSV one gets its header)
+            path, out, _ = open_part()
+        if out is not None:
+            out.close()
+            os.replace(path + ".tmp", path)
+            progress.paths.append(path)
+            out = None
+    except BaseException:
+        chunks.close()
+        if out is not None:
+            out.close()
+            os.remove(path + ".tmp")
+        for written in progress.paths:
+            os.remove(written)
+        progress.paths = []
+        raise
+    return progress
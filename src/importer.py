@@ -0,0 +1,147 @@
+import csv
+import os
+from contextlib import suppress
+from itertools import islice
+
+
+class ImportCancelled(Exception):
+    """Raised inside the row stream when the user cancels an import"""
+
+
+class ImportProgress:
+    """Counters the import updates from the I/O thread and the UI reads with after()"""
+    def __init__(self):
+        self.processed = 0
+        self.imported = 0
+        self.rejected = 0
+        self.cancelled = False
+        self.reject_path = None
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def open_source(path, sheet_name=None):
+    """Return (header, row iterator, close function) for a .csv or .xlsx file
+
+    For workbooks the sheet with the same name as the target is used if there
+    is one, otherwise the first sheet.
+    """
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        source = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.worksheets[0]
+        rows = source.iter_rows(values_only=True)
+        close = workbook.close
+    else:
+        f = open(path, newline="", encoding="utf-8-sig", errors="replace")
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        rows = csv.reader(f, dialect)
+        close = f.close
+
+    header = next(rows, None)
+    if header is None:
+        close()
+        raise ValueError("The file is empty.")
+    header = ["" if value is None else str(value).strip() for value in header]
+    return header, rows, close
+
+
+def read_source_header(path, sheet_name=None):
+    """Column names of a .csv or .xlsx file, for the mapping dialog"""
+    header, _, close = open_source(path, sheet_name)
+    close()
+    return header
+
+
+def auto_mapping(header, columns):
+    """Map each target column to the source column with the same name (case-insensitive)"""
+    positions = {name.lower(): idx for idx, name in reversed(list(enumerate(header)))}
+    return {col: positions.get(str(col).strip().lower()) for col in columns}
+
+
+def _validated_rows(rows, columns, mapping, progress, reject_writer, chunk_size):
+    """Yield target rows that have every mapped column filled; write the rest to the reject file
+
+    Unmapped target columns are left empty (None). Rows are pulled and
+    checked a chunk at a time, so memory stays bounded by `chunk_size`
+    however long the source is.
+    """
+    indices = [mapping.get(col) for col in columns]
+    mapped = [(col, position) for position, (col, idx) in enumerate(zip(columns, indices)) if idx is not None]
+    width = max(idx for idx in indices if idx is not None) + 1
+    line = 1  # header
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        if progress.cancelled:
+            raise ImportCancelled()
+        accepted = []
+        for source_row in chunk:
+            line += 1
+            if not any(source_row):
+                # Blank lines are skipped silently, like blank rows in the viewers
+                continue
+            row = list(source_row)
+            if len(row) < width:
+                row.extend([None] * (width - len(row)))
+            values = [None if idx is None else row[idx] for idx in indices]
+            values = [value.strip() if value.__class__ is str else value for value in values]
+            missing = [col for col, position in mapped if values[position] is None or values[position] == ""]
+            if missing:
+                reject_writer.writerow([line, f"Missing: {', '.join(missing)}", *source_row])
+                progress.rejected += 1
+            else:
+                accepted.append(values)
+        progress.processed = line - 1
+        progress.imported += len(accepted)
+        yield from accepted
+
+
+def import_file(session, sheet_name, columns, source_path, mapping=None,
+                progress=None, reject_path=None, chunk_size=10000):
+    """Append every valid row of a CSV/XLSX file to one sheet in a single write
+
+    Rows missing a value for a mapped column go to `reject_path` (default
+    <source>.rejects.csv) with the source line number and the reason. Returns
+    the ImportProgress with the final counts.
+    """
+    progress = progress or ImportProgress()
+    reject_path = reject_path or os.path.splitext(source_path)[0] + ".rejects.csv"
+
+    header, rows, close = open_source(source_path, sheet_name)
+    if mapping is None:
+        mapping = auto_mapping(header, columns)
+    if all(idx is None for idx in mapping.values()):
+        close()
+        raise ValueError("None of the file's columns match the sheet's columns.")
+
+    try:
+        with open(reject_path, "w", newline="", encoding="utf-8") as reject_file:
+            reject_writer = csv.writer(reject_file)
+            reject_writer.writerow(["Line", "Reason", *header])
+            session.bulk_append(
+                sheet_name,
+                _validated_rows(rows, columns, mapping, progress, reject_writer, chunk_size),
+                len(columns)
+            )
+    except BaseException:
+        # Nothing was written to the workbook, so a partial reject file would only mislead;
+        # if it couldn't even be created, the error that says why must not be hidden
+        with suppress(FileNotFoundError):
+            os.remove(reject_path)
+        raise
+    finally:
+        close()
+
+    if progress.rejected:
+        progress.reject_path = reject_path
+    else:
+        os.remove(reject_path)
+    return progress
@@ -0,0 +1,253 @@
+from array import array
+from itertools import islice, repeat, zip_longest
+
+
+# Rows are taken in this many at a time, and turned into columns in one go
+CHUNK_ROWS = 4096
+# A column stops being dictionary-encoded once it has more distinct values
+# than this and they make up more than half its rows: codes would then cost
+# more than they save
+DISTINCT_LIMIT = 4096
+# Largest code each array type can hold, in the order columns widen through them
+_CODE_TYPES = (("B", 0xFF), ("H", 0xFFFF), ("I", 0xFFFFFFFF))
+
+
+def _key(value):
+    # 1, 1.0 and True are equal but must stay distinct values
+    return value if value.__class__ is str else (value.__class__, value)
+
+
+def _plain_cells(values):
+    """The values as a typed array when they are all floats or all ints, else as a list"""
+    kinds = set(map(type, values))
+    if kinds == {float}:
+        return array("d", values)
+    if kinds == {int}:
+        try:
+            return array("q", values)
+        except OverflowError:
+            pass
+    return list(values)
+
+
+class _Column:
+    """One column of a RowStore
+
+    While values repeat, the column is dictionary-encoded: `values` holds
+    each distinct value once and `codes` one small integer per row indexing
+    it, so a column of a few hundred categories costs a byte a row. Once the
+    values barely repeat (IDs, free text) the column keeps them directly in
+    `cells`, as a typed array when they are all numbers of one type.
+    """
+    __slots__ = ("codes", "values", "lookup", "cells")
+
+    def __init__(self, count=0):
+        self.codes = array("B")
+        self.values = []
+        self.lookup = {}
+        self.cells = None
+        if count:
+            self.extend(repeat(None, count))
+
+    def __getitem__(self, position):
+        cells = self.cells
+        if cells is not None:
+            return cells[position]
+        return self.values[self.codes[position]]
+
+    def _code(self, key, value):
+        code = self.lookup.get(key)
+        if code is None:
+            code = self.lookup[key] = len(self.values)
+            self.values.append(value)
+            for typecode, largest in _CODE_TYPES:
+                if code <= largest:
+                    break
+            if typecode != self.codes.typecode:
+                self.codes = array(typecode, self.codes)
+        return code
+
+    def extend(self, values):
+        values = list(values)
+        if self.cells is None:
+            try:
+                # _key() inlined: this runs for every cell of a load
+                keys = [value if value.__class__ is str else (value.__class__, value) for value in values]
+                try:
+                    codes = list(map(self.lookup.__getitem__, keys))
+                except KeyError:
+                    # Values not seen before
+                    codes = list(map(self._code, keys, values))
+            except TypeError:
+                # Unhashable
+                codes = None
+            distinct = len(self.values)
+            # Single rows (appended on the UI thread while the search index may be
+            # reading the column) never switch; loads add whole chunks
+            if codes is not None and (len(codes) == 1 or not (
+                    distinct > DISTINCT_LIMIT and distinct * 2 > len(self.codes) + len(codes))):
+                self.codes.extend(codes)
+                return
+            self._decode()
+        self._extend_cells(values)
+
+    def _decode(self):
+        """Stop encoding: keep every row's value directly"""
+        self.cells = _plain_cells(list(map(self.values.__getitem__, self.codes)))
+        self.codes = array("B")
+        self.values = []
+        self.lookup = {}
+
+    def _extend_cells(self, values):
+        cells = self.cells
+        if isinstance(cells, array):
+            if set(map(type, values)) <= {float if cells.typecode == "d" else int}:
+                try:
+                    cells.extend(values)
+                    return
+                except OverflowError:
+                    pass
+            cells = self.cells = list(cells)
+        cells.extend(values)
+
+    def set(self, position, value):
+        if self.cells is None:
+            try:
+                self.codes[position] = self._code(_key(value), value)
+                return
+            except TypeError:
+                self._decode()
+        cells = self.cells
+        if isinstance(cells, array):
+            if value.__class__ is (float if cells.typecode == "d" else int):
+                try:
+                    cells[position] = value
+                    return
+                except OverflowError:
+                    pass
+            cells = self.cells = list(cells)
+        cells[position] = value
+
+    def slice(self, start, stop):
+        cells = self.cells
+        if cells is not None:
+            return list(cells[start:stop])
+        return list(map(self.values.__getitem__, self.codes[start:stop]))
+
+    def mapped(self, func, count):
+        """func(value) for the first `count` rows (the values themselves if func is None)
+
+        Encoded, func is called once per distinct value.
+        """
+        cells = self.cells
+        if cells is not None:
+            return list(cells[:count]) if func is None else list(map(func, cells[:count]))
+        results = self.values if func is None else list(map(func, self.values))
+        return list(map(results.__getitem__, self.codes[:count]))
+
+
+class RowStore:
+    """A sheet's rows, stored column by column to keep big sheets small in memory
+
+    Behaves like a list of row tuples: rows go in with append()/extend() and
+    item assignment, and come out as tuples (padded with None to the widest
+    row) only when read. Sorting, searching and comparing work a column at a
+    time through map_column() and column() instead, without building tuples.
+
+    A load fills the store on the I/O thread, and the UI thread may append
+    while the search index reads it there: rows only count once every column
+    holds them, and readers take the row count up front.
+    """
+    __slots__ = ("_columns", "_count")
+
+    def __init__(self, rows=()):
+        self._columns = []
+        self._count = 0
+        self.extend(rows)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def width(self):
+        return len(self._columns)
+
+    def _widen(self, width):
+        while len(self._columns) < width:
+            self._columns.append(_Column(self._count))
+
+    def extend(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, CHUNK_ROWS))
+            if not chunk:
+                return
+            cells = list(zip_longest(*chunk))
+            self._widen(len(cells))
+            for index, column in enumerate(self._columns):
+                column.extend(cells[index] if index < len(cells) else repeat(None, len(chunk)))
+            self._count += len(chunk)
+
+    def append(self, row):
+        self.extend((row,))
+
+    def _position(self, position):
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("row index out of range")
+        return position
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(self._count))]
+        position = self._position(position)
+        return tuple([column[position] for column in self._columns])
+
+    def __setitem__(self, position, row):
+        position = self._position(position)
+        self._widen(len(row))
+        for index, column in enumerate(self._columns):
+            column.set(position, row[index] if index < len(row) else None)
+
+    def __iter__(self):
+        count = self._count
+        for start in range(0, count, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, count)
+            if not self._columns:
+                yield from repeat((), stop - start)
+            else:
+                yield from zip(*[column.slice(start, stop) for column in self._columns])
+
+    def column(self, column, count=None):
+        """One column's values for the first `count` rows (all by default)"""
+        return self.map_column(column, None, count)
+
+    def map_column(self, column, func, count=None):
+        """func(value) for each of the first `count` rows of a column
+
+        On a dictionary-encoded column func runs once per distinct value, so
+        deriving sort keys or search text for a column of categories is cheap.
+        """
+        count = self._count if count is None else min(count, self._count)
+        if column >= len(self._columns):
+            return [None if func is None else func(None)] * count
+        return self._columns[column].mapped(func, count)
+
+    def starts_with(self, other):
+        """True when the first rows of this store are the rows of `other`, another RowStore"""
+        count = len(other)
+        if count > self._count:
+            return False
+        return all(self.column(column, count) == other.column(column, count)
+                   for column in range(max(self.width, other.width)))
+
+
+def map_column(rows, column, func, count=None):
+    """func(value) for one column of the first `count` rows (all by default) of `rows`
+
+    `rows` is a RowStore or a plain list of row tuples.
+    """
+    if isinstance(rows, RowStore):
+        return rows.map_column(column, func, count)
+    return [func(row[column] if column < len(row) else None) for row in rows[:count]]
@@ -0,0 +1,175 @@
+from array import array
+from bisect import bisect_right
+from collections import Counter
+
+from rowstore import map_column
+
+
+def _cell_text(value):
+    return "" if value is None else str(value).lower()
+
+
+def _row_cell(row, column):
+    return _cell_text(row[column]) if column < len(row) else ""
+
+
+class ColumnIndex:
+    """One column's values, lower-cased, in sorted order
+
+    The distinct values are kept as a single newline-separated string, so a
+    substring of any value is found with str.find instead of a Python loop
+    over the values, and a prefix range with a binary search. `positions`
+    lists the row positions in value order; the rows holding distinct value
+    i are positions[bounds[i]:bounds[i + 1]].
+    """
+    def __init__(self, rows, column, count):
+        texts = map_column(rows, column, _cell_text, count)
+        order = sorted(range(count), key=texts.__getitem__)
+        counts = Counter(map(texts.__getitem__, order))
+        del texts
+
+        self.positions = array("i", order)
+        self.bounds = array("i", [0])
+        self.starts = array("i")
+        offset = 1
+        total = 0
+        for value, number in counts.items():
+            self.starts.append(offset)
+            offset += len(value) + 1
+            total += number
+            self.bounds.append(total)
+        self.starts.append(offset)
+        self.text = "\n" + "\n".join(counts) + "\n"
+        # IDs and the like: every value once, so value i is simply positions[i]
+        self.unique = len(counts) == count
+
+    def _value(self, index):
+        return self.text[self.starts[index]:self.starts[index + 1] - 1]
+
+    def _lower_bound(self, text):
+        """First distinct value that is >= text"""
+        low, high = 0, len(self.starts) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._value(middle) < text:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def containing(self, text):
+        """Distinct value indices whose value contains `text`"""
+        text_blob, starts = self.text, self.starts
+        matched = []
+        position = text_blob.find(text)
+        while position != -1:
+            index = bisect_right(starts, position) - 1
+            matched.append(index)
+            # Carry on from the next value so each one is listed once
+            position = text_blob.find(text, starts[index + 1])
+        return matched
+
+    def rows_containing(self, text):
+        positions, bounds = self.positions, self.bounds
+        if self.unique:
+            return set(map(positions.__getitem__, self.containing(text)))
+        rows = set()
+        for index in self.containing(text):
+            rows.update(positions[bounds[index]:bounds[index + 1]])
+        return rows
+
+    def rows_starting_with(self, text):
+        low = self._lower_bound(text)
+        high = self._lower_bound(text + "\U0010ffff")
+        return set(self.positions[self.bounds[low]:self.bounds[high]])
+
+
+class RowIndex:
+    """Search index over the rows of one loaded sheet
+
+    Built once per load, a column at a time, the first time a query needs it
+    (slow on big sheets, so build off the UI thread). Rows the view appends
+    or replaces afterwards are not re-indexed; they are checked directly on
+    each query instead, which stays cheap as long as there are few of them.
+    """
+    def __init__(self, rows, column_count):
+        self.rows = rows
+        self.column_count = column_count
+        self._columns = {}
+        self._indexed = 0
+        self._replaced = set()
+        self._cache = {}
+
+    @property
+    def ready(self):
+        return len(self._columns) == self.column_count
+
+    def build(self, columns=None):
+        """Index the given columns (all by default) of the rows loaded so far"""
+        # Columns added later cover the same rows as the first ones
+        count = self._indexed if self._columns else len(self.rows)
+        built = dict(self._columns)
+        for column in range(self.column_count) if columns is None else columns:
+            if column not in built:
+                built[column] = ColumnIndex(self.rows, column, count)
+        # Published in one step, as queries on the UI thread may be reading
+        self._indexed = count
+        self._columns = built
+
+    def column_ready(self, column):
+        return column in self._columns
+
+    def replace_row(self, position):
+        """Note that the view replaced a row in place"""
+        self._replaced.add(position)
+        self._cache.clear()
+
+    def _unindexed(self):
+        """Positions whose current values the index doesn't reflect"""
+        return self._replaced.union(range(self._indexed, len(self.rows)))
+
+    def _piece_rows(self, piece):
+        """Indexed rows with a cell containing `piece`"""
+        rows = self._cache.get(piece)
+        if rows is None:
+            rows = set()
+            for column in self._columns.values():
+                rows |= column.rows_containing(piece)
+            rows -= self._replaced
+            self._cache[piece] = rows
+        return rows
+
+    def search(self, text):
+        """Positions, in row order, of the rows where every word of `text` is in some cell
+
+        Case-insensitive; a word may match anywhere inside a cell. Needs
+        build() to have indexed every column.
+        """
+        pieces = sorted(set(text.lower().split()), key=len, reverse=True)
+        if not pieces:
+            return list(range(len(self.rows)))
+        # Longest word first: it usually matches the fewest rows
+        result = None
+        for piece in pieces:
+            rows = self._piece_rows(piece)
+            result = set(rows) if result is None else result & rows
+            if not result:
+                break
+        for position in self._unindexed():
+            row = self.rows[position]
+            cells = [_row_cell(row, column) for column in range(self.column_count)]
+            if all(any(piece in cell for cell in cells) for piece in pieces):
+                result.add(position)
+        return sorted(result)
+
+    def prefix_search(self, column, text):
+        """Positions, in row order, of the rows whose `column` value starts with `text`
+
+        Needs build([column]) to have run.
+        """
+        text = text.lower()
+        result = self._columns[column].rows_starting_with(text) - self._replaced
+        for position in self._unindexed():
+            if _row_cell(self.rows[position], column).startswith(text):
+                result.add(position)
+        return sorted(result)
@@ -0,0 +1,133 @@
+import math
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from rowstore import map_column
+
+
+# Kinds of value, in the order they sort in; blanks always come last
+NUMBER, DATE, TEXT, BLANK = range(4)
+
+
+def sort_key(value):
+    """(kind, comparable) for one cell, so numbers and dates sort by value, not as text
+
+    Cells loaded from a workbook are already int/float/datetime; cells typed
+    into the form or read from SQLite text columns are strings, so those are
+    recognized too (plain numbers, and ISO dates such as 2024-03-15 14:30).
+    """
+    if value is None:
+        return (BLANK, 0)
+    cls = value.__class__
+    if cls is int or cls is float:
+        return (NUMBER, value) if value == value else (TEXT, "nan")
+    if cls is str:
+        text = value.strip()
+        if not text:
+            return (BLANK, 0)
+        if text[0] in "0123456789+-.":
+            try:
+                number = float(text)
+            except ValueError:
+                if len(text) >= 10 and text[4] in "-/":
+                    try:
+                        moment = datetime.fromisoformat(text.replace("/", "-"))
+                    except ValueError:
+                        pass
+                    else:
+                        return (DATE, moment if moment.tzinfo is None else moment.replace(tzinfo=None))
+            else:
+                # float() also takes "-inf" and "+nan", which aren't worth sorting as numbers
+                if math.isfinite(number):
+                    return (NUMBER, number)
+        return (TEXT, text.casefold())
+    if isinstance(value, datetime):
+        return (DATE, value if value.tzinfo is None else value.replace(tzinfo=None))
+    if isinstance(value, date):
+        return (DATE, datetime(value.year, value.month, value.day))
+    if isinstance(value, bool):
+        return (NUMBER, int(value))
+    return (TEXT, str(value).casefold())
+
+
+def _cell(row, column):
+    return row[column] if column < len(row) else None
+
+
+class _ColumnOrder:
+    """One column's rows in ascending order, with their sort keys alongside
+
+    `positions` lists row positions in sorted order and `keys[i]` is the sort
+    key of the row at positions[i], so a changed or appended row is moved
+    into place with a binary search instead of a full sort.
+    """
+    def __init__(self, rows, column):
+        self.column = column
+        self.count = len(rows)
+        keys = map_column(rows, column, sort_key)
+        # Sorted a kind at a time on the bare values: comparing floats or
+        # strings is several times cheaper than comparing (kind, value) tuples
+        groups = ([], [], [], [])
+        for position, key in enumerate(keys):
+            groups[key[0]].append(position)
+        values = [key[1] for key in keys]
+        self.positions = []
+        for group in groups:
+            group.sort(key=values.__getitem__)
+            self.positions += group
+        self.keys = [keys[position] for position in self.positions]
+
+    def add(self, row, position):
+        key = sort_key(_cell(row, self.column))
+        # Among equal values by row position, as a stable sort would have put it
+        low = bisect_left(self.keys, key)
+        index = bisect_left(self.positions, position, low, bisect_right(self.keys, key, low))
+        self.keys.insert(index, key)
+        self.positions.insert(index, position)
+
+    def remove(self, row, position):
+        index = bisect_left(self.keys, sort_key(_cell(row, self.column)))
+        index = self.positions.index(position, index)
+        del self.keys[index]
+        del self.positions[index]
+
+    def ordered(self, descending=False):
+        if not descending:
+            return list(self.positions)
+        # Largest first, but blanks stay at the bottom either way
+        blanks = bisect_left(self.keys, (BLANK,))
+        return self.positions[blanks - 1::-1] + self.positions[blanks:] if blanks else list(self.positions)
+
+
+class SortCache:
+    """Sort orders of a row list, computed once per column and then kept current
+
+    The first sort on a column costs one pass over the rows plus a sort; later
+    ones, either direction, only copy the cached order out. Rows appended to
+    the list are merged in the next time an order is asked for, and rows
+    replaced in place must be reported with replace_row().
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self._columns = {}
+
+    def _column(self, column):
+        order = self._columns.get(column)
+        if order is None:
+            order = self._columns[column] = _ColumnOrder(self.rows, column)
+        else:
+            for position in range(order.count, len(self.rows)):
+                order.add(self.rows[position], position)
+            order.count = len(self.rows)
+        return order
+
+    def order(self, column, descending=False):
+        """Row positions sorted on `column` by typed value"""
+        return self._column(column).ordered(descending)
+
+    def replace_row(self, position, old_row):
+        """Re-sort one row whose values changed from `old_row` to what the list now holds"""
+        for order in self._columns.values():
+            if position < order.count:
+                order.remove(old_row, position)
+                order.add(self.rows[position], position)
@@ -0,0 +1,1885 @@
+import getpass
+import datetime
+import functools
+import hashlib
+import io
+import itertools
+import json
+import os
+import posixpath
+import queue
+import re
+import shutil
+import socket
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from array import array
+from collections import deque
+from contextlib import contextmanager
+
+from rowstore import RowStore
+
+# openpyxl is imported inside the functions that use it: importing it takes
+# longer than starting the rest of the app, and often no workbook is parsed at all
+
+
+# How long a writer waits for another client's save before giving up, and how
+# old a lock file must be before it is taken to be left behind by a crash
+LOCK_TIMEOUT = 30.0
+STALE_LOCK_AGE = 120.0
+# Times a save is redone on top of a file someone else saved in the meantime
+SAVE_ATTEMPTS = 5
+# Worker processes parsing sheets at once
+PARSE_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class FileLockedError(TimeoutError):
+    """Another client held the file's lock for longer than LOCK_TIMEOUT"""
+
+
+class FileChangedError(Exception):
+    """The file was saved by someone else after we read it; our write was not made"""
+
+
+class IOCancelled(Exception):
+    """Passed to a job's on_error when the user cancels it with IOExecutor.cancel_all()"""
+
+
+class RowConflictError(Exception):
+    """The row no longer holds the values the update was based on"""
+
+
+def client_name():
+    """This user on this machine, for the files each client of a shared workbook keeps to itself"""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    return re.sub(r"[^\w.-]", "_", f"{user}-{socket.gethostname()}")
+
+
+def client_path(path, suffix):
+    """<path>.<client><suffix>, taking over a shared file of that name left by an older version"""
+    own = f"{path}.{client_name()}{suffix}"
+    legacy = path + suffix
+    if os.path.exists(legacy) and not os.path.exists(own):
+        try:
+            os.replace(legacy, own)
+        except OSError:
+            pass
+    return own
+
+
+def _tmp_path(path):
+    """Scratch file for rewriting `path` that no other client or process will pick too"""
+    return f"{path}.{client_name()}.{os.getpid()}.tmp"
+
+
+class FileLock:
+    """Advisory lock shared by every client of a file on a shared drive
+
+    Held as <file>.lock, created exclusively, so it works wherever the file
+    itself is reachable. Writers only hold it for the moment it takes to check
+    the file is unchanged and rename their finished copy over it; a lock older
+    than STALE_LOCK_AGE is treated as left behind by a crash and broken.
+    """
+    def __init__(self, path, timeout=LOCK_TIMEOUT, stale_age=STALE_LOCK_AGE):
+        self.path = path
+        self.timeout = timeout
+        self.stale_age = stale_age
+
+    def _owner(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return f.read().strip() or "another user"
+        except OSError:
+            return "another user"
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        delay = 0.01
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(f"{client_name()} (pid {os.getpid()})")
+                return
+            try:
+                if time.time() - os.stat(self.path).st_mtime > self.stale_age:
+                    # Renamed away first, so of two clients breaking it only one succeeds
+                    stale = _tmp_path(self.path)
+                    os.replace(self.path, stale)
+                    os.remove(stale)
+                    continue
+            except OSError:
+                # Released or broken by someone else meanwhile
+                continue
+            if time.monotonic() > deadline:
+                raise FileLockedError(f"The file is locked by {self._owner()}. Please try again in a moment.")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    def refresh(self):
+        """Show a long-running holder is still alive, so the lock isn't broken as stale"""
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def read_sheet_headers(excel_path):
+    """Return {sheet_name: [column names]} from the first row of every sheet"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(excel_path, read_only=True)
+    try:
+        headers = {}
+        for sheet_name in workbook.sheetnames:
+            first_row = next(workbook[sheet_name].iter_rows(min_row=1, max_row=1, values_only=True), ())
+            headers[sheet_name] = [col for col in first_row if col is not None]
+        return headers
+    finally:
+        workbook.close()
+
+
+def _local_name(tag):
+    """Tag without its XML namespace (transitional and strict OOXML use different ones)"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _rich_text(element):
+    """Text of an <si> or <is> element, joining rich-text runs and skipping phonetic hints"""
+    parts = []
+    for child in element:
+        name = _local_name(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(t.text or "" for t in child if _local_name(t.tag) == "t")
+    return "".join(parts)
+
+
+def _workbook_parts(archive):
+    """Return ([(sheet_name, part_path)], shared_strings_path) from the workbook manifest"""
+    targets = {}
+    shared_strings = None
+    for rel in ET.fromstring(archive.read("xl/_rels/workbook.xml.rels")):
+        target = rel.get("Target")
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = path
+        if rel.get("Type", "").endswith("/sharedStrings"):
+            shared_strings = path
+
+    sheets = []
+    for element in ET.fromstring(archive.read("xl/workbook.xml")).iter():
+        if _local_name(element.tag) == "sheet":
+            rel_id = next(value for key, value in element.attrib.items() if _local_name(key) == "id")
+            sheets.append((element.get("name"), targets[rel_id]))
+    return sheets, shared_strings
+
+
+def _scan_first_row(archive, part):
+    """Raw cells of row 1 as (type, value, formula, inline_text), stopping right after it"""
+    cells = []
+    with archive.open(part) as stream:
+        for event, element in ET.iterparse(stream, events=("start", "end")):
+            name = _local_name(element.tag)
+            if event == "start":
+                # A first <row> other than r="1" means the header row is empty
+                if name == "row" and element.get("r", "1") != "1":
+                    break
+                continue
+            if name == "c":
+                value = formula = inline_text = None
+                for child in element:
+                    child_name = _local_name(child.tag)
+                    if child_name == "v":
+                        value = child.text
+                    elif child_name == "f":
+                        formula = child.text
+                    elif child_name == "is":
+                        inline_text = _rich_text(child)
+                cells.append((element.get("t", "n"), value, formula, inline_text))
+            elif name in ("row", "sheetData"):
+                break
+    return cells
+
+
+def _read_shared_strings(archive, part, needed):
+    """Look up only the shared strings at `needed` indices, stopping after the last one"""
+    strings = {}
+    if not needed or part is None:
+        return strings
+    last = max(needed)
+    index = 0
+    with archive.open(part) as stream:
+        for _, element in ET.iterparse(stream):
+            if _local_name(element.tag) != "si":
+                continue
+            if index in needed:
+                strings[index] = _rich_text(element)
+            element.clear()
+            index += 1
+            if index > last:
+                break
+    return strings
+
+
+def _cell_value(kind, value, formula, inline_text, shared_strings):
+    """Convert a raw cell the way openpyxl does for header values"""
+    if formula:
+        return "=" + formula
+    if kind == "inlineStr":
+        return inline_text
+    if value is None:
+        return None
+    if kind == "s":
+        return shared_strings[int(value)]
+    if kind == "b":
+        return value == "1"
+    if kind in ("str", "e", "d"):
+        return value
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def scan_sheet_headers(archive):
+    """Read row 1 of every sheet straight from the .xlsx XML
+
+    Each sheet part is streamed only up to the end of its first row, and only
+    the shared strings those cells reference are decoded, so the cost doesn't
+    depend on how many data rows the workbook holds.
+    """
+    sheets, shared_strings_part = _workbook_parts(archive)
+    first_rows = [(sheet_name, _scan_first_row(archive, part)) for sheet_name, part in sheets]
+
+    needed = {int(value) for _, cells in first_rows
+              for kind, value, formula, _ in cells if kind == "s" and value is not None and not formula}
+    shared_strings = _read_shared_strings(archive, shared_strings_part, needed)
+
+    headers = {}
+    for sheet_name, cells in first_rows:
+        values = (_cell_value(*cell, shared_strings) for cell in cells)
+        headers[sheet_name] = [value for value in values if value is not None]
+    return headers
+
+
+def _archive_fingerprint(archive):
+    """Content hash of a workbook built from the CRC32 of every part in the zip directory"""
+    digest = hashlib.sha1()
+    for info in archive.infolist():
+        digest.update(f"{info.filename}:{info.CRC}:{info.file_size}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_sheet_headers(excel_path):
+    """Return {sheet_name: [column names]}, using the schema cache on warm starts
+
+    The cache sits next to the workbook (<file>.xlsx.schema.json) and is keyed by
+    a content fingerprint, so an unchanged file is not parsed at all.
+    """
+    cache_path = excel_path + ".schema.json"
+    with zipfile.ZipFile(excel_path) as archive:
+        fingerprint = _archive_fingerprint(archive)
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("fingerprint") == fingerprint:
+                return cached["sheets"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        try:
+            headers = scan_sheet_headers(archive)
+        except (KeyError, StopIteration, ValueError, IndexError, ET.ParseError):
+            # Unusual package layout; let openpyxl figure it out
+            headers = None
+    if headers is None:
+        headers = read_sheet_headers(excel_path)
+
+    try:
+        tmp_path = _tmp_path(cache_path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "sheets": headers}, f, default=str)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only folder just means no warm start next time
+        pass
+    return headers
+
+
+_ROW_NUMBER = re.compile(rb'<(?:[\w.-]+:)?row\b[^>]*?\sr="(\d+)"')
+_SHEET_DATA_START = re.compile(rb'<(?:[\w.-]+:)?sheetData\b')
+_SHEET_DATA_END = re.compile(rb'<([\w.-]+:)?sheetData\s*/>|</([\w.-]+:)?sheetData>')
+_DIMENSION = re.compile(rb'<(?:[\w.-]+:)?dimension\b[^>]*/>')
+_CELL_XFS = re.compile(rb'<([\w.-]+:)?cellXfs\b[^>]*?(/?)>')
+_CELL_XFS_END = re.compile(rb'</(?:[\w.-]+:)?cellXfs>')
+_COUNT = re.compile(rb'\scount="\d+"')
+# Built-in number formats date and time cells are written with, which Excel
+# and openpyxl read back as dates; datetime first, as it is also a date
+_DATE_FORMATS = ((datetime.datetime, 22), (datetime.date, 14), (datetime.time, 21), (datetime.timedelta, 46))
+_STYLES_PART = "xl/styles.xml"
+# Escapes markup and drops control characters XML can't carry, in one translate() pass
+_XML_TEXT = str.maketrans({
+    **{chr(code): None for code in range(0x20) if chr(code) not in "\t\n\r"},
+    "&": "&amp;", "<": "&lt;", ">": "&gt;",
+})
+
+
+def _complete_tags(stream, chunk_size=1 << 20):
+    """Yield chunks of raw XML that always end on a '>' so no tag is split"""
+    carry = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            if carry:
+                yield carry
+            return
+        data = carry + chunk
+        cut = data.rfind(b">") + 1
+        if cut:
+            yield data[:cut]
+        carry = data[cut:]
+
+
+def _last_row_number(stream):
+    """Highest row number used in a worksheet part"""
+    last = 0
+    for piece in _complete_tags(stream):
+        # Rows are stored in ascending order, so the end of each piece is enough
+        matches = _ROW_NUMBER.findall(piece[-65536:]) or _ROW_NUMBER.findall(piece)
+        if matches:
+            last = max(last, int(matches[-1]))
+    return last
+
+
+_SHEET_DATA_OPEN = re.compile(rb'<([\w.-]+:)?sheetData\b[^>]*?(/?)>')
+_ROW_START = re.compile(rb'<(?:[\w.-]+:)?row[\s/>]')
+_ROOT_TAG = re.compile(rb'<([A-Za-z_][\w.:-]*)')
+
+
+def _tail_rows_xml(stream, count):
+    """A worksheet part cut down to its last `count` <row> elements, as a small XML document
+
+    The part has to be decompressed from the start, but rows before the tail
+    are only counted with bytes.count(), never parsed, and only the chunks
+    holding the tail are kept. Returns None if the rows don't carry their row
+    number (r="..."), as the tail's row numbers can't be known then.
+    """
+    head = b""
+    row_tag = None
+    pieces = deque()  # (chunk, row elements starting in it)
+    held = 0
+    for piece in _complete_tags(stream):
+        if row_tag is None:
+            head += piece
+            match = _SHEET_DATA_OPEN.search(head)
+            if match is None:
+                continue
+            prefix = match.group(1) or b""
+            row_tag = b"<" + prefix + b"row"
+            head, piece = head[:match.end()], head[match.end():]
+            if match.group(2):
+                # <sheetData/>: no rows at all
+                break
+        end = _SHEET_DATA_END.search(piece) if b"sheetData" in piece else None
+        if end is not None:
+            piece = piece[:end.start()]
+        rows_here = piece.count(row_tag)
+        pieces.append((piece, rows_here))
+        held += rows_here
+        # Chunks before the ones holding the last `count` row starts can go
+        while pieces and held - pieces[0][1] >= count:
+            held -= pieces.popleft()[1]
+        if end is not None:
+            break
+    if row_tag is None:
+        return None
+
+    data = b"".join(piece for piece, _ in pieces)
+    starts = [match.start() for match in _ROW_START.finditer(data)][-count:] if count else []
+    rows = data[starts[0]:] if starts else b""
+    if rows and not _ROW_NUMBER.match(rows):
+        return None
+    root = _ROOT_TAG.search(head).group(1)
+    if head.endswith(b"/>"):
+        head = head[:-2] + b">"
+    return b"".join((head, rows, b"</", prefix, b"sheetData></", root, b">"))
+
+
+class _SharedStringRefs(dict):
+    """Stands in for the shared-strings table to learn which of its entries some rows use"""
+    def __missing__(self, index):
+        self[index] = None
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _openpyxl_parser():
+    """openpyxl's worksheet parser and the helpers it needs, or None if this openpyxl lacks them
+
+    None of them is public API, so they may move in any release;
+    requirements.txt pins the versions they are known to work in. Without
+    them, sheets are read through the public read-only workbook instead.
+    """
+    try:
+        from openpyxl.reader.strings import read_string_table
+        from openpyxl.styles.stylesheet import Stylesheet
+        from openpyxl.worksheet._reader import INLINE_STRING, WorkSheetParser
+        parser = {"WorkSheetParser": WorkSheetParser, "INLINE_STRING": INLINE_STRING,
+                  "stylesheet_from_tree": Stylesheet.from_tree, "read_string_table": read_string_table}
+    except (ImportError, AttributeError):
+        return None
+    if not all(hasattr(WorkSheetParser, name) for name in ("parse", "parse_cell")):
+        return None
+    return parser
+
+
+def _date_styles(archive):
+    """(date, duration) style ids, worked out from styles.xml the way openpyxl does"""
+    try:
+        source = archive.read("xl/styles.xml")
+    except KeyError:
+        return set(), set()
+    stylesheet = _openpyxl_parser()["stylesheet_from_tree"](ET.fromstring(source))
+    return stylesheet.date_formats, stylesheet.timedelta_formats
+
+
+def _workbook_epoch(archive):
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+    for element in ET.fromstring(archive.read("xl/workbook.xml")).iter():
+        if _local_name(element.tag) == "workbookPr":
+            return CALENDAR_MAC_1904 if element.get("date1904") in ("1", "true") else CALENDAR_WINDOWS_1900
+    return CALENDAR_WINDOWS_1900
+
+
+def _row_values(cells):
+    """A parsed row as a value tuple, with None for the cells the file leaves out"""
+    if not cells:
+        return ()
+    values = [None] * cells[-1]["column"]
+    for cell in cells:
+        values[cell["column"] - 1] = cell["value"]
+    return tuple(values)
+
+
+def tail_sheet_rows(excel_path, sheet_name, count):
+    """(row number, values) of the last `count` rows of a sheet, or None if they can't be found directly
+
+    Only the tail is handed to openpyxl's row parser, so cell types and dates
+    come out as when the whole sheet is streamed, and only the shared strings
+    the tail uses are decoded. openpyxl's read-only workbook isn't used: on
+    a sheet without a <dimension> (as after a streamed append) opening it
+    parses every row of every sheet just to size them. None too when this
+    openpyxl has no usable parser (see _openpyxl_parser()).
+    """
+    parser = _openpyxl_parser()
+    if parser is None:
+        return None
+    WorkSheetParser = parser["WorkSheetParser"]
+    with zipfile.ZipFile(excel_path) as archive:
+        sheets, shared_strings_part = _workbook_parts(archive)
+        part = dict(sheets).get(sheet_name)
+        if part is None:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        with archive.open(part) as stream:
+            document = _tail_rows_xml(stream, count)
+        if document is None:
+            return None
+        date_formats, timedelta_formats = _date_styles(archive)
+        epoch = _workbook_epoch(archive)
+
+        def parse(shared_strings):
+            parser = WorkSheetParser(io.BytesIO(document), shared_strings, epoch=epoch,
+                                     date_formats=date_formats, timedelta_formats=timedelta_formats)
+            return list(parser.parse())
+
+        # Parsed twice: first to find the shared strings used, then with them looked up
+        referenced = _SharedStringRefs()
+        rows = parse(referenced)
+        if referenced:
+            rows = parse(_read_shared_strings(archive, shared_strings_part, set(referenced)))
+    return [(row_number, _row_values(cells)) for row_number, cells in rows if row_number >= 2]
+
+
+def iter_sheet_rows(excel_path, sheet_name):
+    """Iterator of (row number, values) over a sheet's data rows, parsed straight from its XML
+
+    Rows come one at a time from openpyxl's row parser, as when streaming
+    the sheet in read-only mode, but without opening openpyxl's read-only
+    workbook, which on a sheet lacking a <dimension> (as after a streamed
+    append) first parses every row of every sheet just to size them. Rows
+    the file leaves out are skipped. A missing sheet or an unusual package
+    layout raises here rather than on the first row.
+    """
+    parser = _openpyxl_parser()
+    if parser is None:
+        return _public_sheet_rows(excel_path, sheet_name)
+    archive = zipfile.ZipFile(excel_path)
+    try:
+        sheets, shared_strings_part = _workbook_parts(archive)
+        part = dict(sheets).get(sheet_name)
+        if part is None:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        shared_strings = []
+        if shared_strings_part is not None:
+            with archive.open(shared_strings_part) as stream:
+                shared_strings = parser["read_string_table"](stream)
+        date_formats, timedelta_formats = _date_styles(archive)
+        epoch = _workbook_epoch(archive)
+    except BaseException:
+        archive.close()
+        raise
+    return _parsed_rows(archive, part, shared_strings, epoch, date_formats, timedelta_formats)
+
+
+def _public_sheet_rows(excel_path, sheet_name):
+    """iter_sheet_rows() through openpyxl's public read-only workbook, for when its parser can't be used"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(excel_path, read_only=True)
+    try:
+        sheet = workbook[sheet_name]
+    except BaseException:
+        workbook.close()
+        raise
+    return _public_rows(workbook, sheet)
+
+
+def _public_rows(workbook, sheet):
+    try:
+        # The read-only sheet yields a (blank) row for each one the file leaves out
+        for row_number, values in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
+            if any(value is not None for value in values):
+                yield row_number, values
+    finally:
+        workbook.close()
+
+
+def _parsed_rows(archive, part, shared_strings, epoch, date_formats, timedelta_formats):
+    internals = _openpyxl_parser()
+    INLINE_STRING = internals["INLINE_STRING"]
+    with archive, archive.open(part) as stream:
+        parser = internals["WorkSheetParser"](stream, shared_strings, epoch=epoch, date_formats=date_formats,
+                                              timedelta_formats=timedelta_formats)
+        parse_cell = parser.parse_cell
+
+        def parse_inline_cell(element):
+            # openpyxl builds a rich-text object for every inline string just to
+            # take its text, most of the parse time for the streamed appends'
+            # cells; the text alone comes out the same
+            inline = element.find(INLINE_STRING) if element.get("t") == "inlineStr" else None
+            if inline is None:
+                return parse_cell(element)
+            element.remove(inline)
+            cell = parse_cell(element)
+            if cell["data_type"] == "inlineStr":
+                cell["value"] = _rich_text(inline)
+                cell["data_type"] = "s"
+            return cell
+        parser.parse_cell = parse_inline_cell
+        for row_number, cells in parser.parse():
+            if row_number >= 2:
+                yield row_number, _row_values(cells)
+
+
+def read_sheet_rows(excel_path, sheet_name):
+    """A sheet's non-blank data rows, parsed by iter_sheet_rows(), for a worker process
+
+    Returns (last row number, row ids, rows): the number of the sheet's last
+    row, blank or not, then the ids as an array and the rows as a RowStore,
+    which keep the result small to send back to the parent process.
+    """
+    row_ids = array("q")
+    last_row = 1
+
+    def kept():
+        nonlocal last_row
+        for last_row, values in iter_sheet_rows(excel_path, sheet_name):
+            if any(values):
+                row_ids.append(last_row)
+                yield values
+    rows = RowStore(kept())
+    return last_row, row_ids, rows
+
+
+def distinct_values(rows, chunk_size=4096):
+    """The distinct non-blank values of each column of rows, as a list of sets"""
+    columns = []
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        cells = list(itertools.zip_longest(*chunk))
+        while len(columns) < len(cells):
+            columns.append(set())
+        for values, column in zip(columns, cells):
+            values.update(column)
+    for values in columns:
+        values.discard(None)
+        values.discard("")
+    return columns
+
+
+def read_column_values(excel_path, sheet_name):
+    """distinct_values() of a sheet's data rows, parsed by iter_sheet_rows(), for a worker process"""
+    return distinct_values(values for _, values in iter_sheet_rows(excel_path, sheet_name))
+
+
+class SheetReaderPool:
+    """Parses worksheets with read_sheet_rows() in worker processes, several at once
+
+    Parsing is CPU-bound Python, so sheets parsed in threads would take
+    turns on one core; in processes they use as many cores as there are
+    sheets, and the app's own process stays free to redraw meanwhile. The
+    workers start with the first read and are kept for the next ones. Where
+    child processes can't be started, sheets are parsed in this process.
+    """
+    def __init__(self, workers=None):
+        self.workers = workers or PARSE_WORKERS
+        self._executor = None
+        self._unavailable = False
+        # Sheets are read from the I/O thread and suggestions from the background one
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None and not self._unavailable:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Spawned rather than forked: forking a process that runs Tk and
+                # other threads can leave the child with a lock held forever
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def map(self, func, calls):
+        """[func(*args) for args in calls], run in the worker processes when they can be started"""
+        from concurrent.futures.process import BrokenProcessPool
+        calls = list(calls)
+        executor = self._pool()
+        if executor is not None:
+            try:
+                futures = [executor.submit(func, *args) for args in calls]
+                return [future.result() for future in futures]
+            except (OSError, BrokenProcessPool):
+                # No child processes here (a sandbox, or a frozen app that can't spawn itself)
+                self.close()
+                self._unavailable = True
+        return [func(*args) for args in calls]
+
+    def read(self, excel_path, sheet_names):
+        """{sheet_name: read_sheet_rows(excel_path, sheet_name)} for the given sheets"""
+        sheet_names = list(sheet_names)
+        return dict(zip(sheet_names, self.map(read_sheet_rows, [(excel_path, name) for name in sheet_names])))
+
+    def column_values(self, excel_path, sheet_name):
+        """read_column_values(excel_path, sheet_name) in a worker process"""
+        return self.map(read_column_values, [(excel_path, sheet_name)])[0]
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+def _numbered_rows(rows, row_ids, last_row):
+    """Pair rows with the sheet row each one goes to
+
+    A row with an id from `row_ids` (aligned with the first rows) goes to that
+    row; rows without one, or whose row has been taken meanwhile, go directly
+    after the previous row. Rows must end up in ascending order, so ids at or
+    below `last_row` are never reused.
+    """
+    ids = iter(row_ids or ())
+    cursor = last_row
+    for values in rows:
+        row_id = next(ids, None)
+        cursor = row_id if row_id is not None and row_id > cursor else cursor + 1
+        yield cursor, values
+
+
+def _column_letter(index):
+    """Excel column letters for a 1-based column index (1 -> A, 28 -> AB)"""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+class _CellStyles:
+    """Style ids for date and time cells, added to styles.xml as they are first needed
+
+    Dates are written as serial numbers, as Excel stores them, with a plain
+    cell style (no font, fill or border of its own) showing a built-in date
+    format: an existing one when styles.xml has it, otherwise a new one
+    appended to <cellXfs>. styles_xml() gives the part to write if any were
+    added. Without a styles.xml to add to, dates are written as text.
+    """
+    def __init__(self, archive):
+        self.archive = archive
+        self.source = archive.read(_STYLES_PART) if _STYLES_PART in archive.namelist() else None
+        self._ids = {}
+        self._added = []
+        self._count = None
+        self._epoch = None
+        opening = _CELL_XFS.search(self.source) if self.source else None
+        if opening is None or opening.group(2) or not _CELL_XFS_END.search(self.source, opening.end()):
+            return
+        root = ET.fromstring(self.source)
+        cell_xfs = next(element for element in root if _local_name(element.tag) == "cellXfs")
+        for index, xf in enumerate(cell_xfs):
+            if all(xf.get(name, "0") == "0" for name in ("fontId", "fillId", "borderId")):
+                self._ids.setdefault(int(xf.get("numFmtId", "0")), index)
+        self._count = len(cell_xfs)
+
+    def serial(self, value):
+        """(style id, Excel serial number) for a date, time or duration, or None to write it as text"""
+        if self._count is None:
+            return None
+        for kind, number_format in _DATE_FORMATS:
+            if isinstance(value, kind):
+                break
+        else:
+            return None
+        from openpyxl.utils.datetime import to_excel
+        if self._epoch is None:
+            self._epoch = _workbook_epoch(self.archive)
+        try:
+            serial = to_excel(value, self._epoch)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        style_id = self._ids.get(number_format)
+        if style_id is None:
+            style_id = self._ids[number_format] = self._count + len(self._added)
+            self._added.append(number_format)
+        return style_id, serial
+
+    def styles_xml(self):
+        """styles.xml with the added cell styles, or None if none were needed"""
+        if not self._added:
+            return None
+        opening = _CELL_XFS.search(self.source)
+        prefix = (opening.group(1) or b"").decode("ascii")
+        closing = _CELL_XFS_END.search(self.source, opening.end())
+        head = opening.group(0)
+        count = f' count="{self._count + len(self._added)}"'.encode("ascii")
+        head = _COUNT.sub(count, head, count=1) if _COUNT.search(head) else head[:-1] + count + b">"
+        xfs = "".join(f'<{prefix}xf numFmtId="{number_format}" fontId="0" fillId="0" borderId="0" '
+                      f'xfId="0" applyNumberFormat="1"/>' for number_format in self._added)
+        return (self.source[:opening.start()] + head + self.source[opening.end():closing.start()]
+                + xfs.encode("utf-8") + self.source[closing.start():])
+
+
+def _rows_xml(prefix, numbered_rows, column_count, cell_styles=None, batch_size=2000):
+    """Serialize (row number, values) pairs in batches of UTF-8 bytes
+
+    Text goes in as inline strings so sharedStrings.xml is left untouched;
+    dates and times as serial numbers with a style from cell_styles.
+    """
+    cell_open = [f'<{prefix}c r="{_column_letter(idx)}' for idx in range(1, column_count + 1)]
+    text_open = f'" t="inlineStr"><{prefix}is><{prefix}t xml:space="preserve">'
+    text_close = f'</{prefix}t></{prefix}is></{prefix}c>'
+    number_open = f'" t="n"><{prefix}v>'
+    bool_open = f'" t="b"><{prefix}v>'
+    value_close = f'</{prefix}v></{prefix}c>'
+    row_close = f'</{prefix}row>'
+
+    batch = []
+    for row_number, values in numbered_rows:
+        batch.append(f'<{prefix}row r="{row_number}">')
+        for opening, value in zip(cell_open, values):
+            if value is None or value == "":
+                continue
+            if isinstance(value, str):
+                batch.append(f"{opening}{row_number}{text_open}{value.translate(_XML_TEXT)}{text_close}")
+            elif isinstance(value, bool):
+                batch.append(f"{opening}{row_number}{bool_open}{int(value)}{value_close}")
+            elif isinstance(value, (int, float)):
+                batch.append(f"{opening}{row_number}{number_open}{value!r}{value_close}")
+            else:
+                styled = cell_styles.serial(value) if cell_styles is not None else None
+                if styled is not None:
+                    style_id, serial = styled
+                    batch.append(f'{opening}{row_number}" s="{style_id}{number_open}{serial!r}{value_close}')
+                else:
+                    batch.append(f"{opening}{row_number}{text_open}{str(value).translate(_XML_TEXT)}{text_close}")
+        batch.append(row_close)
+        if len(batch) >= batch_size * 4:
+            yield "".join(batch).encode("utf-8")
+            batch = []
+    if batch:
+        yield "".join(batch).encode("utf-8")
+
+
+def _rewrite_sheet_part(source, target, numbered_rows, column_count, cell_styles=None):
+    """Copy a worksheet part, adding rows before </sheetData>; returns rows written"""
+    # zip() pulls a row before each tick, so the counter ends at the number of rows written
+    counter = itertools.count()
+    numbered_rows = (row for row, _ in zip(numbered_rows, counter))
+    in_header = True
+    done = False
+    for piece in _complete_tags(source):
+        if done:
+            target.write(piece)
+            continue
+        if in_header:
+            start = _SHEET_DATA_START.search(piece) if b"sheetData" in piece else None
+            head, piece = (piece[:start.start()], piece[start.start():]) if start else (piece, b"")
+            # The new row count isn't known up front and a stale <dimension> would make
+            # read-only readers stop early; it is optional, so drop it (Excel and
+            # openpyxl recompute it on the next save)
+            target.write(_DIMENSION.sub(b"", head))
+            if start is None:
+                continue
+            in_header = False
+        match = _SHEET_DATA_END.search(piece) if b"sheetData" in piece else None
+        if match is None:
+            target.write(piece)
+            continue
+        prefix = (match.group(1) or match.group(2) or b"").decode("ascii")
+        target.write(piece[:match.start()])
+        if match.group(0).endswith(b"/>"):
+            target.write(f"<{prefix}sheetData>".encode("ascii"))
+        for data in _rows_xml(prefix, numbered_rows, column_count, cell_styles):
+            target.write(data)
+        target.write(f"</{prefix}sheetData>".encode("ascii"))
+        target.write(piece[match.end():])
+        done = True
+    return next(counter)
+
+
+def append_rows_to_xlsx(excel_path, appends, commit=None):
+    """Stream rows onto the end of one or more sheets without loading the workbook
+
+    `appends` maps sheet names to (rows, column_count, row_ids), where row_ids
+    are the rows the first rows should go to (see _numbered_rows) or None to
+    append them one after another. Only those sheets' XML
+    parts are rewritten; every other part, styles and the remaining sheets
+    included, is copied over unchanged, and the result replaces the file in a
+    single write. Memory use doesn't depend on the number of rows. Parts are
+    recompressed at the fastest zlib level; Excel re-packs them on its next save.
+    `commit(tmp_path)` moves the finished copy into place (default: os.replace).
+
+    Returns {sheet_name: rows_written}.
+    """
+    tmp_path = _tmp_path(excel_path)
+    written = {}
+    try:
+        with zipfile.ZipFile(excel_path) as source:
+            sheets, _ = _workbook_parts(source)
+            parts = {}
+            for sheet_name, part in sheets:
+                if sheet_name in appends:
+                    with source.open(part) as stream:
+                        parts[part] = (sheet_name, _last_row_number(stream))
+            cell_styles = _CellStyles(source)
+
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as target:
+                for info in source.infolist():
+                    if info.filename == _STYLES_PART:
+                        # Written last: the rows decide whether date styles have to be added
+                        continue
+                    with source.open(info) as src, target.open(info.filename, "w") as dst:
+                        if info.filename in parts:
+                            sheet_name, last_row = parts[info.filename]
+                            rows, column_count, row_ids = appends[sheet_name]
+                            written[sheet_name] = _rewrite_sheet_part(
+                                src, dst, _numbered_rows(rows, row_ids, last_row), column_count, cell_styles
+                            )
+                        else:
+                            shutil.copyfileobj(src, dst, 1 << 20)
+                if cell_styles.source is not None:
+                    target.writestr(source.getinfo(_STYLES_PART), cell_styles.styles_xml() or cell_styles.source)
+        if commit is None:
+            os.replace(tmp_path, excel_path)
+        else:
+            commit(tmp_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+
+class AppendJournal:
+    """Durable log of (sheet, row) entries in a JSON-lines file next to the workbook
+
+    Used both as the write-ahead journal of submitted rows and as the spool
+    holding uncommitted batch-mode rows. Journal entries also record the sheet
+    row they were promised, so compaction puts them exactly there.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def _read(self):
+        """Load entries left over from a previous run"""
+        entries = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-write; the row never made it
+                        continue
+                    entries.append((entry["sheet"], entry["values"], entry.get("row")))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @staticmethod
+    def _line(sheet_name, values, row_id):
+        entry = {"sheet": sheet_name, "values": values}
+        if row_id is not None:
+            entry["row"] = row_id
+        return json.dumps(entry, default=str) + "\n"
+
+    def append(self, sheet_name, values, row_id=None):
+        """Durably record one row; returns the number of pending rows"""
+        return self.append_many(sheet_name, [values], [row_id])
+
+    def append_many(self, sheet_name, rows, row_ids=None):
+        """Durably record several rows of one sheet with a single fsync"""
+        rows = [list(values) for values in rows]
+        row_ids = row_ids or [None] * len(rows)
+        lines = "".join(self._line(sheet_name, values, row_id) for values, row_id in zip(rows, row_ids))
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries.extend((sheet_name, values, row_id) for values, row_id in zip(rows, row_ids))
+            return len(self._entries)
+
+    def pending(self, sheet_name=None):
+        """Snapshot of rows not yet folded into the workbook"""
+        return [(name, values) for name, values, _ in self.entries(sheet_name)]
+
+    def entries(self, sheet_name=None):
+        """Like pending(), with the row each entry was promised (or None) as a third item"""
+        with self._lock:
+            return [entry for entry in self._entries if sheet_name is None or entry[0] == sheet_name]
+
+    def discard(self, count):
+        """Forget the first `count` entries once they are safely in the workbook"""
+        with self._lock:
+            self._entries = self._entries[count:]
+            self._rewrite()
+
+    def discard_sheet(self, sheet_name):
+        """Forget every entry belonging to one sheet"""
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry[0] != sheet_name]
+            self._rewrite()
+
+    def _rewrite(self):
+        """Replace the file with the remaining entries (caller holds the lock)"""
+        if not self._entries:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for name, values, row_id in self._entries:
+                f.write(self._line(name, values, row_id))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class JournalCompactor(threading.Thread):
+    """Background thread that folds journal entries into the .xlsx in batches"""
+    def __init__(self, session, interval=5.0, batch_size=50):
+        super().__init__(name="journal-compactor", daemon=True)
+        self.session = session
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def notify(self, pending_count):
+        """Called after each append; compacts early once a full batch is waiting"""
+        if pending_count >= self.batch_size:
+            self._wake.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.session.compact()
+                self.last_error = None
+            except Exception as e:
+                # e.g. the file is open in Excel; rows stay in the journal for the next round
+                self.last_error = e
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self.join()
+
+
+class StorageBackend:
+    """What the UI needs from a data file, whatever format stores it
+
+    Subclasses implement listing sheets and reading, appending and updating
+    rows; change tracking, batch spooling and export to .xlsx are shared.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        # Bumped every time a read sees a file state we didn't write ourselves,
+        # so views can tell whether what they show is still current
+        self.generation = 0
+        self._seen_signature = None
+        # Batch-mode rows the user hasn't committed yet; kept on disk to survive a
+        # crash, one file per client so clerks sharing the data file don't see each other's
+        self.spool = AppendJournal(client_path(path, ".spool"))
+
+    def _file_signature(self):
+        """Cheap change detector: modification time and size of the file on disk"""
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _observe(self, signature):
+        """Record the file state a read is based on"""
+        if signature != self._seen_signature:
+            self._seen_signature = signature
+            self.generation += 1
+
+    @contextmanager
+    def _own_write(self):
+        """Wrap a write of ours so changed_since() doesn't report it
+
+        Views already show what we write, so no new generation is needed,
+        unless someone else had changed the file before we got to it.
+        """
+        with self._lock:
+            try:
+                unchanged = self._file_signature() == self._seen_signature
+            except FileNotFoundError:
+                unchanged = False
+            yield
+            if unchanged:
+                self._seen_signature = self._file_signature()
+
+    def changed_since(self, generation):
+        """True if the file was re-read, or changed on disk, after `generation` was loaded
+
+        Deliberately lock-free so the UI thread can ask while a save is running.
+        """
+        if generation != self.generation:
+            return True
+        try:
+            return self._file_signature() != self._seen_signature
+        except OSError:
+            return True
+
+    def create(self, sheets):
+        """Start a new file holding the given {sheet_name: columns}, replacing any old one"""
+        raise NotImplementedError
+
+    def sheet_headers(self):
+        """Return {sheet_name: [column names]} for every sheet in the file"""
+        raise NotImplementedError
+
+    def add_sheets(self, sheets):
+        """Add empty sheets, given as {sheet_name: columns}, to the file"""
+        raise NotImplementedError
+
+    def iter_keyed_rows(self, sheet_name):
+        """Yield (row_id, values) for every data row of a sheet (header skipped)
+
+        A row id names the row for update_row() for as long as it exists,
+        whatever happens around it: the Excel row number in a workbook, the
+        primary key in a database.
+        """
+        raise NotImplementedError
+
+    def sheet_fingerprints(self):
+        """Return (generation, {sheet_name: fingerprint}) for the file as it is now
+
+        A sheet's fingerprint changes whenever its content does, so a watcher
+        that sees the file change can tell which sheets need reloading.
+        """
+        raise NotImplementedError
+
+    def iter_rows(self, sheet_name):
+        """Yield the value tuples of a sheet's data rows (header skipped)"""
+        for _, values in self.iter_keyed_rows(sheet_name):
+            yield values
+
+    def get_row(self, sheet_name, row_id):
+        """The values of one row, by its row id, or None if there is no such row
+
+        This default reads the sheet up to the row; the generator is closed
+        before returning, so the lock and any file handle it holds are let go.
+        """
+        rows = self.iter_keyed_rows(sheet_name)
+        try:
+            for key, values in rows:
+                if key == row_id:
+                    return values
+            return None
+        finally:
+            rows.close()
+
+    def iter_keyed_chunks(self, sheet_name, chunk_size=10000):
+        """Yield lists of up to chunk_size (row_id, values) rows, for long reads such as exports
+
+        iter_keyed_rows() holds the session lock for as long as its caller
+        iterates; backends override this to hold it only while each list is
+        read, so writers (the journal compactor among them) aren't held up
+        by a slow consumer. This default reads under the lock throughout.
+        """
+        rows = self.iter_keyed_rows(sheet_name)
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            rows.close()
+
+    def snapshot(self, sheet_name):
+        """Non-blank rows of a sheet, their row ids and the generation they were read from
+
+        Returns (generation, row_ids, rows), the ids as an array and the rows
+        as a RowStore, filled as they are read so a big sheet never exists as
+        a list of tuples. Blank rows are left out; as every row carries its
+        id, nothing depends on its position in the list.
+        """
+        with self._lock:
+            row_ids = array("q")
+
+            def kept():
+                for row_id, values in self.iter_keyed_rows(sheet_name):
+                    if any(values):
+                        row_ids.append(row_id)
+                        yield values
+            rows = RowStore(kept())
+            return self.generation, row_ids, rows
+
+    def snapshots(self, sheet_names):
+        """snapshot() of several sheets, as {sheet_name: (generation, row_ids, rows)}
+
+        This default reads them one after another; backends that can read
+        several at once override it.
+        """
+        return {sheet_name: self.snapshot(sheet_name) for sheet_name in sheet_names}
+
+    def column_values(self, sheet_name):
+        """The distinct non-blank values of each column of a sheet, as a list of sets
+
+        These feed the entry fields' suggestions, so the UI reads them on a
+        thread of their own: backends read them without holding the session
+        lock where they can, so saves don't wait, and a row saved meanwhile
+        may be missed. This default reads the rows under the lock.
+        """
+        return distinct_values(self.iter_rows(sheet_name))
+
+    def tail_keyed_rows(self, sheet_name, count):
+        """(row_id, values) of the last `count` data rows of a sheet, blank ones included
+
+        This default reads the whole sheet; backends that can start reading
+        near the end override it.
+        """
+        return list(deque(self.iter_keyed_rows(sheet_name), maxlen=count))
+
+    def tail_snapshot(self, sheet_name, count):
+        """Like snapshot(), but of the last `count` non-blank rows only"""
+        with self._lock:
+            wanted = count
+            while True:
+                keyed = self.tail_keyed_rows(sheet_name, wanted)
+                kept = [(row_id, values) for row_id, values in keyed if any(values)]
+                # Blank rows took up part of the tail: read further back
+                if len(kept) >= count or len(keyed) < wanted:
+                    break
+                wanted *= 4
+            kept = kept[-count:] if count else []
+            return self.generation, [row_id for row_id, _ in kept], [values for _, values in kept]
+
+    def append_row(self, sheet_name, values):
+        """Append one row and return its row id (None if it can't be known yet)"""
+        raise NotImplementedError
+
+    def append_rows(self, sheet_name, rows):
+        """Append several rows of one sheet and return their row ids"""
+        raise NotImplementedError
+
+    def bulk_append(self, sheet_name, rows, column_count):
+        """Append a row iterator of any length in one write; returns the number added"""
+        raise NotImplementedError
+
+    def update_row(self, sheet_name, row_id, values, expected=None):
+        """Overwrite the row with the given row id
+
+        With `expected`, the values the caller last saw, RowConflictError is
+        raised instead if someone else has changed the row since.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _check_expected(sheet_name, row_id, current, expected):
+        """Raise RowConflictError unless a row still holds the values an update is based on"""
+        def normalized(values):
+            # Types differ between readers (1 vs "1", None vs ""); compare as text
+            texts = ["" if value is None else str(value) for value in values]
+            while texts and texts[-1] == "":
+                texts.pop()
+            return texts
+        if normalized(current) != normalized(expected):
+            raise RowConflictError(
+                f"Row {row_id} of '{sheet_name}' was changed by someone else since it was loaded."
+            )
+
+    def compact(self):
+        """Write out anything still buffered; returns the number of rows written"""
+        return 0
+
+    def close(self):
+        """Flush pending writes and let go of the file"""
+
+    def spool_row(self, sheet_name, values):
+        """Add one row to a sheet's uncommitted batch"""
+        self.spool.append(sheet_name, values)
+
+    def commit_spool(self, sheet_name):
+        """Move a sheet's whole batch into storage; returns (row_ids, rows) of the rows moved
+
+        Call compact() afterwards to make sure they reach the file.
+        """
+        rows = [values for _, values in self.spool.pending(sheet_name)]
+        row_ids = []
+        if rows:
+            # Stored first: once they are safe the spool copy can go
+            row_ids = self.append_rows(sheet_name, rows)
+            self.spool.discard_sheet(sheet_name)
+        return row_ids, rows
+
+    def export_xlsx(self, target_path):
+        """Write every sheet to a new .xlsx file and return the number of data rows
+
+        Uses a write-only workbook, so rows go straight to disk instead of
+        being built up as cells in memory.
+        """
+        if os.path.exists(target_path) and os.path.samefile(self.path, target_path):
+            raise ValueError("Choose a different file to export to.")
+        import openpyxl
+        workbook = openpyxl.Workbook(write_only=True)
+        count = 0
+        for sheet_name, columns in self.sheet_headers().items():
+            sheet = workbook.create_sheet(title=sheet_name)
+            sheet.append(columns)
+            for values in self.iter_rows(sheet_name):
+                sheet.append(values)
+                count += 1
+        tmp_path = target_path + ".tmp"
+        workbook.save(tmp_path)
+        os.replace(tmp_path, target_path)
+        return count
+
+
+class WorkbookSession(StorageBackend):
+    """Keeps the parsed workbook in memory and re-reads it only when the file changes
+
+    Several clients may share one workbook. Each journals its own rows, and
+    every write is prepared against the file as last read, then put in place
+    under the shared FileLock only if nobody saved in between; otherwise it is
+    redone on top of the newer file, so no one's rows are overwritten.
+    """
+    def __init__(self, excel_path):
+        super().__init__(excel_path)
+        self.excel_path = excel_path
+        self.lock = FileLock(excel_path + ".lock")
+        self._workbook = None
+        self._signature = None
+        # Read-only workbook shared by streamed loads, so the shared-strings
+        # table is parsed once rather than once per sheet
+        self._reader = None
+        self._reader_signature = None
+        # Worker processes for full-sheet loads, started with the first one
+        self._sheet_readers = SheetReaderPool()
+        self.journal = AppendJournal(client_path(excel_path, ".journal"))
+        # Next free Excel row of each sheet read so far, so a journaled row can be
+        # told up front which row compaction will put it in
+        self._next_row = {}
+        self._row_ids_lock = threading.Lock()
+        self._compactor = None
+        if len(self.journal):
+            self._start_compactor()
+
+    def _start_compactor(self):
+        if self._compactor is None:
+            self._compactor = JournalCompactor(self)
+            self._compactor.start()
+
+    def _shared_reader(self, signature):
+        if self._reader is None or self._reader_signature != signature:
+            self._release_reader()
+            import openpyxl
+            self._reader = openpyxl.load_workbook(self.excel_path, read_only=True)
+            self._reader_signature = signature
+        return self._reader
+
+    def _release_reader(self):
+        """Close the read-only handle (it keeps the file open, which blocks saving on Windows)"""
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+            self._reader_signature = None
+
+    def is_stale(self):
+        """True when nothing is loaded yet or the file was changed by someone else"""
+        with self._lock:
+            if self._workbook is None:
+                return True
+            try:
+                return self._file_signature() != self._signature
+            except FileNotFoundError:
+                return True
+
+    def workbook(self):
+        """Return the cached workbook, parsing the file only if it changed on disk"""
+        with self._lock:
+            if self.is_stale():
+                signature = self._file_signature()
+                import openpyxl
+                self._workbook = openpyxl.load_workbook(self.excel_path)
+                self._signature = signature
+                self._observe(signature)
+            return self._workbook
+
+    def adopt(self, workbook):
+        """Take over a workbook that was just built and saved by the caller"""
+        with self._lock:
+            self._workbook = workbook
+            self._signature = self._file_signature()
+            self._observe(self._signature)
+
+    def create(self, sheets):
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        # Remove default sheet
+        del workbook[workbook.active.title]
+        for sheet_name, columns in sheets.items():
+            workbook.create_sheet(title=sheet_name).append(columns)
+        with self._lock:
+            self.journal.discard(len(self.journal))
+            self._next_row.clear()
+            workbook.save(self.excel_path)
+            self.adopt(workbook)
+
+    def sheet_headers(self):
+        return load_sheet_headers(self.excel_path)
+
+    def add_sheets(self, sheets):
+        def add(workbook):
+            for sheet_name, columns in sheets.items():
+                workbook.create_sheet(title=sheet_name).append(columns)
+        self._edit(add)
+
+    def sheet_fingerprints(self):
+        """Per-sheet fingerprints read from the zip directory alone
+
+        Every part's CRC32 is stored in the directory, so nothing is
+        decompressed. Cells may refer to the shared-strings table, so its
+        CRC is part of every sheet's fingerprint.
+        """
+        with self._lock:
+            signature = self._file_signature()
+            with zipfile.ZipFile(self.excel_path) as archive:
+                sheets, shared_strings_part = _workbook_parts(archive)
+                crcs = {info.filename: (info.CRC, info.file_size) for info in archive.infolist()}
+            self._observe(signature)
+            shared = crcs.get(shared_strings_part)
+            return self.generation, {sheet_name: (crcs.get(part), shared) for sheet_name, part in sheets}
+
+    def invalidate(self):
+        """Drop the cached workbook so the next access re-reads the file"""
+        with self._lock:
+            self._workbook = None
+            self._signature = None
+            self._release_reader()
+
+    def iter_keyed_rows(self, sheet_name):
+        """Yield (Excel row number, values) for the data rows of a sheet
+
+        Reads from the cached workbook when it is current, otherwise streams the
+        file with iter_sheet_rows() instead of parsing it for editing (or in
+        openpyxl's read-only mode, for package layouts only openpyxl reads).
+        Rows still waiting in the journal follow, numbered where compaction
+        will put them.
+        """
+        with self._lock:
+            rows = None
+            if not self.is_stale():
+                worksheet = self._workbook[sheet_name]
+            else:
+                signature = self._file_signature()
+                self._observe(signature)
+                try:
+                    rows = iter_sheet_rows(self.excel_path, sheet_name)
+                except (KeyError, StopIteration, ValueError, IndexError, ET.ParseError):
+                    worksheet = self._shared_reader(signature)[sheet_name]
+                    # Count the rows actually stored, not what a possibly stale <dimension> claims
+                    worksheet.reset_dimensions()
+            if rows is None:
+                rows = enumerate(worksheet.iter_rows(min_row=2, values_only=True), start=2)
+            last_row = 1
+            for last_row, values in rows:
+                yield last_row, values
+            yield from self._journaled_rows(sheet_name, last_row)
+
+    def iter_keyed_chunks(self, sheet_name, chunk_size=10000):
+        """Rows parsed from a private link to the file, outside the session lock
+
+        The file plus the journal hold every saved row, and compaction and
+        saves change both under the lock, so only taking a hard link to the
+        file (a copy where links aren't supported) and the journaled rows
+        needs it. Saves meanwhile replace the file, leaving the link as it
+        was. The journaled rows follow the file's, numbered where compaction
+        will put them.
+        """
+        with self._lock:
+            self._observe(self._file_signature())
+            entries = self.journal.entries(sheet_name)
+            snapshot = f"{_tmp_path(self.excel_path)}.read"
+            try:
+                os.link(self.excel_path, snapshot)
+            except OSError:
+                shutil.copyfile(self.excel_path, snapshot)
+        rows = None
+        try:
+            try:
+                rows = iter_sheet_rows(snapshot, sheet_name)
+            except (KeyError, StopIteration, ValueError, IndexError, ET.ParseError):
+                # A missing sheet, or a package layout only openpyxl makes sense of
+                yield from super().iter_keyed_chunks(sheet_name, chunk_size)
+                return
+            last_row = 1
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                last_row = chunk[-1][0]
+                yield chunk
+            journaled = _numbered_rows([values for _, values, _ in entries],
+                                       [row_id for _, _, row_id in entries], last_row)
+            for chunk in iter(lambda: list(itertools.islice(journaled, chunk_size)), []):
+                yield [(row_id, tuple(values)) for row_id, values in chunk]
+        finally:
+            if rows is not None:
+                rows.close()
+            os.remove(snapshot)
+
+    def snapshot(self, sheet_name):
+        return self.snapshots([sheet_name])[sheet_name]
+
+    def snapshots(self, sheet_names):
+        """From the cached workbook when it is current, otherwise parsed from the file
+
+        The file's sheets are parsed in worker processes, one sheet each,
+        and come back as compact RowStores; rows still in the journal are
+        added after them.
+        """
+        sheet_names = list(sheet_names)
+        with self._lock:
+            result = {}
+            if not self.is_stale():
+                for sheet_name in sheet_names:
+                    result[sheet_name] = super().snapshot(sheet_name)
+                return result
+            self._observe(self._file_signature())
+            try:
+                parsed = self._sheet_readers.read(self.excel_path, sheet_names)
+            except (KeyError, StopIteration, ValueError, IndexError, ET.ParseError):
+                # A missing sheet, or a package layout only openpyxl makes sense of
+                for sheet_name in sheet_names:
+                    result[sheet_name] = super().snapshot(sheet_name)
+                return result
+            for sheet_name, (last_row, row_ids, rows) in parsed.items():
+                for row_id, values in self._journaled_rows(sheet_name, last_row):
+                    if any(values):
+                        row_ids.append(row_id)
+                        rows.append(values)
+                result[sheet_name] = (self.generation, row_ids, rows)
+            return result
+
+    def column_values(self, sheet_name):
+        """Parsed from the file in a worker process, without the session lock
+
+        The file on disk plus the journal hold every saved row, whether or not
+        the cached workbook is current, and saves replace the file in one
+        rename, so the read never sees half a save. The journal is read first:
+        rows compacted while the file is parsed are still in that copy.
+        """
+        journaled = distinct_values(values for _, values, _ in self.journal.entries(sheet_name))
+        try:
+            columns = self._sheet_readers.column_values(self.excel_path, sheet_name)
+        except (KeyError, StopIteration, ValueError, IndexError, ET.ParseError):
+            return super().column_values(sheet_name)
+        columns.extend(set() for _ in range(len(journaled) - len(columns)))
+        for values, more in zip(columns, journaled):
+            values.update(more)
+        return columns
+
+    def _journaled_rows(self, sheet_name, last_row):
+        """(row id, values) of a sheet's journaled rows, numbered to follow `last_row`"""
+        with self._row_ids_lock:
+            entries = self.journal.entries(sheet_name)
+            journaled = list(_numbered_rows(
+                [values for _, values, _ in entries], [row_id for _, _, row_id in entries], last_row
+            ))
+            self._next_row[sheet_name] = (journaled[-1][0] if journaled else last_row) + 1
+        return [(row_id, tuple(values)) for row_id, values in journaled]
+
+    def tail_keyed_rows(self, sheet_name, count):
+        """The last `count` rows, reading only the end of the sheet
+
+        From the cached workbook the rows are picked by number; from the file,
+        the sheet's XML is scanned to its end and only the tail is parsed.
+        """
+        with self._lock:
+            if not self.is_stale():
+                worksheet = self._workbook[sheet_name]
+                last_row = max(worksheet.max_row, 1)
+                first = max(2, last_row - count + 1)
+                stored = list(enumerate(
+                    worksheet.iter_rows(min_row=first, max_row=last_row, values_only=True), start=first
+                )) if last_row >= first else []
+            else:
+                self._observe(self._file_signature())
+                stored = tail_sheet_rows(self.excel_path, sheet_name, count)
+                if stored is None:
+                    # Rows without row numbers: fall back to reading them all
+                    return super().tail_keyed_rows(sheet_name, count)
+                last_row = stored[-1][0] if stored else 1
+            keyed = stored + self._journaled_rows(sheet_name, last_row)
+            return keyed[-count:] if count else []
+
+    def append_row(self, sheet_name, values):
+        """Record one row in the journal and return the Excel row it will go to
+
+        The compactor writes it to the workbook later. The row is None if the
+        sheet hasn't been read yet, as its next free row isn't known then.
+        """
+        return self.append_rows(sheet_name, [values])[0]
+
+    def append_rows(self, sheet_name, rows):
+        """Record several rows in the journal with a single write"""
+        rows = list(rows)
+        with self._row_ids_lock:
+            first = self._next_row.get(sheet_name)
+            if first is None:
+                row_ids = [None] * len(rows)
+            else:
+                row_ids = list(range(first, first + len(rows)))
+                self._next_row[sheet_name] = first + len(rows)
+            pending_count = self.journal.append_many(sheet_name, rows, row_ids)
+        self._start_compactor()
+        self._compactor.notify(pending_count)
+        return row_ids
+
+    def _journal_appends(self, entries):
+        """Group journal entries by sheet in the form append_rows_to_xlsx() takes"""
+        appends = {}
+        for sheet_name, values, row_id in entries:
+            rows, column_count, row_ids = appends.get(sheet_name, ([], 0, []))
+            rows.append(values)
+            row_ids.append(row_id)
+            appends[sheet_name] = (rows, max(column_count, len(values)), row_ids)
+        return appends
+
+    def bulk_append(self, sheet_name, rows, column_count):
+        """Stream a large number of rows into a sheet with one rewrite of the file
+
+        Journaled rows go in first, in the same pass, so they keep their place.
+        Views see a new generation afterwards and do a full reload. The rows
+        can only be read once, so unlike other writes this one holds the shared
+        lock from start to finish rather than redoing itself on a conflict.
+        """
+        with self._lock:
+            entries = self.journal.entries()
+            appends = self._journal_appends(entries)
+            journaled, journal_columns, row_ids = appends.get(sheet_name, ([], 0, None))
+            self._release_reader()
+            try:
+                with self.lock:
+                    appends[sheet_name] = (
+                        itertools.chain(journaled, self._refreshing_lock(rows)),
+                        max(column_count, journal_columns), row_ids
+                    )
+                    written = append_rows_to_xlsx(self.excel_path, appends)
+            finally:
+                self.invalidate()
+                # Found again on the next read
+                with self._row_ids_lock:
+                    self._next_row.pop(sheet_name, None)
+            self.journal.discard(len(entries))
+            return written[sheet_name] - len(journaled)
+
+    def _refreshing_lock(self, rows, every=10000):
+        for count, values in enumerate(rows, start=1):
+            if count % every == 0:
+                self.lock.refresh()
+            yield values
+
+    def compact(self):
+        """Fold all journaled rows into the workbook with a single write
+
+        If the editable workbook is already in memory the rows are written to it
+        and it is saved; otherwise they are streamed into the file directly, which
+        avoids parsing the whole workbook just to add a few rows. Each row lands
+        in the Excel row append_row() returned for it, unless another client has
+        taken that row meanwhile; then it goes after the rows now there.
+        """
+        with self._lock:
+            entries = self.journal.entries()
+            if not entries:
+                return 0
+            appends = self._journal_appends(entries)
+            saved = False
+            if not self.is_stale():
+                workbook = self._workbook
+                for sheet_name, (rows, _, row_ids) in appends.items():
+                    sheet = workbook[sheet_name]
+                    for row_number, values in _numbered_rows(rows, row_ids, sheet.max_row):
+                        for col_idx, value in enumerate(values, start=1):
+                            sheet.cell(row=row_number, column=col_idx, value=value)
+                try:
+                    self.save()
+                    saved = True
+                except FileChangedError:
+                    # save() dropped the workbook; stream the rows onto the newer file instead
+                    pass
+            if not saved:
+                with self._own_write():
+                    self._stream_appends(appends)
+            self.journal.discard(len(entries))
+            return len(entries)
+
+    def _stream_appends(self, appends):
+        """append_rows_to_xlsx() onto the current file, redone if someone saves meanwhile"""
+        for attempt in range(1, SAVE_ATTEMPTS + 1):
+            self._release_reader()
+            self._workbook = None
+            base_signature = self._file_signature()
+            try:
+                return append_rows_to_xlsx(
+                    self.excel_path, appends,
+                    commit=lambda tmp_path: self._replace_file(tmp_path, base_signature)
+                )
+            except FileChangedError:
+                if attempt == SAVE_ATTEMPTS:
+                    raise
+
+    def _replace_file(self, tmp_path, base_signature):
+        """Move a finished copy over the file, unless it changed since `base_signature`
+
+        Only this check and the rename run under the shared lock, so clients
+        never wait on each other's whole save.
+        """
+        with self.lock:
+            if self._file_signature() != base_signature:
+                raise FileChangedError(f"{self.excel_path} was saved by someone else in the meantime.")
+            os.replace(tmp_path, self.excel_path)
+
+    def _edit(self, change):
+        """Apply change(workbook) to the current file and save it
+
+        If someone else saves first, the change is made again on top of their
+        version, so neither write is lost.
+        """
+        with self._lock:
+            for attempt in range(1, SAVE_ATTEMPTS + 1):
+                change(self.workbook())
+                try:
+                    self.save()
+                    return
+                except FileChangedError:
+                    if attempt == SAVE_ATTEMPTS:
+                        raise
+
+    def close(self):
+        """Stop the compactor and flush whatever is still in the journal"""
+        if self._compactor is not None:
+            self._compactor.stop()
+            self._compactor = None
+        self.compact()
+        with self._lock:
+            self._release_reader()
+            self._sheet_readers.close()
+
+    def update_row(self, sheet_name, row_id, values, expected=None):
+        """Overwrite one row, given its Excel row number, and write the workbook back"""
+        def update(workbook):
+            sheet = workbook[sheet_name]
+            if expected is not None:
+                self._check_expected(sheet_name, row_id, [cell.value for cell in sheet[row_id]], expected)
+            for col_idx, value in enumerate(values, start=1):
+                sheet.cell(row=row_id, column=col_idx, value=value)
+        with self._lock:
+            # Journaled rows aren't in the workbook yet, so fold them in first
+            self.compact()
+            self._edit(update)
+
+    def save(self):
+        """Save the in-memory workbook and remember the new file signature
+
+        Raises FileChangedError, leaving the file alone, if someone else saved
+        it after the workbook was read.
+        """
+        with self._lock:
+            self._release_reader()
+            tmp_path = _tmp_path(self.excel_path)
+            try:
+                self._workbook.save(tmp_path)
+                self._replace_file(tmp_path, self._signature)
+            except Exception:
+                # Unsaved or out of date either way; re-read the file next time
+                self.invalidate()
+                raise
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            # Our own write: remember it without bumping the generation
+            self._signature = self._file_signature()
+            self._seen_signature = self._signature
+
+
+class IOJob:
+    """A unit of work queued on the IOExecutor"""
+    def __init__(self, func, args, on_done, on_error, description, cancellable):
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.description = description
+        self.cancellable = cancellable
+        self.cancelled = False
+
+    def cancel(self):
+        """Skip the job if it hasn't started, otherwise discard its result
+
+        Neither callback is called: this is for the job's owner, replacing it
+        with a newer one.
+        """
+        self.cancelled = True
+
+
+class IOExecutor:
+    """Runs workbook loads and saves on a worker thread
+
+    Callbacks are not called from the worker; the UI calls poll() (e.g. from
+    root.after) and they run there, on the Tk thread.
+    """
+    def __init__(self, name="excel-io"):
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._active = []
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, on_done=None, on_error=None, description="Working...", cancellable=False):
+        """Queue func(*args); only reads should be cancellable, so cancel_all() never drops a write"""
+        job = IOJob(func, args, on_done, on_error, description, cancellable)
+        self._active.append(job)
+        self._jobs.put(job)
+        return job
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            result = error = None
+            if not job.cancelled:
+                try:
+                    result = job.func(*job.args)
+                except Exception as e:
+                    error = e
+            self._results.put((job, result, error))
+
+    def poll(self):
+        """Deliver finished jobs to their callbacks; call this on the UI thread"""
+        while True:
+            try:
+                job, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if job in self._active:
+                self._active.remove(job)
+            if job.cancelled:
+                continue
+            if error is not None:
+                if job.on_error:
+                    job.on_error(error)
+            elif job.on_done:
+                job.on_done(result)
+
+    @property
+    def busy(self):
+        return any(not job.cancelled for job in self._active)
+
+    @property
+    def description(self):
+        """Description of the oldest unfinished job"""
+        for job in self._active:
+            if not job.cancelled:
+                return job.description
+        return ""
+
+    def cancel_all(self):
+        """Cancel every cancellable job, telling each owner through on_error(IOCancelled())
+
+        Call this on the UI thread. Owners hear of it right away, even of a
+        job that is running (its result is discarded), so they can reset
+        whatever they set up for it; writes keep going.
+        """
+        for job in list(self._active):
+            if job.cancellable and not job.cancelled:
+                job.cancel()
+                if job.on_error:
+                    job.on_error(IOCancelled())
+
+    def shutdown(self):
+        self._jobs.put(None)
+        self._thread.join()
@@ -0,0 +1,151 @@
+import io
+import json
+import sqlite3
+
+import openpyxl
+import pytest
+
+import cli
+from backends import SqliteSession
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # The saved app config only supplies the default --file; keep any real one out
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(params=["db", "xlsx"])
+def data_file(request, tmp_path):
+    path = str(tmp_path / f"data.{request.param}")
+    if request.param == "db":
+        session = SqliteSession(path)
+        session.create({"Data": ["Name", "Qty"]})
+        session.append_row("Data", ["old", 1])
+        session.close()
+    else:
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Data"
+        workbook.active.append(["Name", "Qty"])
+        workbook.active.append(["old", 1])
+        workbook.save(path)
+    return path
+
+
+def run(capsys, monkeypatch, *argv, stdin=""):
+    monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+    status = cli.main(list(argv))
+    out, err = capsys.readouterr()
+    return status, out, err
+
+
+def dumped(capsys, monkeypatch, path):
+    status, out, _ = run(capsys, monkeypatch, "-f", path, "dump", "Data", "--format", "jsonl")
+    assert status == 0
+    return [json.loads(line) for line in out.splitlines()]
+
+
+def test_sheets(capsys, monkeypatch, data_file):
+    assert run(capsys, monkeypatch, "-f", data_file, "sheets")[:2] == (0, "Data: Name, Qty\n")
+    status, out, _ = run(capsys, monkeypatch, "-f", data_file, "sheets", "--format", "json")
+    assert json.loads(out) == {"sheet": "Data", "columns": ["Name", "Qty"]}
+
+
+def test_append_json_lines(capsys, monkeypatch, data_file):
+    stdin = '["a", 2]\n\n{"Qty": 3, "Name": " b "}\n'
+    status, _, err = run(capsys, monkeypatch, "-f", data_file, "append", "Data", stdin=stdin)
+    assert status == 0 and "Appended 2 row(s)" in err
+    assert dumped(capsys, monkeypatch, data_file) == [
+        {"Name": "old", "Qty": 1}, {"Name": "a", "Qty": 2}, {"Name": "b", "Qty": 3},
+    ]
+
+
+def test_append_json_array_from_a_file(capsys, monkeypatch, data_file, tmp_path):
+    source = tmp_path / "rows.json"
+    source.write_text('[["a", 2], {"Name": "b", "Qty": 3}]', encoding="utf-8")
+    status, _, _ = run(capsys, monkeypatch, "-f", data_file, "append", "Data", str(source), "--format", "json")
+    assert status == 0
+    assert [row["Name"] for row in dumped(capsys, monkeypatch, data_file)] == ["old", "a", "b"]
+
+
+def test_append_csv_matches_columns_by_name(capsys, monkeypatch, data_file):
+    stdin = "qty,Extra,NAME\n2,x,a\n\n3,y,b\n"
+    status, _, _ = run(capsys, monkeypatch, "-f", data_file, "append", "Data", "--format", "csv", stdin=stdin)
+    assert status == 0
+    assert dumped(capsys, monkeypatch, data_file)[1:] == [{"Name": "a", "Qty": "2"}, {"Name": "b", "Qty": "3"}]
+
+
+@pytest.mark.parametrize("fmt, stdin, message", [
+    ("jsonl", '["a", 2]\n["b"]\n', "Line 2: missing Qty"),
+    ("jsonl", '["a", 2]\n{"Name": "b", "Qty": 3, "Colour": "red"}\n', "Line 2: unknown column(s) Colour"),
+    ("jsonl", '["a", 2]\n["b", 3, 4]\n', "Line 2: 3 values for 2 columns"),
+    ("jsonl", '["a", 2]\n"b"\n', "Line 2: expected a list or an object"),
+    ("jsonl", '["a", 2]\n{not json\n', "Line 2:"),
+    ("json", '{"Name": "a"}', "Expected a JSON array of rows."),
+    ("csv", "Name,Qty\na,2\nb,\n", "Line 3: missing Qty"),
+    ("csv", "Foo,Bar\na,2\n", "None of the CSV columns match"),
+])
+def test_a_rejected_row_aborts_the_whole_input(capsys, monkeypatch, data_file, fmt, stdin, message):
+    status, _, err = run(capsys, monkeypatch, "-f", data_file, "append", "Data", "--format", fmt, stdin=stdin)
+    assert status == 1
+    assert err.startswith("error: ") and message in err
+    assert dumped(capsys, monkeypatch, data_file) == [{"Name": "old", "Qty": 1}]
+
+
+def test_allow_blank(capsys, monkeypatch, data_file):
+    status, _, _ = run(capsys, monkeypatch, "-f", data_file, "append", "Data", "--allow-blank", stdin='["a"]\n')
+    assert status == 0
+    assert dumped(capsys, monkeypatch, data_file)[-1] == {"Name": "a", "Qty": None}
+
+
+def test_dump_csv_with_ids(capsys, monkeypatch, data_file):
+    status, out, _ = run(capsys, monkeypatch, "-f", data_file, "dump", "Data", "--ids")
+    first_id = 1 if data_file.endswith(".db") else 2
+    assert (status, out) == (0, f"row,Name,Qty\n{first_id},old,1\n")
+
+
+def test_update(capsys, monkeypatch, data_file):
+    row_id = "1" if data_file.endswith(".db") else "2"
+    status, _, err = run(capsys, monkeypatch, "-f", data_file, "update", "Data", row_id, "Qty=5")
+    assert status == 0 and f"Updated row {row_id}" in err
+    assert dumped(capsys, monkeypatch, data_file) == [{"Name": "old", "Qty": "5"}]
+
+
+@pytest.mark.parametrize("argv, message", [
+    (["update", "Data", "99", "Qty=5"], "Row 99 does not exist"),
+    (["update", "Data", "1", "Colour=red"], "Expected COLUMN=VALUE"),
+    (["update", "Missing", "1", "Qty=5"], "No sheet named 'Missing'"),
+    (["dump", "Missing"], "No sheet named 'Missing'. Sheets: Data"),
+])
+def test_errors(capsys, monkeypatch, data_file, argv, message):
+    status, _, err = run(capsys, monkeypatch, "-f", data_file, *argv)
+    assert status == 1 and message in err
+
+
+def test_missing_data_file_is_not_created(capsys, monkeypatch, tmp_path):
+    status, _, err = run(capsys, monkeypatch, "-f", str(tmp_path / "none.db"), "sheets")
+    assert status == 1 and "Data file not found" in err
+    assert not (tmp_path / "none.db").exists()
+
+
+def test_update_refused_when_the_row_changes_meanwhile(capsys, monkeypatch, tmp_path):
+    path = str(tmp_path / "data.db")
+    session = SqliteSession(path)
+    session.create({"Data": ["Name", "Qty"]})
+    session.append_row("Data", ["old", 1])
+    session.close()
+
+    class Racing(SqliteSession):
+        def get_row(self, sheet_name, row_id):
+            row = super().get_row(sheet_name, row_id)
+            # Someone else saves between the CLI's read and its write
+            connection = sqlite3.connect(path)
+            with connection:
+                connection.execute('UPDATE "Data" SET "Name" = \'theirs\'')
+            connection.close()
+            return row
+    monkeypatch.setattr(cli, "open_session", Racing)
+    status, _, err = run(capsys, monkeypatch, "-f", path, "update", "Data", "1", "Qty=5")
+    assert status == 1 and "changed by someone else" in err
+    monkeypatch.undo()
+    assert dumped(capsys, monkeypatch, path) == [{"Name": "theirs", "Qty": 1}]
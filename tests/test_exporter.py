@@ -0,0 +1,166 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import date
+
+import pytest
+
+from backends import SqliteSession
+from exporter import (ExportCancelled, ExportProgress, export_format, export_sheet, part_path, row_writer,
+                      write_rows)
+
+COLUMNS = ["Name", "Qty"]
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = SqliteSession(str(tmp_path / "data.db"))
+    session.create({"Data": COLUMNS})
+    yield session
+    session.close()
+
+
+def fill(session, count):
+    session.append_rows("Data", [[f"row {n}", n] for n in range(1, count + 1)])
+
+
+def read_csv(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+def leftovers(directory):
+    return sorted(name for name in os.listdir(directory) if not name.startswith("data.db"))
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("rows.csv", ("csv", False)),
+    ("ROWS.CSV.GZ", ("csv", True)),
+    ("rows.jsonl.gz", ("jsonl", True)),
+    ("rows.ndjson", ("jsonl", False)),
+    ("rows.json", ("jsonl", False)),
+])
+def test_export_format(name, expected):
+    assert export_format(name) == expected
+
+
+def test_export_format_refuses_other_files():
+    with pytest.raises(ValueError):
+        export_format("rows.xlsx")
+
+
+def test_part_path():
+    assert part_path("out/rows.csv", 3) == "out/rows.part0003.csv"
+    assert part_path("rows.jsonl.gz", 12) == "rows.part0012.jsonl.gz"
+
+
+def test_row_writer_fits_rows_to_the_columns():
+    out = io.StringIO()
+    write = row_writer(out, "csv", COLUMNS, include_ids=True)
+    write(2, ("a",))
+    write(3, ("b", 1, "extra"))
+    assert out.getvalue() == "row,Name,Qty\n2,a,\n3,b,1\n"
+
+    out = io.StringIO()
+    write = row_writer(out, "jsonl", COLUMNS)
+    write(2, ("a", date(2024, 1, 2), "extra"))
+    write(3, ())
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {"Name": "a", "Qty": "2024-01-02"}, {"Name": None, "Qty": None},
+    ]
+    with pytest.raises(ValueError):
+        row_writer(io.StringIO(), "xml", COLUMNS)
+
+
+def test_write_rows_skips_blank_rows():
+    out = io.StringIO()
+    count = write_rows(out, "jsonl", COLUMNS, [(1, ("a", 1)), (2, (None, "")), (3, ("b",))], include_ids=True)
+    assert count == 2
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {"row": 1, "Name": "a", "Qty": 1}, {"row": 3, "Name": "b", "Qty": None},
+    ]
+
+
+def test_export_to_csv(session, tmp_path):
+    fill(session, 3)
+    session.append_row("Data", [None, None])
+    target = str(tmp_path / "rows.csv")
+    progress = export_sheet(session, "Data", COLUMNS, target, chunk_size=2)
+    assert progress.written == 3 and progress.paths == [target]
+    assert read_csv(target) == [COLUMNS, ["row 1", "1"], ["row 2", "2"], ["row 3", "3"]]
+    assert leftovers(tmp_path) == ["rows.csv"]
+
+
+def test_export_to_gzipped_json_lines(session, tmp_path):
+    fill(session, 2)
+    target = str(tmp_path / "rows.jsonl.gz")
+    export_sheet(session, "Data", COLUMNS, target, include_ids=True)
+    with gzip.open(target, "rt", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [
+            {"row": 1, "Name": "row 1", "Qty": 1}, {"row": 2, "Name": "row 2", "Qty": 2},
+        ]
+
+
+def test_an_empty_sheet_still_gets_its_file(session, tmp_path):
+    target = str(tmp_path / "rows.csv.gz")
+    progress = export_sheet(session, "Data", COLUMNS, target, part_rows=10)
+    assert progress.paths == [str(tmp_path / "rows.part0001.csv.gz")]
+    assert read_csv(progress.paths[0]) == [COLUMNS]
+
+
+@pytest.mark.parametrize("count, sizes", [(5, [2, 2, 1]), (4, [2, 2]), (1, [1])])
+def test_export_in_parts(session, tmp_path, count, sizes):
+    fill(session, count)
+    target = str(tmp_path / "rows.csv.gz")
+    progress = export_sheet(session, "Data", COLUMNS, target, part_rows=2, chunk_size=3)
+    assert progress.paths == [part_path(target, number) for number in range(1, len(sizes) + 1)]
+    parts = [read_csv(path) for path in progress.paths]
+    # Every part has its own header
+    assert [len(rows) - 1 for rows in parts] == sizes
+    assert all(rows[0] == COLUMNS for rows in parts)
+    assert [row[0] for rows in parts for row in rows[1:]] == [f"row {n}" for n in range(1, count + 1)]
+    assert leftovers(tmp_path) == sorted(os.path.basename(path) for path in progress.paths)
+
+
+def test_cancelled_export_removes_every_part(session, tmp_path):
+    fill(session, 7)
+    progress = ExportProgress()
+    progress.cancel()
+    with pytest.raises(ExportCancelled):
+        export_sheet(session, "Data", COLUMNS, str(tmp_path / "rows.csv"), progress,
+                     part_rows=2, chunk_size=3)
+    assert progress.paths == []
+    assert leftovers(tmp_path) == []
+
+
+class FailingSession:
+    """Hands out one chunk of rows, then fails the way a vanished file would"""
+    path = "elsewhere.db"
+
+    def __init__(self):
+        self.closed = False
+
+    def iter_keyed_chunks(self, sheet_name, chunk_size):
+        try:
+            yield [(n, (f"row {n}", n)) for n in range(1, 4)]
+            raise OSError("file went away")
+        finally:
+            self.closed = True
+
+
+@pytest.mark.parametrize("part_rows", [None, 2])
+def test_failed_export_removes_what_it_wrote(tmp_path, part_rows):
+    session = FailingSession()
+    with pytest.raises(OSError):
+        export_sheet(session, "Data", COLUMNS, str(tmp_path / "rows.csv"), part_rows=part_rows)
+    assert session.closed
+    assert os.listdir(tmp_path) == []
+
+
+def test_export_refuses_to_overwrite_the_data_file(session):
+    with pytest.raises(ValueError):
+        export_sheet(session, "Data", COLUMNS, session.path, fmt="csv")
+    assert session.sheet_headers() == {"Data": COLUMNS}
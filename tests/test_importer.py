@@ -0,0 +1,152 @@
+import csv
+import io
+
+import openpyxl
+import pytest
+
+from backends import SqliteSession
+from importer import ImportCancelled, ImportProgress, _validated_rows, auto_mapping, import_file
+from storage import WorkbookSession
+
+
+def validated(rows, columns, mapping, chunk_size=10000):
+    progress = ImportProgress()
+    rejects = io.StringIO()
+    accepted = list(_validated_rows(iter(rows), columns, mapping, progress, csv.writer(rejects), chunk_size))
+    return accepted, list(csv.reader(io.StringIO(rejects.getvalue()))), progress
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+def test_auto_mapping_matches_names_ignoring_case():
+    mapping = auto_mapping(["qty", "Extra", "NAME"], [" Name ", "Qty", "Date"])
+    assert mapping == {" Name ": 2, "Qty": 0, "Date": None}
+    # The first of two matching source columns wins
+    assert auto_mapping(["Name", "qty", "name"], ["Name", "Qty"]) == {"Name": 0, "Qty": 1}
+
+
+def test_unmapped_columns_are_left_empty_not_read_from_the_source():
+    accepted, rejects, progress = validated(
+        [["b1", "a1", "SECRET"], ["b2", "a2"]], ["A", "B", "C"], {"A": 1, "B": 0, "C": None}
+    )
+    assert accepted == [["a1", "b1", None], ["a2", "b2", None]]
+    assert rejects == [] and progress.rejected == 0
+
+
+def test_short_rows_are_rejected_for_the_mapped_columns_they_lack():
+    accepted, rejects, progress = validated(
+        [["x", "1", "extra", "more"], ["y"], [" ", "2"]], ["Name", "Qty"], {"Name": 0, "Qty": 1}
+    )
+    # Columns past the mapped ones are ignored; values are stripped
+    assert accepted == [["x", "1"]]
+    # Line numbers count the header as line 1
+    assert rejects == [["3", "Missing: Qty", "y"], ["4", "Missing: Name", " ", "2"]]
+    assert (progress.processed, progress.imported, progress.rejected) == (3, 1, 2)
+
+
+def test_blank_lines_are_skipped_but_still_counted_as_lines():
+    accepted, rejects, progress = validated(
+        [["a", "1"], [], ["", ""], ["b", ""], [None, None], ["c", "3"]],
+        ["Name", "Qty"], {"Name": 0, "Qty": 1}, chunk_size=2
+    )
+    assert accepted == [["a", "1"], ["c", "3"]]
+    # Blank lines still count towards the line numbers
+    assert rejects == [["5", "Missing: Qty", "b", ""]]
+    assert progress.processed == 6
+
+
+def test_non_text_values_are_kept():
+    accepted, _, _ = validated([["a", 0, 1.5]], ["Name", "Zero", "Half"], {"Name": 0, "Zero": 1, "Half": 2})
+    assert accepted == [["a", 0, 1.5]]
+
+
+@pytest.fixture(params=["xlsx", "sqlite"])
+def target(request, tmp_path):
+    if request.param == "xlsx":
+        path = str(tmp_path / "target.xlsx")
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Data"
+        workbook.active.append(["Name", "Qty"])
+        workbook.active.append(["existing", 1])
+        workbook.save(path)
+        session = WorkbookSession(path)
+    else:
+        session = SqliteSession(str(tmp_path / "target.db"))
+        session.create({"Data": ["Name", "Qty"]})
+        session.append_row("Data", ["existing", 1])
+    yield session
+    session.close()
+
+
+def stored(session):
+    return [[str(value) for value in values] for values in session.iter_rows("Data")]
+
+
+def test_import_appends_valid_rows_and_writes_rejects(target, tmp_path):
+    source = write_csv(tmp_path / "source.csv", [["qty", "name"], ["2", "a"], ["", "b"], ["3", "c"]])
+    progress = import_file(target, "Data", ["Name", "Qty"], source)
+    assert (progress.imported, progress.rejected) == (2, 1)
+    assert stored(target) == [["existing", "1"], ["a", "2"], ["c", "3"]]
+    with open(progress.reject_path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["Line", "Reason", "qty", "name"], ["3", "Missing: Qty", "", "b"]]
+
+
+def test_import_without_rejects_leaves_no_reject_file(target, tmp_path):
+    source = write_csv(tmp_path / "clean.csv", [["Name", "Qty"], ["a", "2"]])
+    progress = import_file(target, "Data", ["Name", "Qty"], source)
+    assert progress.reject_path is None
+    assert not (tmp_path / "clean.rejects.csv").exists()
+
+
+class CancelAfterFirstChunk(ImportProgress):
+    """Cancels the way the dialog's button would, once the first chunk is through"""
+    @property
+    def processed(self):
+        return self._processed
+
+    @processed.setter
+    def processed(self, value):
+        self._processed = value
+        if value:
+            self.cancel()
+
+
+def test_cancelled_import_leaves_the_target_untouched(target, tmp_path):
+    source = write_csv(tmp_path / "big.csv", [["Name", "Qty"]] + [[f"row {i}", ""] for i in range(5)]
+                       + [[f"row {i}", str(i)] for i in range(5, 20)])
+    with pytest.raises(ImportCancelled):
+        import_file(target, "Data", ["Name", "Qty"], source, progress=CancelAfterFirstChunk(), chunk_size=10)
+    assert stored(target) == [["existing", "1"]]
+    assert not (tmp_path / "big.rejects.csv").exists()
+
+
+def test_failed_import_writes_nothing(target, tmp_path):
+    source = write_csv(tmp_path / "source.csv", [["Name", "Qty"], ["a", "1"], ["b", ""]])
+    with pytest.raises(KeyError):
+        import_file(target, "Missing", ["Name", "Qty"], source)
+    assert stored(target) == [["existing", "1"]]
+    assert not (tmp_path / "source.rejects.csv").exists()
+
+
+def test_import_needs_at_least_one_matching_column(target, tmp_path):
+    source = write_csv(tmp_path / "other.csv", [["Foo", "Bar"], ["a", "1"]])
+    with pytest.raises(ValueError):
+        import_file(target, "Data", ["Name", "Qty"], source)
+
+
+def test_import_from_a_workbook_uses_the_sheet_of_the_same_name(target, tmp_path):
+    path = str(tmp_path / "source.xlsx")
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Other"
+    workbook.active.append(["Name", "Qty"])
+    workbook.active.append(["wrong", 0])
+    sheet = workbook.create_sheet("Data")
+    sheet.append(["Name", "Qty"])
+    sheet.append(["right", 5])
+    workbook.save(path)
+    import_file(target, "Data", ["Name", "Qty"], path)
+    assert stored(target) == [["existing", "1"], ["right", "5"]]
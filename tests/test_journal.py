@@ -0,0 +1,167 @@
+import os
+import time
+
+import openpyxl
+import pytest
+
+from storage import AppendJournal, FileLock, FileLockedError, RowConflictError, WorkbookSession
+
+
+def make_workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    for values in rows:
+        sheet.append(values)
+    workbook.save(path)
+    return str(path)
+
+
+def sheet_values(path):
+    workbook = openpyxl.load_workbook(path)
+    try:
+        return [row for row in workbook["Data"].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+def external_append(path, values):
+    """Another client (or Excel) saving the file"""
+    workbook = openpyxl.load_workbook(path)
+    workbook["Data"].append(values)
+    workbook.save(path)
+
+
+def crash(session):
+    """Stop a session the way a crash would: no compaction, no close()"""
+    if session._compactor is not None:
+        session._compactor.stop()
+    session._release_reader()
+    session._sheet_readers.close()
+
+
+def test_journal_survives_a_torn_last_line(tmp_path):
+    journal = AppendJournal(str(tmp_path / "rows.journal"))
+    journal.append("Data", ["a", 1], row_id=2)
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"sheet": "Data", "val')
+    assert AppendJournal(journal.path).entries() == [("Data", ["a", 1], 2)]
+
+
+def test_rows_journaled_before_a_crash_are_replayed(tmp_path):
+    path = make_workbook(tmp_path / "crash.xlsx", [["Name", "Qty"], ["old", 1]])
+    session = WorkbookSession(path)
+    list(session.iter_keyed_rows("Data"))
+    promised = session.append_row("Data", ["saved", 2])
+    assert promised == 3
+    crash(session)
+    # The journal write happened, the compaction never did
+    assert sheet_values(path) == [("Name", "Qty"), ("old", 1)]
+
+    restarted = WorkbookSession(path)
+    assert [(row_id, list(values)) for row_id, values in restarted.iter_keyed_rows("Data")] == \
+        [(2, ["old", 1]), (3, ["saved", 2])]
+    restarted.close()
+    assert sheet_values(path) == [("Name", "Qty"), ("old", 1), ("saved", 2)]
+    assert len(restarted.journal) == 0
+    assert not os.path.exists(restarted.journal.path)
+
+
+def test_replayed_rows_follow_rows_saved_by_others_meanwhile(tmp_path):
+    path = make_workbook(tmp_path / "shared.xlsx", [["Name"], ["old"]])
+    session = WorkbookSession(path)
+    list(session.iter_keyed_rows("Data"))
+    assert session.append_row("Data", ["mine"]) == 3
+    crash(session)
+    external_append(path, ["theirs"])
+
+    restarted = WorkbookSession(path)
+    restarted.close()
+    # Row 3 was taken by the other client, so the journaled row goes after it
+    assert sheet_values(path) == [("Name",), ("old",), ("theirs",), ("mine",)]
+
+
+def test_stale_lock_is_broken(tmp_path):
+    lock_path = str(tmp_path / "data.xlsx.lock")
+    with open(lock_path, "w", encoding="utf-8") as f:
+        f.write("crashed-client (pid 1)")
+    old = time.time() - 600
+    os.utime(lock_path, (old, old))
+
+    lock = FileLock(lock_path, timeout=0.5, stale_age=120)
+    started = time.monotonic()
+    with lock:
+        with open(lock_path, encoding="utf-8") as f:
+            assert "crashed-client" not in f.read()
+    assert time.monotonic() - started < 0.5
+    assert not os.path.exists(lock_path)
+
+
+def test_live_lock_times_out_naming_its_owner(tmp_path):
+    lock_path = str(tmp_path / "data.xlsx.lock")
+    with open(lock_path, "w", encoding="utf-8") as f:
+        f.write("busy-client (pid 2)")
+    with pytest.raises(FileLockedError, match="busy-client"):
+        FileLock(lock_path, timeout=0.1, stale_age=120).acquire()
+    assert os.path.exists(lock_path)
+
+
+def test_session_writes_through_a_stale_lock(tmp_path):
+    path = make_workbook(tmp_path / "locked.xlsx", [["Name"]])
+    with open(path + ".lock", "w", encoding="utf-8") as f:
+        f.write("crashed-client (pid 1)")
+    old = time.time() - 600
+    os.utime(path + ".lock", (old, old))
+    session = WorkbookSession(path)
+    session.append_row("Data", ["row"])
+    session.close()
+    assert sheet_values(path) == [("Name",), ("row",)]
+
+
+def race_once(session, monkeypatch, change):
+    """Make `change` happen to the file just before the session's first attempt to replace it"""
+    replace_file = session._replace_file
+    raced = []
+
+    def racing(tmp_path, base_signature):
+        if not raced:
+            raced.append(True)
+            change()
+        return replace_file(tmp_path, base_signature)
+    monkeypatch.setattr(session, "_replace_file", racing)
+    return raced
+
+
+def test_update_is_redone_on_a_file_changed_meanwhile(tmp_path, monkeypatch):
+    path = make_workbook(tmp_path / "update.xlsx", [["Name", "Qty"], ["old", 1]])
+    session = WorkbookSession(path)
+    session.workbook()
+    raced = race_once(session, monkeypatch, lambda: external_append(path, ["theirs", 9]))
+    session.update_row("Data", 2, ["updated", 2])
+    session.close()
+    assert raced
+    assert sheet_values(path) == [("Name", "Qty"), ("updated", 2), ("theirs", 9)]
+
+
+def test_compaction_is_redone_on_a_file_changed_meanwhile(tmp_path, monkeypatch):
+    path = make_workbook(tmp_path / "compact.xlsx", [["Name"], ["old"]])
+    session = WorkbookSession(path)
+    list(session.iter_keyed_rows("Data"))
+    assert session.append_row("Data", ["mine"]) == 3
+    raced = race_once(session, monkeypatch, lambda: external_append(path, ["theirs"]))
+    session.close()
+    assert raced
+    assert sheet_values(path) == [("Name",), ("old",), ("theirs",), ("mine",)]
+
+
+def test_update_of_a_row_changed_by_someone_else_is_refused(tmp_path):
+    path = make_workbook(tmp_path / "conflict.xlsx", [["Name", "Qty"], ["old", 1]])
+    session = WorkbookSession(path)
+    seen = dict(session.iter_keyed_rows("Data"))[2]
+    workbook = openpyxl.load_workbook(path)
+    workbook["Data"]["A2"] = "changed by them"
+    workbook.save(path)
+    with pytest.raises(RowConflictError):
+        session.update_row("Data", 2, ["mine", 1], expected=seen)
+    session.close()
+    assert sheet_values(path) == [("Name", "Qty"), ("changed by them", 1)]
@@ -0,0 +1,118 @@
+from array import array
+
+import pytest
+
+import rowstore
+from rowstore import RowStore, map_column
+
+
+def column(store, index):
+    return store._columns[index]
+
+
+@pytest.mark.parametrize("distinct, typecode", [(200, "B"), (256, "B"), (257, "H"), (70000, "I")])
+def test_codes_widen_with_the_number_of_distinct_values(monkeypatch, distinct, typecode):
+    # Keep encoding however many distinct values, to reach the 4-byte codes
+    monkeypatch.setattr(rowstore, "DISTINCT_LIMIT", 10 ** 6)
+    rows = [(f"value {n % distinct}", n % 3) for n in range(max(distinct, 1000) + 5)]
+    store = RowStore(rows)
+    assert column(store, 0).codes.typecode == typecode
+    assert column(store, 0).cells is None
+    assert list(store) == rows
+    assert store[-1] == rows[-1] and store[3:6] == rows[3:6]
+
+
+def test_codes_widen_on_a_single_append():
+    store = RowStore([(n,) for n in range(256)])
+    assert column(store, 0).codes.typecode == "B"
+    store.append((256,))
+    assert column(store, 0).codes.typecode == "H"
+    assert store[256] == (256,) and store[255] == (255,)
+
+
+@pytest.mark.parametrize("values, typecode", [
+    ([float(n) / 3 for n in range(10000)], "d"),
+    (list(range(10000)), "q"),
+])
+def test_mostly_unique_numbers_are_stored_as_typed_arrays(values, typecode):
+    store = RowStore([(value,) for value in values])
+    cells = column(store, 0).cells
+    assert isinstance(cells, array) and cells.typecode == typecode
+    assert store.column(0) == values
+
+
+def test_mixed_and_huge_values_fall_back_to_a_list():
+    values = [n if n % 2 else float(n) for n in range(10000)]
+    store = RowStore([(value,) for value in values])
+    assert isinstance(column(store, 0).cells, list)
+    assert [type(value) for value in store.column(0)] == [type(value) for value in values]
+
+    store = RowStore([(n,) for n in range(10000)])
+    store.append((2 ** 70,))
+    store[0] = ("text",)
+    assert isinstance(column(store, 0).cells, list)
+    assert store[0] == ("text",) and store[-1] == (2 ** 70,) and store[1] == (1,)
+
+
+def test_equal_values_of_different_types_stay_distinct():
+    rows = [(1,), (1.0,), (True,), ("1",), (None,)]
+    store = RowStore(rows)
+    assert [type(value) for value in store.column(0)] == [int, float, bool, str, type(None)]
+    assert list(store) == rows
+
+
+def test_unhashable_values_stop_the_encoding():
+    store = RowStore([("a",), ("b",)])
+    store[0] = ([1, 2],)
+    assert store[0] == ([1, 2],) and store[1] == ("b",)
+    store.append(({"k": 1},))
+    assert len(store) == 3 and store[2] == ({"k": 1},)
+
+
+def test_rows_of_different_widths_are_padded():
+    store = RowStore([("a",), ("b", 2, 3), ()])
+    assert store.width == 3
+    assert list(store) == [("a", None, None), ("b", 2, 3), (None, None, None)]
+    store[0] = ("a", 1, 2, 4)
+    assert store.width == 4
+    assert store[2] == (None, None, None, None)
+    assert RowStore([(), ()])[:] == [(), ()]
+
+
+def test_row_access_checks_its_bounds():
+    store = RowStore([("a",)])
+    with pytest.raises(IndexError):
+        store[1]
+    with pytest.raises(IndexError):
+        store[-2] = ("x",)
+
+
+def test_map_column_calls_func_once_per_distinct_value():
+    store = RowStore([("x",), ("y",), ("x",), ("x",)])
+    calls = []
+
+    def upper(value):
+        calls.append(value)
+        return value.upper()
+    assert store.map_column(0, upper) == ["X", "Y", "X", "X"]
+    assert sorted(calls) == ["x", "y"]
+    assert store.map_column(0, upper, count=2) == ["X", "Y"]
+    assert store.map_column(3, str) == ["None"] * 4
+    assert map_column([("x",), ()], 0, str) == ["x", "None"]
+
+
+def test_round_trip_across_chunks(monkeypatch):
+    monkeypatch.setattr(rowstore, "CHUNK_ROWS", 7)
+    rows = [(n, f"n{n % 5}", None if n % 3 else n / 2) for n in range(50)]
+    store = RowStore(iter(rows))
+    assert len(store) == 50 and list(store) == rows
+    store.extend(rows[:3])
+    assert list(store)[50:] == rows[:3]
+
+
+def test_starts_with():
+    store = RowStore([("a", 1), ("b", 2), ("c", 3)])
+    assert store.starts_with(RowStore([("a", 1), ("b", 2)]))
+    assert not store.starts_with(RowStore([("a", 1), ("x", 2)]))
+    assert not RowStore([("a", 1)]).starts_with(store)
+    assert store.starts_with(RowStore())
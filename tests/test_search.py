@@ -0,0 +1,95 @@
+import pytest
+
+from rowstore import RowStore
+from search import RowIndex
+
+
+ROWS = [
+    ("Alice", "Berlin", 30),
+    ("bob", "Bern", None),
+    ("Carol", "berlin", 41),
+    ("Dave", "Paris", 30),
+]
+
+
+@pytest.fixture(params=[list, RowStore])
+def rows(request):
+    return request.param(ROWS)
+
+
+def built(rows):
+    index = RowIndex(rows, 3)
+    index.build()
+    return index
+
+
+def test_substring_search_ignores_case_and_needs_every_word(rows):
+    index = built(rows)
+    assert index.ready
+    assert index.search("ber") == [0, 1, 2]
+    assert index.search("BERLIN") == [0, 2]
+    assert index.search("lin ali") == [0]
+    assert index.search("30") == [0, 3]
+    assert index.search("nowhere") == []
+    assert index.search("  ") == [0, 1, 2, 3]
+
+
+def test_words_only_match_within_a_cell(rows):
+    # The distinct values are kept in one string; a match must not span two of them
+    index = built(rows)
+    assert index.search("berlin\nbern") == index.search("berlin bern") == []
+    assert index.search("nberl") == []
+
+
+def test_prefix_search_on_one_column(rows):
+    index = RowIndex(rows, 3)
+    index.build([1])
+    assert index.column_ready(1) and not index.column_ready(0) and not index.ready
+    assert index.prefix_search(1, "Ber") == [0, 1, 2]
+    assert index.prefix_search(1, "berl") == [0, 2]
+    assert index.prefix_search(1, "erl") == []
+    assert index.prefix_search(1, "") == [0, 1, 2, 3]
+
+
+def test_appended_rows_are_found_without_rebuilding(rows):
+    index = built(rows)
+    rows.append(("Eve", "Bergen", 7))
+    rows.append(("Frank",))
+    assert index.search("berg") == [4]
+    assert index.search("ber") == [0, 1, 2, 4]
+    assert index.prefix_search(0, "f") == [5]
+    # Short rows have blank cells past their end
+    assert index.search("frank") == [5]
+
+
+def test_replaced_rows_match_on_their_new_values(rows):
+    index = built(rows)
+    assert index.search("paris") == [3]
+    rows[3] = ("Dave", "Rome", 30)
+    index.replace_row(3)
+    assert index.search("paris") == []
+    assert index.search("rome") == [3]
+    assert index.prefix_search(1, "pa") == []
+    assert index.prefix_search(1, "ro") == [3]
+    rows[0] = ("Alice", "Paris", 30)
+    index.replace_row(0)
+    assert index.search("paris") == [0]
+
+
+def test_unique_columns():
+    # Every value once (as in an ID column) takes a shortcut through the index
+    rows = [(f"id-{n}", "same") for n in range(20)]
+    index = RowIndex(rows, 2)
+    index.build()
+    assert index.search("id-1") == [1] + list(range(10, 20))
+    assert index.search("same id-7") == [7]
+    assert index.prefix_search(0, "id-1") == [1] + list(range(10, 20))
+
+
+def test_columns_built_later_cover_the_same_rows(rows):
+    index = RowIndex(rows, 3)
+    index.build([0])
+    rows.append(("Eve", "Lyon", 5))
+    index.build()
+    assert index.search("lyon") == [4]
+    assert index.search("eve") == [4]
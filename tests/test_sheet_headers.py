@@ -0,0 +1,113 @@
+import os
+import zipfile
+
+import openpyxl
+import pytest
+
+import storage
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
+def make_workbook(path, sheets):
+    """A workbook of empty sheets, from {sheet_name: [header]}, as openpyxl writes it"""
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_name, header in sheets.items():
+        workbook.create_sheet(sheet_name).append(header)
+    workbook.save(path)
+    return str(path)
+
+
+def replace_parts(path, parts):
+    """Rewrite the zip with some parts replaced or added, as {name: bytes}"""
+    with zipfile.ZipFile(path) as source:
+        kept = [(info, source.read(info)) for info in source.infolist() if info.filename not in parts]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as target:
+        for info, data in kept:
+            target.writestr(info, data)
+        for name, data in parts.items():
+            target.writestr(name, data)
+
+
+def with_shared_strings(path, sheet_data, strings):
+    """Give the first sheet `sheet_data` and the workbook a shared strings table, as Excel writes them"""
+    with zipfile.ZipFile(path) as archive:
+        rels = archive.read("xl/_rels/workbook.xml.rels").decode()
+        types = archive.read("[Content_Types].xml").decode()
+    rels = rels.replace("</Relationships>", (
+        '<Relationship Id="rIdSS" Target="sharedStrings.xml" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/sharedStrings"/></Relationships>'))
+    types = types.replace("</Types>", (
+        '<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>'))
+    table = "".join(f"<si><t>{text}</t></si>" for text in strings)
+    replace_parts(path, {
+        "xl/worksheets/sheet1.xml": f'<worksheet xmlns="{MAIN}"><sheetData>{sheet_data}</sheetData></worksheet>',
+        "xl/sharedStrings.xml": f'<sst xmlns="{MAIN}" count="{len(strings)}">{table}</sst>',
+        "xl/_rels/workbook.xml.rels": rels,
+        "[Content_Types].xml": types,
+    })
+
+
+def scanned(path):
+    with zipfile.ZipFile(path) as archive:
+        return storage.scan_sheet_headers(archive)
+
+
+def test_inline_string_headers(tmp_path):
+    path = make_workbook(tmp_path / "inline.xlsx", {"Data": ["Name", "Qty", "Date"], "Empty": []})
+    assert scanned(path) == {"Data": ["Name", "Qty", "Date"], "Empty": []}
+
+
+def test_shared_string_headers_and_other_cell_types(tmp_path):
+    path = make_workbook(tmp_path / "shared.xlsx", {"Data": ["x"]})
+    with_shared_strings(path, (
+        '<row r="1"><c r="A1" t="s"><v>2</v></c><c r="B1"><v>2024</v></c><c r="C1"><v>1.5</v></c>'
+        '<c r="D1" t="b"><v>1</v></c><c r="E1"><f>A1&amp;"!"</f><v>0</v></c><c r="F1" t="s"/>'
+        '<c r="G1" t="s"><v>0</v></c></row>'
+        '<row r="2"><c r="A2" t="s"><v>1</v></c></row>'
+    ), ["Code", "data, not a header", "Name &amp; Title"])
+    assert scanned(path) == {"Data": ["Name & Title", 2024, 1.5, True, '=A1&"!"', "Code"]}
+    # As openpyxl reads them
+    assert scanned(path) == storage.read_sheet_headers(path)
+
+
+def test_sheet_whose_first_row_is_not_row_1_has_no_header(tmp_path):
+    path = make_workbook(tmp_path / "late.xlsx", {"Data": ["x"]})
+    with_shared_strings(path, '<row r="3"><c r="A3" t="s"><v>0</v></c></row>', ["Not a header"])
+    assert scanned(path) == {"Data": []}
+    assert storage.read_sheet_headers(path) == {"Data": []}
+
+
+def test_headers_are_cached_until_the_file_changes(tmp_path, monkeypatch):
+    path = make_workbook(tmp_path / "cached.xlsx", {"Data": ["Name", "Qty"]})
+    assert storage.load_sheet_headers(path) == {"Data": ["Name", "Qty"]}
+    assert os.path.exists(path + ".schema.json")
+
+    def not_scanned(archive):
+        raise AssertionError("scanned although cached")
+    monkeypatch.setattr(storage, "scan_sheet_headers", not_scanned)
+    assert storage.load_sheet_headers(path) == {"Data": ["Name", "Qty"]}
+    monkeypatch.undo()
+
+    # Same size and sheets, different content: the parts' CRCs tell them apart
+    make_workbook(path, {"Data": ["Name", "Qtx"]})
+    assert storage.load_sheet_headers(path) == {"Data": ["Name", "Qtx"]}
+
+
+def test_a_corrupt_cache_is_ignored(tmp_path):
+    path = make_workbook(tmp_path / "corrupt.xlsx", {"Data": ["Name"]})
+    with open(path + ".schema.json", "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert storage.load_sheet_headers(path) == {"Data": ["Name"]}
+
+
+@pytest.mark.parametrize("error", [KeyError, StopIteration, ValueError, IndexError])
+def test_unusual_layouts_fall_back_to_openpyxl(tmp_path, monkeypatch, error):
+    path = make_workbook(tmp_path / "odd.xlsx", {"Data": ["Name", "Qty"], "More": ["A"]})
+
+    def fails(archive):
+        raise error("unusual package layout")
+    monkeypatch.setattr(storage, "scan_sheet_headers", fails)
+    assert storage.load_sheet_headers(path) == {"Data": ["Name", "Qty"], "More": ["A"]}
@@ -0,0 +1,53 @@
+import datetime
+
+import openpyxl
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    path = str(tmp_path / "rows.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    sheet.append(["Name", "When", "Qty"])
+    sheet.append(["a & b", datetime.datetime(2024, 1, 2, 3, 4), 3])
+    sheet["A5"] = "after a gap"
+    workbook.save(path)
+    return path
+
+
+@pytest.fixture
+def without_parser(monkeypatch):
+    """As with an openpyxl whose private worksheet parser has moved"""
+    monkeypatch.setattr(storage, "_openpyxl_parser", lambda: None)
+
+
+def test_public_reader_fallback_reads_the_same_rows(workbook_path, without_parser):
+    rows = list(storage.iter_sheet_rows(workbook_path, "Data"))
+    assert [(row_number, values[:1]) for row_number, values in rows] == [(2, ("a & b",)), (5, ("after a gap",))]
+    assert rows[0][1] == ("a & b", datetime.datetime(2024, 1, 2, 3, 4), 3)
+
+
+def test_tail_falls_back_to_streaming_the_sheet(workbook_path, without_parser):
+    assert storage.tail_sheet_rows(workbook_path, "Data", 1) is None
+    session = storage.WorkbookSession(workbook_path)
+    try:
+        assert [row_number for row_number, _ in session.tail_keyed_rows("Data", 1)] == [5]
+    finally:
+        session.close()
+
+
+def test_public_reader_fallback_reports_a_missing_sheet(workbook_path, without_parser):
+    with pytest.raises(KeyError):
+        storage.iter_sheet_rows(workbook_path, "Missing")
+
+
+def test_parser_matches_the_fallback(workbook_path, monkeypatch):
+    parsed = list(storage.iter_sheet_rows(workbook_path, "Data"))
+    monkeypatch.setattr(storage, "_openpyxl_parser", lambda: None)
+    public = list(storage.iter_sheet_rows(workbook_path, "Data"))
+    assert [(n, tuple(v for v in values if v is not None)) for n, values in parsed] == \
+        [(n, tuple(v for v in values if v is not None)) for n, values in public]
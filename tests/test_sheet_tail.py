@@ -0,0 +1,145 @@
+import datetime
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+
+import openpyxl
+import pytest
+
+import storage
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+SHARED_STRINGS_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"
+
+
+class Trickle(io.BytesIO):
+    """A stream that hands out a few bytes per read, so tags and rows straddle every chunk boundary"""
+    def read(self, size=-1):
+        return super().read(7)
+
+
+def sheet_xml(rows_xml, prefix=""):
+    tag = f"{prefix}:" if prefix else ""
+    namespace = f'xmlns:{prefix}="{MAIN}"' if prefix else f'xmlns="{MAIN}"'
+    return (f'<{tag}worksheet {namespace}><{tag}dimension ref="A1"/><{tag}sheetData>{rows_xml}</{tag}sheetData>'
+            f'<{tag}pageMargins left="0.7"/></{tag}worksheet>').encode()
+
+
+def inline_row(number, *texts):
+    cells = "".join(f'<c r="{chr(65 + i)}{number}" t="inlineStr"><is><t>{text}</t></is></c>'
+                    for i, text in enumerate(texts))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def tail(document, count):
+    result = storage._tail_rows_xml(Trickle(document), count)
+    return result if result is None else result.decode()
+
+
+def test_tail_keeps_only_the_last_rows_in_a_well_formed_document():
+    document = sheet_xml("".join(inline_row(n, f"v{n}") for n in range(1, 40)))
+    result = tail(document, 3)
+    assert result.count("<row") == 3
+    assert '<row r="37">' in result and '<row r="36">' not in result
+    assert result.endswith("</sheetData></worksheet>")
+    assert "pageMargins" not in result
+    ET.fromstring(result)
+
+
+def test_tail_longer_than_the_sheet_keeps_every_row():
+    document = sheet_xml("".join(inline_row(n, f"v{n}") for n in range(1, 4)))
+    assert tail(document, 50).count("<row") == 3
+    assert tail(document, 0).count("<row") == 0
+
+
+def test_tail_with_a_namespace_prefix():
+    document = sheet_xml("".join(inline_row(n, "v").replace("<row", "<x:row").replace("</row", "</x:row")
+                                 .replace("<c ", "<x:c ").replace("</c>", "</x:c>")
+                                 .replace("<is>", "<x:is>").replace("</is>", "</x:is>")
+                                 .replace("<t>", "<x:t>").replace("</t>", "</x:t>")
+                                 for n in range(1, 6)), prefix="x")
+    result = tail(document, 2)
+    assert result.count("<x:row") == 2 and result.endswith("</x:sheetData></x:worksheet>")
+
+
+def test_tail_of_an_empty_sheet():
+    assert tail(sheet_xml("").replace(b"<sheetData></sheetData>", b"<sheetData/>"), 5).count("<row") == 0
+    assert tail(sheet_xml(""), 5).count("<row") == 0
+
+
+def test_rows_without_numbers_give_up():
+    document = sheet_xml("<row><c><v>1</v></c></row><row><c><v>2</v></c></row>")
+    assert tail(document, 1) is None
+
+
+def make_workbook(path, sheet_data, strings=None):
+    """A one-sheet workbook with the given <sheetData> content, and a shared strings table if given"""
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Data"
+    workbook.save(path)
+    with zipfile.ZipFile(path) as source:
+        parts = {info.filename: source.read(info) for info in source.infolist()}
+    parts["xl/worksheets/sheet1.xml"] = sheet_xml(sheet_data)
+    if strings is not None:
+        table = "".join(f"<si><t>{text}</t></si>" for text in strings)
+        parts["xl/sharedStrings.xml"] = f'<sst xmlns="{MAIN}">{table}</sst>'.encode()
+        parts["xl/_rels/workbook.xml.rels"] = parts["xl/_rels/workbook.xml.rels"].replace(b"</Relationships>", (
+            f'<Relationship Id="rIdSS" Target="sharedStrings.xml" Type="{SHARED_STRINGS_TYPE}"/>'
+            '</Relationships>').encode())
+        parts["[Content_Types].xml"] = parts["[Content_Types].xml"].replace(b"</Types>", (
+            b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+            b'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>'))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as target:
+        for name, data in parts.items():
+            target.writestr(name, data)
+    return str(path)
+
+
+def test_tail_of_a_sheet_with_gaps_keeps_the_row_numbers(tmp_path):
+    path = make_workbook(tmp_path / "gaps.xlsx", inline_row(1, "Name") + inline_row(2, "a")
+                         + inline_row(7, "b") + inline_row(40, "c"))
+    assert storage.tail_sheet_rows(path, "Data", 2) == [(7, ("b",)), (40, ("c",))]
+
+
+def test_tail_starting_right_after_the_header(tmp_path):
+    path = make_workbook(tmp_path / "header.xlsx", inline_row(1, "Name", "Qty") + inline_row(2, "a", "1")
+                         + inline_row(3, "b", "2"))
+    assert storage.tail_sheet_rows(path, "Data", 2) == [(2, ("a", "1")), (3, ("b", "2"))]
+    # The header is never part of the tail, however many rows are asked for
+    assert storage.tail_sheet_rows(path, "Data", 3) == storage.tail_sheet_rows(path, "Data", 99)
+    assert storage.tail_sheet_rows(path, "Data", 0) == []
+
+
+def test_tail_of_a_sheet_with_only_a_header(tmp_path):
+    path = make_workbook(tmp_path / "only.xlsx", inline_row(1, "Name"))
+    assert storage.tail_sheet_rows(path, "Data", 5) == []
+
+
+def test_tail_looks_up_shared_strings(tmp_path):
+    rows = ('<row r="1"><c r="A1" t="s"><v>0</v></c></row>'
+            '<row r="2"><c r="A2" t="s"><v>1</v></c><c r="B2"><v>5</v></c></row>'
+            '<row r="3"><c r="A3" t="s"><v>3</v></c><c r="B3" t="inlineStr"><is><t>inline</t></is></c></row>'
+            '<row r="4"><c r="A4" t="s"><v>2</v></c><c r="C4" t="b"><v>1</v></c></row>')
+    path = make_workbook(tmp_path / "shared.xlsx", rows, ["Name", "early", "late &amp; last", "middle"])
+    assert storage.tail_sheet_rows(path, "Data", 2) == [
+        (3, ("middle", "inline")), (4, ("late & last", None, True)),
+    ]
+
+
+def test_tail_matches_the_whole_sheet_read(tmp_path):
+    path = str(tmp_path / "typed.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    sheet.append(["Name", "When", "Qty"])
+    for n in range(30):
+        sheet.append([f"row {n}", datetime.datetime(2024, 1, 1) + datetime.timedelta(days=n), n / 4])
+    workbook.save(path)
+    streamed = list(storage.iter_sheet_rows(path, "Data"))
+    assert storage.tail_sheet_rows(path, "Data", 5) == streamed[-5:]
+
+
+def test_tail_of_a_missing_sheet(tmp_path):
+    path = make_workbook(tmp_path / "missing.xlsx", inline_row(1, "Name"))
+    with pytest.raises(KeyError):
+        storage.tail_sheet_rows(path, "Other", 1)
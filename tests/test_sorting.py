@@ -0,0 +1,103 @@
+import random
+from datetime import date, datetime, timezone
+
+import pytest
+
+from rowstore import RowStore
+from sorting import BLANK, DATE, NUMBER, TEXT, SortCache, sort_key
+
+
+@pytest.mark.parametrize("value, key", [
+    (None, (BLANK, 0)),
+    ("  ", (BLANK, 0)),
+    (3, (NUMBER, 3)),
+    (2.5, (NUMBER, 2.5)),
+    (True, (NUMBER, 1)),
+    (" 12 ", (NUMBER, 12.0)),
+    ("-0.5", (NUMBER, -0.5)),
+    ("1e3", (NUMBER, 1000.0)),
+    ("-inf", (TEXT, "-inf")),
+    (float("nan"), (TEXT, "nan")),
+    ("2024-03-15", (DATE, datetime(2024, 3, 15))),
+    ("2024/03/15 14:30", (DATE, datetime(2024, 3, 15, 14, 30))),
+    ("2024-13-45", (TEXT, "2024-13-45")),
+    (date(2024, 3, 15), (DATE, datetime(2024, 3, 15))),
+    (datetime(2024, 3, 15, 1, tzinfo=timezone.utc), (DATE, datetime(2024, 3, 15, 1))),
+    ("Éclair", (TEXT, "éclair")),
+    ("12 apples", (TEXT, "12 apples")),
+])
+def test_sort_key(value, key):
+    assert sort_key(value) == key
+
+
+MIXED = [
+    ("b",), ("10",), (None,), (datetime(2024, 1, 2),), (9,), ("A",), ("",),
+    ("2023-12-31",), (2.5,), ("c",), (), ("-1",),
+]
+
+
+@pytest.fixture(params=[list, RowStore])
+def rows(request):
+    return request.param(MIXED)
+
+
+def values(rows, order):
+    return [rows[position][0] if rows[position] else None for position in order]
+
+
+def test_numbers_then_dates_then_text_then_blanks(rows):
+    order = SortCache(rows).order(0)
+    assert values(rows, order) == [
+        "-1", 2.5, 9, "10", "2023-12-31", datetime(2024, 1, 2), "A", "b", "c", None, "", None,
+    ]
+
+
+def test_descending_keeps_blanks_last(rows):
+    order = SortCache(rows).order(0, descending=True)
+    assert values(rows, order)[:9] == [
+        "c", "b", "A", datetime(2024, 1, 2), "2023-12-31", "10", 9, 2.5, "-1",
+    ]
+    assert values(rows, order)[9:] == [None, "", None]
+
+
+def test_equal_values_keep_their_row_order():
+    rows = [("x", n) for n in range(5)] + [("a", 9)]
+    cache = SortCache(rows)
+    assert cache.order(0) == [5, 0, 1, 2, 3, 4]
+    rows.append(("x", 5))
+    assert cache.order(0) == [5, 0, 1, 2, 3, 4, 6]
+
+
+def test_appended_and_replaced_rows_are_moved_into_place(rows):
+    cache = SortCache(rows)
+    cache.order(0)
+    rows.append((5,))
+    rows.append(("aa",))
+    assert values(rows, cache.order(0))[:4] == ["-1", 2.5, 5, 9]
+    old = rows[0]
+    rows[0] = (100,)
+    cache.replace_row(0, old)
+    order = cache.order(0)
+    assert values(rows, order)[:6] == ["-1", 2.5, 5, 9, "10", 100]
+    assert "b" not in values(rows, order)
+    assert sorted(order) == list(range(len(rows)))
+
+
+def test_incremental_order_matches_a_fresh_sort():
+    generator = random.Random(7)
+    pool = [None, "", "x", "Y", 3, 3.5, "4", "2024-05-06", datetime(2020, 1, 1), -2]
+    rows = [(generator.choice(pool), generator.choice(pool)) for _ in range(200)]
+    cache = SortCache(rows)
+    cache.order(0)
+    cache.order(1, descending=True)
+    for _ in range(100):
+        if generator.random() < 0.5:
+            rows.append((generator.choice(pool), generator.choice(pool)))
+        else:
+            position = generator.randrange(len(rows))
+            old = rows[position]
+            rows[position] = (generator.choice(pool), generator.choice(pool))
+            cache.replace_row(position, old)
+    for column in (0, 1):
+        for descending in (False, True):
+            assert cache.order(column, descending) == SortCache(list(rows)).order(column, descending)
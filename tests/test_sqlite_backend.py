@@ -0,0 +1,178 @@
+import sqlite3
+
+import openpyxl
+import pytest
+
+from backends import CHANGES_TABLE, SqliteSession, open_session
+from importer import ImportCancelled
+from storage import RowConflictError, WorkbookSession
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "data.db")
+
+
+@pytest.fixture
+def session(db_path):
+    session = SqliteSession(db_path)
+    session.create({"Data": ["Name", "Qty"], "Other": ["Code"]})
+    yield session
+    session.close()
+
+
+def external(db_path, sql, *params):
+    """A write by another client, on a connection of its own"""
+    connection = sqlite3.connect(db_path)
+    with connection:
+        connection.execute(sql, params)
+    connection.close()
+
+
+def test_open_session_picks_the_backend_by_extension(tmp_path):
+    session = open_session(str(tmp_path / "data.sqlite"))
+    assert isinstance(session, SqliteSession)
+    session.close()
+    assert isinstance(open_session(str(tmp_path / "data.xlsx")), WorkbookSession)
+
+
+def test_sheets_are_tables_without_the_bookkeeping(session):
+    assert session.sheet_headers() == {"Data": ["Name", "Qty"], "Other": ["Code"]}
+    session.add_sheets({"More": ["A", "B"]})
+    assert list(session.sheet_headers()) == ["Data", "Other", "More"]
+    assert CHANGES_TABLE not in session.sheet_headers()
+
+
+def test_appends_return_consecutive_keys(session):
+    assert session.append_row("Data", ["a", 1]) == 1
+    assert session.append_rows("Data", [["b", 2], ["c"], ["d", 4, "dropped"]]) == [2, 3, 4]
+    assert list(session.iter_keyed_rows("Data")) == [(1, ("a", 1)), (2, ("b", 2)), (3, ("c", None)), (4, ("d", 4))]
+    assert session.get_row("Data", 3) == ("c", None)
+    assert session.get_row("Data", 9) is None
+
+
+def test_update_by_key(session):
+    session.append_rows("Data", [["a", 1], ["b", 2]])
+    session.update_row("Data", 2, ["B", 20])
+    assert list(session.iter_rows("Data")) == [("a", 1), ("B", 20)]
+    with pytest.raises(LookupError):
+        session.update_row("Data", 7, ["x", 0])
+
+
+def test_update_of_a_row_changed_by_someone_else_is_refused(session, db_path):
+    session.append_row("Data", ["a", 1])
+    seen = session.get_row("Data", 1)
+    external(db_path, 'UPDATE "Data" SET "Qty" = 5 WHERE _row_id = 1')
+    with pytest.raises(RowConflictError):
+        session.update_row("Data", 1, ["mine", 1], expected=seen)
+    assert session.get_row("Data", 1) == ("a", 5)
+    # Values read back as other types ("1" for 1, "" for None) aren't a conflict
+    session.update_row("Data", 1, ["mine", 2], expected=["a", "5", ""])
+    assert session.get_row("Data", 1) == ("mine", 2)
+
+
+def test_cancelled_bulk_append_is_rolled_back(session):
+    session.append_row("Data", ["kept", 1])
+
+    def rows():
+        for i in range(100):
+            yield [f"row {i}", i]
+        raise ImportCancelled()
+    with pytest.raises(ImportCancelled):
+        session.bulk_append("Data", rows(), 2)
+    assert list(session.iter_rows("Data")) == [("kept", 1)]
+    assert session.bulk_append("Data", ([f"row {i}", i] for i in range(3)), 2) == 3
+    assert len(list(session.iter_rows("Data"))) == 4
+
+
+def test_chunks_page_through_the_keys(session):
+    session.append_rows("Data", [[f"row {i}", i] for i in range(10)])
+    external(session.path, 'DELETE FROM "Data" WHERE _row_id IN (3, 4)')
+    chunks = list(session.iter_keyed_chunks("Data", chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 2]
+    assert [row_id for chunk in chunks for row_id, _ in chunk] == [1, 2, 5, 6, 7, 8, 9, 10]
+    assert list(session.iter_keyed_chunks("Other")) == []
+
+
+def test_chunks_leave_the_lock_free_between_pages(session):
+    session.append_rows("Data", [[f"row {i}", i] for i in range(5)])
+    chunks = session.iter_keyed_chunks("Data", chunk_size=2)
+    next(chunks)
+    # A write in the middle of a long read doesn't wait for it
+    session.append_row("Data", ["during", 9])
+    rest = [values for chunk in chunks for _, values in chunk]
+    assert rest[-1] == ("during", 9)
+
+
+def test_fingerprints_change_with_each_sheet(session, db_path):
+    session.append_rows("Data", [["a", 1], ["b", 2]])
+    _, before = session.sheet_fingerprints()
+    _, again = session.sheet_fingerprints()
+    assert again == before
+
+    steps = [
+        'UPDATE "Data" SET "Qty" = 3 WHERE _row_id = 1',
+        'DELETE FROM "Data" WHERE _row_id = 1',
+        'INSERT INTO "Data" ("Name", "Qty") VALUES (\'c\', 4)',
+    ]
+    for sql in steps:
+        external(db_path, sql)
+        _, after = session.sheet_fingerprints()
+        assert after["Data"] != before["Data"], sql
+        assert after["Other"] == before["Other"]
+        before = after
+
+    # Deleting the last row and inserting one reuses its key and keeps the count
+    external(db_path, 'DELETE FROM "Data" WHERE _row_id = 3')
+    external(db_path, 'INSERT INTO "Data" ("Name", "Qty") VALUES (\'d\', 5)')
+    _, after = session.sheet_fingerprints()
+    assert after["Data"] != before["Data"]
+
+
+def test_fingerprints_add_the_triggers_to_older_files(db_path):
+    external(db_path, 'CREATE TABLE "Data" (_row_id INTEGER PRIMARY KEY, "Name")')
+    session = SqliteSession(db_path)
+    try:
+        generation, before = session.sheet_fingerprints()
+        # Adding them is our own write, not a change to report
+        assert not session.changed_since(generation)
+        external(db_path, 'INSERT INTO "Data" ("Name") VALUES (\'a\')')
+        external(db_path, 'UPDATE "Data" SET "Name" = \'b\'')
+        assert session.changed_since(generation)
+        _, after = session.sheet_fingerprints()
+        assert after["Data"][2] == 1 and after["Data"] != before["Data"]
+    finally:
+        session.close()
+
+
+def test_own_writes_are_not_reported_as_changes(session, db_path):
+    generation, _ = session.sheet_fingerprints()
+    session.append_row("Data", ["a", 1])
+    session.update_row("Data", 1, ["b", 1])
+    assert not session.changed_since(generation)
+    external(db_path, 'INSERT INTO "Data" ("Name") VALUES (\'theirs\')')
+    assert session.changed_since(generation)
+
+
+def test_spooled_rows_are_committed_together(session):
+    session.spool_row("Data", ["a", 1])
+    session.spool_row("Data", ["b", 2])
+    assert list(session.iter_rows("Data")) == []
+    row_ids, rows = session.commit_spool("Data")
+    assert row_ids == [1, 2] and rows == [["a", 1], ["b", 2]]
+    assert len(session.spool) == 0
+    assert list(session.iter_rows("Data")) == [("a", 1), ("b", 2)]
+
+
+def test_export_writes_every_sheet_to_a_workbook(session, tmp_path):
+    session.append_rows("Data", [["a", 1], ["b", None]])
+    session.append_row("Other", ["x"])
+    target = str(tmp_path / "export.xlsx")
+    assert session.export_xlsx(target) == 3
+    workbook = openpyxl.load_workbook(target)
+    assert workbook.sheetnames == ["Data", "Other"]
+    assert list(workbook["Data"].iter_rows(values_only=True)) == [("Name", "Qty"), ("a", 1), ("b", None)]
+    assert list(workbook["Other"].iter_rows(values_only=True)) == [("Code",), ("x",)]
+    workbook.close()
+    with pytest.raises(ValueError):
+        session.export_xlsx(session.path)
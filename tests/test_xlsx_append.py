@@ -0,0 +1,121 @@
+import datetime
+import zipfile
+
+import openpyxl
+import pytest
+
+from storage import append_rows_to_xlsx
+
+
+def make_workbook(path, rows=(), sheet_name="Data", start_row=None):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = sheet_name
+    for values in rows:
+        sheet.append(values)
+    if start_row is not None:
+        sheet.cell(row=start_row, column=1, value="first")
+    workbook.save(path)
+    return path
+
+
+def sheet_values(path, sheet_name="Data"):
+    workbook = openpyxl.load_workbook(path)
+    try:
+        return [row for row in workbook[sheet_name].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+def test_append_to_empty_sheet(tmp_path):
+    path = make_workbook(tmp_path / "empty.xlsx")
+    written = append_rows_to_xlsx(path, {"Data": ([["a", 1], ["b", 2]], 2, None)})
+    assert written == {"Data": 2}
+    assert sheet_values(path) == [("a", 1), ("b", 2)]
+
+
+def test_append_after_data_starting_below_row_one(tmp_path):
+    path = make_workbook(tmp_path / "offset.xlsx", start_row=5)
+    append_rows_to_xlsx(path, {"Data": ([["next"]], 1, None)})
+    workbook = openpyxl.load_workbook(path)
+    sheet = workbook["Data"]
+    assert sheet.cell(row=5, column=1).value == "first"
+    assert sheet.cell(row=6, column=1).value == "next"
+    assert sheet.max_row == 6
+
+
+def test_append_after_header_keeps_existing_rows(tmp_path):
+    path = make_workbook(tmp_path / "header.xlsx", rows=[["Name", "Qty"], ["old", 1]])
+    append_rows_to_xlsx(path, {"Data": ([["new", 2]], 2, None)})
+    assert sheet_values(path) == [("Name", "Qty"), ("old", 1), ("new", 2)]
+
+
+def test_text_is_escaped_and_control_characters_dropped(tmp_path):
+    path = make_workbook(tmp_path / "escape.xlsx", rows=[["Text"]])
+    text = "Fish & Chips <b>bold</b> \"quoted\" 'single' > end"
+    append_rows_to_xlsx(path, {"Data": ([[text], ["bell\x07 vt\x0b nul\x00 end"], ["tab\tand\nnewline"]], 1, None)})
+    assert sheet_values(path)[1:] == [(text,), ("bell vt nul end",), ("tab\tand\nnewline",)]
+
+
+def test_numbers_and_bools_keep_their_types(tmp_path):
+    path = make_workbook(tmp_path / "numbers.xlsx", rows=[["i", "f", "neg", "big", "t", "f"]])
+    append_rows_to_xlsx(path, {"Data": ([[42, 2.5, -7, 2 ** 53, True, False]], 6, None)})
+    row = sheet_values(path)[1]
+    assert row == (42, 2.5, -7, 2 ** 53, True, False)
+    assert [type(value) for value in row] == [int, float, int, int, bool, bool]
+
+
+def test_blank_cells_are_left_out(tmp_path):
+    path = make_workbook(tmp_path / "blank.xlsx", rows=[["a", "b", "c"]])
+    append_rows_to_xlsx(path, {"Data": ([["x", None, ""], [None, None, "z"]], 3, None)})
+    assert sheet_values(path)[1:] == [("x", None, None), (None, None, "z")]
+
+
+def test_dates_are_written_as_dates(tmp_path):
+    path = make_workbook(tmp_path / "dates.xlsx", rows=[["when", "day", "time", "took"]])
+    values = [datetime.datetime(2024, 5, 1, 10, 30), datetime.date(2024, 5, 2),
+              datetime.time(7, 15), datetime.timedelta(hours=30)]
+    append_rows_to_xlsx(path, {"Data": ([values], 4, None)})
+    row = openpyxl.load_workbook(path)["Data"][2]
+    assert [cell.is_date for cell in row] == [True, True, True, True]
+    assert [cell.value for cell in row] == [datetime.datetime(2024, 5, 1, 10, 30), datetime.datetime(2024, 5, 2),
+                                            datetime.time(7, 15), datetime.timedelta(hours=30)]
+
+
+def test_rows_go_to_their_promised_rows(tmp_path):
+    path = make_workbook(tmp_path / "ids.xlsx", rows=[["h"], ["one"]])
+    # Row 2 is taken, so the row promised it goes after the last row instead
+    append_rows_to_xlsx(path, {"Data": ([["a"], ["b"], ["c"]], 1, [2, 5, None])})
+    workbook = openpyxl.load_workbook(path)
+    sheet = workbook["Data"]
+    assert [sheet.cell(row=number, column=1).value for number in range(1, 7)] == ["h", "one", "a", None, "b", "c"]
+
+
+def test_other_sheets_and_parts_are_copied_unchanged(tmp_path):
+    path = tmp_path / "two.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Data"
+    workbook.create_sheet("Other").append(["keep", 1])
+    workbook.save(path)
+    with zipfile.ZipFile(path) as archive:
+        before = {name: archive.read(name) for name in archive.namelist()}
+    append_rows_to_xlsx(path, {"Data": ([["x"]], 1, None)})
+    with zipfile.ZipFile(path) as archive:
+        after = {name: archive.read(name) for name in archive.namelist()}
+    assert before.keys() == after.keys()
+    changed = {name for name in before if before[name] != after[name]}
+    assert changed == {"xl/worksheets/sheet1.xml"}
+    assert sheet_values(path, "Other") == [("keep", 1)]
+
+
+def test_failed_append_leaves_the_file_alone(tmp_path):
+    path = make_workbook(tmp_path / "fail.xlsx", rows=[["h"]])
+    before = path.read_bytes()
+
+    def rows():
+        yield ["ok"]
+        raise RuntimeError("source broke")
+    with pytest.raises(RuntimeError):
+        append_rows_to_xlsx(path, {"Data": (rows(), 1, None)})
+    assert path.read_bytes() == before
+    assert [p.name for p in tmp_path.iterdir()] == ["fail.xlsx"]